@@ -3,12 +3,13 @@ import os
 import logging
 import asyncio
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from typing import Dict, Any, List, Optional
 import tempfile
+import uuid
 import shutil
 import json
 from pathlib import Path
@@ -16,7 +17,19 @@ from pathlib import Path
 from modules.config_manager import ConfigManager
 from modules.role_manager import RoleManager
 from modules.file_parser import FileParser
+from modules.parse_cache import ParseCache
+from modules.pdf_engine import PdfExtractionEngine
+from modules.parse_pool import ParsePool
+from modules.upload_store import UploadStore, UploadTooLargeError
+from modules.workspace import WorkspaceManager
+from modules.chunker import DocumentChunker
 from modules.review_process import ReviewProcess
+from modules.session_store import ReviewSession, ReviewSessionStore
+from modules.scheduler import ReviewScheduler, SchedulerFullError
+from modules.review_context import bind_review, current_log_buffer
+from modules.telemetry import bind_telemetry
+from modules import metrics
+from modules.compat import to_thread
 
 # 配置日志
 logging.basicConfig(
@@ -30,76 +43,157 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# 创建自定义日志处理器，用于收集日志信息
+# 创建自定义日志处理器，按审查会话收集日志信息
 class LogCollector(logging.Handler):
-    def __init__(self):
-        super().__init__()
-        self.logs = []
+    """把审查阶段内产生的日志写入该审查的环形缓冲区
+    
+    审查阶段执行时通过bind_review绑定日志缓冲区，不属于任何审查的日志不收集。
+    """
     
     def emit(self, record):
-        log_entry = {
+        buffer = current_log_buffer.get()
+        if buffer is None:
+            return
+        buffer.publish("log", {
             "time": self.formatter.formatTime(record),
             "level": record.levelname,
             "message": record.getMessage()
-        }
-        self.logs.append(log_entry)
-    
-    def get_logs(self):
-        return self.logs
+        })
     
-    def clear(self):
-        self.logs = []
+    @staticmethod
+    def get_logs(session: "ReviewSession", since: int = 0) -> List[Dict[str, Any]]:
+        """获取审查会话中序号大于since的日志
+        
+        Args:
+            session: 审查会话
+            since: 已读取的最后一条日志序号
+            
+        Returns:
+            日志列表，每条包含seq、time、level和message
+        """
+        return [{"seq": entry["seq"], **entry["data"]} for entry in session.logs.events_since(since)]
 
-# 创建日志收集器实例
+# 创建日志收集器实例，挂在根日志器上以收集各模块在审查阶段内输出的日志
 log_collector = LogCollector()
 log_collector.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(log_collector)
+logging.getLogger().addHandler(log_collector)
 
-# 创建临时目录
+# 不属于任何审查的解析临时文件目录，审查的临时文件和报告保存在各自的工作目录中
 TEMP_DIR = "temp"
-os.makedirs(TEMP_DIR, exist_ok=True)
-
-# 创建上传目录
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-# 创建报告目录
-REPORT_DIR = "reports"
-os.makedirs(REPORT_DIR, exist_ok=True)
 
 # 全局变量
 config_manager = None
 role_manager = None
 file_parser = None
-review_process = None
-active_review = None
+document_chunker = None
+upload_store = None
+workspace_manager = None
+session_store = None
+scheduler = None
+
+def collect_disk_garbage() -> Dict[str, Any]:
+    """回收过期或超出总大小上限的工作目录和上传文件，仍有会话的审查不回收
+    
+    Returns:
+        回收结果字典
+    """
+    sessions = session_store.list_sessions() if session_store else []
+    return {
+        "workspaces": workspace_manager.collect_garbage({session.review_id for session in sessions}),
+        "uploads": upload_store.collect_garbage({session.file_path for session in sessions})
+    }
+
+async def disk_gc_loop(interval: float) -> None:
+    """定期在线程中执行磁盘回收
+    
+    Args:
+        interval: 回收间隔（秒）
+    """
+    while True:
+        try:
+            await to_thread(collect_disk_garbage)
+        except Exception as e:
+            logger.error(f"磁盘回收失败: {str(e)}")
+        await asyncio.sleep(interval)
 
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理器"""
-    global config_manager, role_manager, file_parser
+    global config_manager, role_manager, file_parser, document_chunker, upload_store, workspace_manager, session_store, scheduler
+    gc_task = None
+    prewarm_task = None
     
     try:
         # 初始化配置管理器
         config_path = "config.json"
         config_manager = ConfigManager(config_path)
         logger.info("配置管理器初始化成功")
+        metrics.REGISTRY.enabled = config_manager.get_metrics_config()["enabled"]
         
         # 初始化角色管理器
         role_manager = RoleManager(config_manager)
         logger.info("角色管理器初始化成功")
+        # 在后台预先建立到各模型端点的连接，不阻塞启动
+        prewarm_task = asyncio.create_task(role_manager.transports.prewarm())
         
         # 初始化文件解析器
-        file_parser = FileParser(TEMP_DIR)
+        workspace_config = config_manager.get_workspace_config()
+        file_parser = FileParser(
+            TEMP_DIR,
+            ParseCache.from_config(config_manager.get_parse_cache_config()),
+            PdfExtractionEngine.from_config(config_manager.get_pdf_config()),
+            ParsePool.from_config(config_manager.get_parse_pool_config()),
+            keep_temp_text=workspace_config["keep_temp_text"]
+        )
         logger.info("文件解析器初始化成功")
         
+        # 初始化上传文件存储和审查工作目录
+        upload_store = UploadStore.from_config(config_manager.get_upload_config())
+        workspace_manager = WorkspaceManager.from_config(workspace_config)
+        
+        # 初始化文档切分器
+        document_chunker = DocumentChunker.from_config(config_manager.get_chunking_config())
+        
+        # 初始化审查会话仓库
+        session_config = config_manager.get_session_config()
+        session_store = ReviewSessionStore(
+            max_sessions=session_config["max_sessions"],
+            ttl_seconds=session_config["ttl_seconds"]
+        )
+        logger.info("审查会话仓库初始化成功")
+        
+        # 启动审查调度器
+        scheduler_config = config_manager.get_scheduler_config()
+        scheduler = ReviewScheduler(
+            max_workers=scheduler_config["max_workers"],
+            max_queue=scheduler_config["max_queue"]
+        )
+        await scheduler.start()
+        # 审查数量在抓取指标时读取
+        metrics.REVIEWS_ACTIVE.set_function(lambda: scheduler.get_stats()["running"])
+        metrics.REVIEWS_QUEUED.set_function(lambda: scheduler.get_stats()["queued"])
+        metrics.REVIEW_SESSIONS.set_function(lambda: len(session_store))
+        
+        # 启动磁盘回收，启动时先回收一次上次运行遗留的过期文件
+        gc_task = asyncio.create_task(disk_gc_loop(workspace_config["gc_interval_seconds"]))
+        
         yield
     except Exception as e:
         logger.error(f"应用初始化失败: {str(e)}")
         raise
     finally:
+        if gc_task:
+            gc_task.cancel()
+        if prewarm_task:
+            prewarm_task.cancel()
+        if scheduler:
+            await scheduler.shutdown()
+        if role_manager:
+            await role_manager.transports.aclose()
+        if role_manager and role_manager.response_cache:
+            role_manager.response_cache.close()
         if file_parser:
             file_parser.cleanup()
             logger.info("临时文件已清理")
@@ -120,8 +214,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# multipart请求体中除文件内容外的边界和字段头的余量
+UPLOAD_BODY_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_upload(request: Request, call_next):
+    """根据Content-Length提前拒绝超出大小限制的上传，不读取请求体"""
+    if request.method == "POST" and request.url.path == "/upload" and upload_store is not None:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > upload_store.max_bytes + UPLOAD_BODY_OVERHEAD:
+            limit_mb = upload_store.max_bytes // (1024 * 1024)
+            return JSONResponse(status_code=413, content={"detail": f"文件大小超过限制（{limit_mb}MB）"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def count_responses(request: Request, call_next):
+    """按方法、路由和状态码统计接口响应，未匹配路由的请求记为unmatched"""
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # 使用路由模板而不是实际路径，避免review_id使标签取值无限增长
+        route = request.scope.get("route")
+        metrics.HTTP_RESPONSES.inc(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
 # 挂载静态文件目录
-app.mount("/reports", StaticFiles(directory=REPORT_DIR), name="reports")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.get("/")
@@ -131,166 +255,418 @@ async def read_root():
     return FileResponse("static/index.html")
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """上传文件处理函数"""
-    global file_parser, role_manager, review_process, active_review, log_collector
+async def upload_file(file: UploadFile = File(...), reuse_session: bool = False):
+    """上传文件处理函数
+    
+    文件按内容寻址存储，每次上传创建独立的审查会话，不同用户上传同一文件互不影响。
+    
+    Args:
+        file: 上传的文件
+        reuse_session: 为True时审查ID只由文件内容摘要和文件名确定，
+            同一文件已有审查会话时直接返回该会话
+    """
+    global file_parser, role_manager, session_store
     
     # 检查文件格式
     file_ext = Path(file.filename).suffix.lower()
     if file_ext not in [".docx", ".pdf"]:
         raise HTTPException(status_code=400, detail="不支持的文件格式，仅支持.docx和.pdf格式")
     
-    # 检查文件大小
-    file_size = 0
-    chunk_size = 1024 * 1024  # 1MB
-    
-    # 创建临时文件
-    temp_file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(temp_file_path, "wb") as buffer:
-        while True:
-            chunk = await file.read(chunk_size)
-            if not chunk:
-                break
-            file_size += len(chunk)
-            if file_size > 10 * 1024 * 1024:  # 10MB
-                raise HTTPException(status_code=400, detail="文件大小超过限制（10MB）")
-            buffer.write(chunk)
+    # 异步流式写入存储，同时计算内容摘要并检查文件大小
+    try:
+        stored = await upload_store.save(file, file_ext)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
     try:
-        # 清空日志收集器
-        log_collector.clear()
-        
-        # 创建审查流程实例
-        review_process = ReviewProcess(role_manager, file_parser)
-        active_review = {
-            "file_name": file.filename,
-            "file_path": temp_file_path,
-            "status": "已上传",
-            "review_id": str(hash(file.filename + str(os.path.getmtime(temp_file_path))))
-        }
+        nonce = None if reuse_session else uuid.uuid4().hex
+        review_id = UploadStore.review_id_for(stored.file_hash, file.filename, nonce)
+        session = session_store.get(review_id)
+        reused = session is not None
+        if session is None:
+            # 创建审查工作目录、审查流程实例，并登记到会话仓库
+            workspace_manager.create(review_id)
+            deadline_config = config_manager.get_deadline_config()
+            session = session_store.add(ReviewSession(
+                review_id=review_id,
+                file_name=file.filename,
+                file_path=stored.path,
+                process=ReviewProcess(role_manager, file_parser, document_chunker,
+                                      temp_dir=workspace_manager.temp_dir(review_id),
+                                      call_timeout=deadline_config["call_timeout_seconds"],
+                                      stage_timeout=deadline_config["stage_timeout_seconds"]),
+                log_capacity=config_manager.get_session_config()["log_capacity"],
+                file_hash=stored.file_hash
+            ))
         
         return {
             "message": "文件上传成功",
             "file_name": file.filename,
-            "file_size": file_size,
-            "review_id": active_review["review_id"]
+            "file_size": stored.size,
+            "review_id": session.review_id,
+            "file_hash": stored.file_hash,
+            "reused_session": reused,  # 请求复用且同一文件已有审查会话
+            "parse_cache_hit": file_parser.is_cached(stored.file_hash)  # 相同内容已解析过，分析时跳过解析
         }
     except Exception as e:
         logger.error(f"文件上传处理失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
+    finally:
+        # 会话已登记（或处理失败），文件改由会话引用保护
+        upload_store.unpin(stored.path)
 
-@app.post("/analyze/{review_id}")
-async def analyze_document(review_id: str, background_tasks: BackgroundTasks):
-    """分析文档处理函数"""
-    global review_process, active_review
+def get_session(review_id: str) -> ReviewSession:
+    """从会话仓库获取审查会话
     
-    if not review_process or not active_review or active_review["review_id"] != review_id:
+    Args:
+        review_id: 审查ID
+        
+    Returns:
+        审查会话
+        
+    Raises:
+        HTTPException: 会话不存在或已被淘汰时返回404
+    """
+    session = session_store.get(review_id) if session_store else None
+    if session is None:
         raise HTTPException(status_code=404, detail="未找到有效的审查任务")
+    return session
+
+def ensure_idle(session: ReviewSession) -> None:
+    """确保会话当前没有正在执行的阶段任务
+    
+    Args:
+        session: 审查会话
+    """
+    if session.busy:
+        raise HTTPException(status_code=409, detail="审查任务正在执行中，请稍后再试")
+
+def schedule_stage(session: ReviewSession, stage: str, func) -> Dict[str, Any]:
+    """将审查阶段提交到调度队列
+    
+    Args:
+        session: 审查会话
+        stage: 阶段名称
+        func: 执行阶段的协程函数，参数为审查会话
+        
+    Returns:
+        排队信息字典
+    """
+    try:
+        scheduler.submit(session.review_id, stage, run_stage, session, func)
+    except SchedulerFullError as e:
+        raise HTTPException(status_code=503, detail=f"{str(e)}，请稍后再试")
+    session.busy = True
+    return scheduler.get_queue_info(session.review_id)
+
+async def run_stage(session: ReviewSession, func) -> None:
+    """在审查上下文中执行阶段，阶段内的日志写入该审查的日志缓冲区，
+    模型调用写入该审查的调用记录
+    
+    Args:
+        session: 审查会话
+        func: 执行阶段的协程函数
+    """
+    workspace_manager.touch(session.review_id)
+    with bind_review(session.review_id, session.logs), bind_telemetry(session.process.telemetry):
+        await func(session)
+
+# 审查阶段的中文名称
+STAGE_LABELS = {"analysis": "分析", "discussion": "讨论", "summary": "总结"}
+
+def start_stage(session: ReviewSession, stage: str, pause_between_stages: bool = False) -> Dict[str, Any]:
+    """检查前置阶段后将审查阶段提交到调度队列
+    
+    Args:
+        session: 审查会话
+        stage: 阶段名称（analysis/discussion/summary），review表示依次执行所有未完成的阶段
+        pause_between_stages: 一键审查时是否在每个阶段完成后暂停等待确认
+        
+    Returns:
+        排队信息字典
+    """
+    ensure_idle(session)
+    if stage == "review":
+        if next_stage(session) is None:
+            raise HTTPException(status_code=400, detail="审查已全部完成")
+        session.pause_between_stages = pause_between_stages
+        session.awaiting_stage = None
+        return schedule_stage(session, stage, start_pipeline)
+    session.awaiting_stage = None
+    if stage == "analysis":
+        return schedule_stage(session, stage, start_analysis)
+    if stage == "discussion":
+        if "analysis_results" not in session.results:
+            raise HTTPException(status_code=400, detail="请先完成文档分析阶段")
+        return schedule_stage(session, stage, start_discussion)
+    if stage == "summary":
+        if "discussion_results" not in session.results:
+            raise HTTPException(status_code=400, detail="请先完成文档讨论阶段")
+        return schedule_stage(session, stage, start_summary)
+    raise HTTPException(status_code=400, detail=f"未知的审查阶段: {stage}")
+
+def next_stage(session: ReviewSession) -> Optional[str]:
+    """根据已完成的阶段确定下一个审查阶段
+    
+    Args:
+        session: 审查会话
+        
+    Returns:
+        阶段名称，全部完成时返回None
+    """
+    if "analysis_results" not in session.results:
+        return "analysis"
+    if "discussion_results" not in session.results:
+        return "discussion"
+    if "final_report" not in session.results:
+        return "summary"
+    return None
+
+def cancel_review(session: ReviewSession) -> Optional[str]:
+    """取消审查会话排队中或执行中的阶段
+    
+    Args:
+        session: 审查会话
+        
+    Returns:
+        被取消任务原来的状态（queued/running，一键审查等待确认时为paused），没有可取消的任务时返回None
+    """
+    if session.awaiting_stage is not None and not session.busy:
+        # 一键审查暂停等待确认时取消，不再继续后续阶段
+        session.awaiting_stage = None
+        session.set_status("已取消")
+        return "paused"
+    state = scheduler.cancel(session.review_id)
+    if state == "queued":
+        # 排队中的任务不会再执行，在这里释放会话
+        session.busy = False
+        session.set_status("已取消")
+    return state
+
+@app.post("/cancel/{review_id}")
+async def cancel_review_stage(review_id: str):
+    """取消审查：排队中的阶段移出队列，执行中的阶段被中断，进行中的模型调用随之中止"""
+    session = get_session(review_id)
+    state = cancel_review(session)
+    if state is None:
+        raise HTTPException(status_code=409, detail="审查任务没有排队或执行中的阶段")
+    return {
+        "message": "审查已取消",
+        "review_id": review_id,
+        "cancelled": state
+    }
+
+@app.post("/analyze/{review_id}")
+async def analyze_document(review_id: str):
+    """分析文档处理函数"""
+    session = get_session(review_id)
     
     try:
-        # 在后台任务中执行分析
-        background_tasks.add_task(start_analysis, active_review["file_path"])
+        # 提交到调度队列执行分析
+        queue_info = start_stage(session, "analysis")
         
         return {
             "message": "文档分析已开始",
-            "review_id": review_id
+            "review_id": review_id,
+            "queue": queue_info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"文档分析失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"文档分析失败: {str(e)}")
 
-async def start_analysis(file_path: str):
+async def start_analysis(session: ReviewSession):
     """开始文档分析"""
-    global review_process, active_review
-    
     try:
         # 执行分析阶段
-        analysis_results = await review_process.analyze_document(file_path)
-        active_review["status"] = "分析完成"
-        active_review["analysis_results"] = analysis_results
-        logger.info(f"文档分析完成: {file_path}")
+        analysis_results = await session.process.analyze_document(session.file_path, session.file_hash,
+                                                                    session.file_name)
+        record_stage_result(session, "analysis", analysis_results)
+        logger.info(f"文档分析完成: {session.file_path}")
+    except asyncio.CancelledError:
+        session.set_status("已取消")
+        logger.info(f"文档分析已取消: {session.file_path}")
+        raise
     except Exception as e:
-        active_review["status"] = f"分析失败: {str(e)}"
+        session.set_status(f"分析失败: {str(e)}")
         logger.error(f"文档分析失败: {str(e)}")
+    finally:
+        session.busy = False
 
 @app.post("/discuss/{review_id}")
-async def discuss_document(review_id: str, background_tasks: BackgroundTasks):
+async def discuss_document(review_id: str):
     """讨论文档处理函数"""
-    global review_process, active_review
-    
-    if not review_process or not active_review or active_review["review_id"] != review_id:
-        raise HTTPException(status_code=404, detail="未找到有效的审查任务")
-    
-    if active_review["status"] != "分析完成":
-        raise HTTPException(status_code=400, detail="请先完成文档分析阶段")
+    session = get_session(review_id)
     
     try:
-        # 在后台任务中执行讨论
-        background_tasks.add_task(start_discussion)
+        # 提交到调度队列执行讨论
+        queue_info = start_stage(session, "discussion")
         
         return {
             "message": "文档讨论已开始",
-            "review_id": review_id
+            "review_id": review_id,
+            "queue": queue_info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"文档讨论失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"文档讨论失败: {str(e)}")
 
-async def start_discussion():
+async def start_discussion(session: ReviewSession):
     """开始文档讨论"""
-    global review_process, active_review
-    
     try:
         # 执行讨论阶段
-        discussion_results = await review_process.discuss_document()
-        active_review["status"] = "讨论完成"
-        active_review["discussion_results"] = discussion_results
+        discussion_results = await session.process.discuss_document()
+        record_stage_result(session, "discussion", discussion_results)
         logger.info("文档讨论完成")
+    except asyncio.CancelledError:
+        session.set_status("已取消")
+        logger.info("文档讨论已取消")
+        raise
     except Exception as e:
-        active_review["status"] = f"讨论失败: {str(e)}"
+        session.set_status(f"讨论失败: {str(e)}")
         logger.error(f"文档讨论失败: {str(e)}")
+    finally:
+        session.busy = False
 
 @app.post("/summarize/{review_id}")
-async def summarize_document(review_id: str, background_tasks: BackgroundTasks):
+async def summarize_document(review_id: str):
     """总结文档处理函数"""
-    global review_process, active_review
-    
-    if not review_process or not active_review or active_review["review_id"] != review_id:
-        raise HTTPException(status_code=404, detail="未找到有效的审查任务")
-    
-    if active_review["status"] != "讨论完成":
-        raise HTTPException(status_code=400, detail="请先完成文档讨论阶段")
+    session = get_session(review_id)
     
     try:
-        # 在后台任务中执行总结
-        background_tasks.add_task(start_summary, review_id)
+        # 提交到调度队列执行总结
+        queue_info = start_stage(session, "summary")
         
         return {
             "message": "文档总结已开始",
-            "review_id": review_id
+            "review_id": review_id,
+            "queue": queue_info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"文档总结失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"文档总结失败: {str(e)}")
 
-async def start_summary(review_id: str):
+async def start_summary(session: ReviewSession):
     """开始文档总结"""
-    global review_process, active_review
-    
     try:
         # 执行总结阶段
-        final_report = await review_process.generate_summary()
-        active_review["status"] = "总结完成"
-        active_review["final_report"] = final_report
-        
-        # 生成HTML报告
-        report_path = generate_html_report(review_id, final_report)
-        active_review["report_path"] = report_path
+        final_report = await session.process.generate_summary()
+        record_stage_result(session, "summary", final_report)
         
         logger.info("文档总结完成")
+    except asyncio.CancelledError:
+        session.set_status("已取消")
+        logger.info("文档总结已取消")
+        raise
     except Exception as e:
-        active_review["status"] = f"总结失败: {str(e)}"
+        session.set_status(f"总结失败: {str(e)}")
         logger.error(f"文档总结失败: {str(e)}")
+    finally:
+        session.busy = False
+
+def record_stage_result(session: ReviewSession, stage: str, result: Any) -> None:
+    """保存阶段结果并更新会话状态，总结阶段同时生成HTML报告
+    
+    Args:
+        session: 审查会话
+        stage: 阶段名称（analysis/discussion/summary）
+        result: 阶段结果
+    """
+    if stage == "analysis":
+        session.results["analysis_results"] = result
+    elif stage == "discussion":
+        session.results["discussion_results"] = result
+    else:
+        session.results["final_report"] = result
+        with metrics.REPORT_DURATION.time():
+            session.results["report_path"] = generate_html_report(session.review_id, result)
+    session.set_status(f"{STAGE_LABELS[stage]}完成")
+
+@app.post("/review/{review_id}")
+async def review_document(review_id: str, pause_between_stages: bool = False):
+    """一键审查处理函数：在服务端依次执行所有未完成的阶段
+    
+    pause_between_stages为true时，每个阶段完成后暂停，状态变为"等待确认"，
+    调用/approve后继续下一阶段。
+    """
+    session = get_session(review_id)
+    
+    try:
+        queue_info = start_stage(session, "review", pause_between_stages)
+        
+        return {
+            "message": "一键审查已开始",
+            "review_id": review_id,
+            "pause_between_stages": pause_between_stages,
+            "queue": queue_info
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"一键审查失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"一键审查失败: {str(e)}")
+
+@app.post("/approve/{review_id}")
+async def approve_stage(review_id: str, approved: bool = True):
+    """确认一键审查进入下一阶段，approved为false时结束一键审查"""
+    session = get_session(review_id)
+    stage = session.awaiting_stage
+    if stage is None:
+        raise HTTPException(status_code=400, detail="审查没有在等待确认")
+    
+    if not approved:
+        session.awaiting_stage = None
+        session.set_status(f"{STAGE_LABELS[previous_stage(stage)]}完成")
+        return {"message": "已结束一键审查", "review_id": review_id}
+    
+    queue_info = start_stage(session, "review", session.pause_between_stages)
+    return {
+        "message": f"已确认，开始{STAGE_LABELS[stage]}阶段",
+        "review_id": review_id,
+        "stage": stage,
+        "queue": queue_info
+    }
+
+def previous_stage(stage: str) -> str:
+    """获取指定阶段的前一个阶段
+    
+    Args:
+        stage: 阶段名称（discussion/summary）
+        
+    Returns:
+        前一个阶段的名称
+    """
+    return ReviewProcess.STAGES[ReviewProcess.STAGES.index(stage) - 1]
+
+async def start_pipeline(session: ReviewSession):
+    """依次执行所有未完成的阶段，需要确认时在阶段之间暂停"""
+    async def approve(stage: str) -> bool:
+        return not session.pause_between_stages
+    
+    async def on_stage_complete(stage: str, result: Any) -> None:
+        record_stage_result(session, stage, result)
+        logger.info(f"一键审查{STAGE_LABELS[stage]}阶段完成: {session.review_id}")
+    
+    try:
+        outcome = await session.process.run_all(session.file_path, session.file_hash, approve, on_stage_complete,
+                                                file_name=session.file_name)
+        if outcome["paused_before"]:
+            session.awaiting_stage = outcome["paused_before"]
+            session.set_status(f"等待确认: {STAGE_LABELS[session.awaiting_stage]}阶段")
+    except asyncio.CancelledError:
+        session.set_status("已取消")
+        logger.info(f"一键审查已取消: {session.review_id}")
+        raise
+    except Exception as e:
+        session.set_status(f"审查失败: {str(e)}")
+        logger.error(f"一键审查失败: {str(e)}")
+    finally:
+        session.busy = False
 
 def generate_html_report(review_id: str, final_report: Dict[str, Any]) -> str:
     """生成HTML格式报告
@@ -302,12 +678,9 @@ def generate_html_report(review_id: str, final_report: Dict[str, Any]) -> str:
     Returns:
         报告文件路径
     """
-    # 确保使用绝对值的review_id，避免负号导致的URL问题
-    abs_review_id = abs(int(review_id))
-    report_file = f"{abs_review_id}.html"
-    report_path = os.path.join(os.path.abspath(REPORT_DIR), report_file)
-    # 确保reports目录存在
-    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    # 报告保存在审查的工作目录中，随工作目录一起回收
+    workspace_manager.touch(review_id)
+    report_path = os.path.abspath(workspace_manager.report_path(review_id))
     
     # 处理raw_report字段（如果存在）
     if 'raw_report' in final_report:
@@ -352,6 +725,10 @@ def generate_html_report(review_id: str, final_report: Dict[str, Any]) -> str:
             .problem-location {{ color: #777; font-style: italic; }}
             .expert-name {{ color: #0066cc; font-weight: bold; }}
             .raw-content {{ white-space: pre-wrap; background-color: #f8f9fa; padding: 15px; border-radius: 5px; }}
+            .missing {{ background-color: #f8d7da; padding: 10px; border-left: 4px solid #dc3545; margin-bottom: 10px; }}
+            .usage {{ border-collapse: collapse; margin-bottom: 20px; }}
+            .usage th, .usage td {{ border: 1px solid #ddd; padding: 6px 12px; text-align: right; }}
+            .usage th:first-child, .usage td:first-child {{ text-align: left; }}
         </style>
     </head>
     <body>
@@ -373,6 +750,10 @@ def generate_html_report(review_id: str, final_report: Dict[str, Any]) -> str:
                 {generate_details_html(final_report.get('details', {}))}
             </div>
             
+            {generate_missing_experts_html(final_report.get('missing_experts', []))}
+            
+            {generate_token_usage_html(final_report.get('token_usage'))}
+            
             {generate_raw_report_html(final_report)}
         </div>
     </body>
@@ -448,6 +829,86 @@ def generate_summary_html(final_report: Dict) -> str:
     else:
         return "<p>无问题总览信息</p>"
 
+def generate_missing_experts_html(missing_experts: List[Dict[str, Any]]) -> str:
+    """生成未在期限内完成的专家的HTML内容
+    
+    Args:
+        missing_experts: 缺失专家列表，每项包含stage、model_name、expertise、status和missing_sections
+        
+    Returns:
+        HTML内容，没有缺失专家时为空
+    """
+    if not missing_experts:
+        return ""
+    
+    html = ""
+    for expert in missing_experts:
+        stage = STAGE_LABELS.get(expert.get('stage'), expert.get('stage', ''))
+        if expert.get('status') == 'timeout':
+            detail = "全部片段超时，未参与汇总"
+        else:
+            detail = "超时片段：" + "、".join(expert.get('missing_sections', []))
+        html += f"""
+        <div class="missing">
+            <span class="expert-name">{expert.get('model_name', '')}</span>（{expert.get('expertise', '')}，{stage}阶段）：{detail}
+        </div>
+        """
+    return f"""
+    <h2>未按期完成的专家</h2>
+    <p>以下专家在期限内未返回全部结果，报告仅基于已返回的内容生成。</p>
+    {html}
+    """
+
+def generate_token_usage_html(token_usage: Optional[Dict[str, Any]]) -> str:
+    """生成token用量和估算费用的HTML内容
+    
+    Args:
+        token_usage: 审查的用量汇总，包含total、by_stage和by_model
+        
+    Returns:
+        HTML内容，没有模型调用时为空
+    """
+    if not token_usage or not token_usage["total"]["calls"]:
+        return ""
+    
+    def rows(groups: Dict[str, Dict[str, Any]], labels: Dict[str, str]) -> str:
+        html = ""
+        for name, totals in groups.items():
+            html += f"""
+            <tr>
+                <td>{labels.get(name, name)}</td>
+                <td>{totals['calls']}</td>
+                <td>{totals['prompt_tokens']}</td>
+                <td>{totals['cached_tokens']}</td>
+                <td>{totals['completion_tokens']}</td>
+                <td>{totals['latency_seconds']:.1f}</td>
+                <td>{totals['cost']:.4f}</td>
+            </tr>
+            """
+        return html
+    
+    header = f"""
+    <tr><th></th><th>调用次数</th><th>输入token</th><th>缓存命中</th><th>输出token</th><th>耗时（秒）</th><th>费用（{token_usage['currency']}）</th></tr>
+    """
+    note = ""
+    if token_usage["total"]["cached_calls"]:
+        note += f"<p>其中{token_usage['total']['cached_calls']}次调用命中响应缓存，未调用服务商，不产生费用。</p>"
+    if token_usage["total"]["unpriced_calls"]:
+        note += f"<p>其中{token_usage['total']['unpriced_calls']}次调用的模型未配置价格或服务商未返回用量，未计入费用。</p>"
+    return f"""
+    <h2>Token用量与费用</h2>
+    <table class="usage">
+        {header}
+        {rows(token_usage['by_stage'], {**STAGE_LABELS, 'other': '其他'})}
+        {rows({'合计': token_usage['total']}, {})}
+    </table>
+    <table class="usage">
+        {header}
+        {rows(token_usage['by_model'], {})}
+    </table>
+    {note}
+    """
+
 def generate_raw_report_html(final_report: Dict) -> str:
     """生成原始报告HTML内容
     
@@ -512,69 +973,283 @@ def generate_details_html(details: Dict) -> str:
     return html
 
 @app.get("/progress/{review_id}")
-async def get_progress(review_id: str):
-    """获取审查进度处理函数"""
-    global review_process, active_review, log_collector
+async def get_progress(review_id: str, since: int = 0, responses_since: int = 0):
+    """获取审查进度处理函数
     
-    if not review_process or not active_review or active_review["review_id"] != review_id:
-        raise HTTPException(status_code=404, detail="未找到有效的审查任务")
+    日志按序号增量返回：客户端把上次响应中的log_seq作为since传入，只获取新增日志。
+    模型调用记录同理，把response_seq作为responses_since传入。
+    """
+    session = get_session(review_id)
     
     # 构建响应数据，包含API响应信息
     response_data = {
         "review_id": review_id,
-        "file_name": active_review["file_name"],
-        "status": active_review["status"],
-        "progress": review_process.get_progress(),
-        "logs": log_collector.get_logs()  # 添加日志信息
+        "file_name": session.file_name,
+        "status": session.status,
+        "progress": session.process.get_progress(),
+        "queue": scheduler.get_queue_info(review_id),  # 排队位置和预计开始时间
+        "logs": log_collector.get_logs(session, since),  # 添加since之后的日志信息
+        "log_seq": session.logs.last_seq,
+        "api_responses": session.process.telemetry.api_responses(responses_since),  # 新增的模型调用记录
+        "response_seq": session.process.telemetry.last_seq,
+        "token_usage": session.process.telemetry.get_usage()  # 按阶段和模型累计的token用量、耗时和估算费用
     }
     
-    # 添加API响应信息（如果存在）
-    if "api_responses" in active_review:
-        response_data["api_responses"] = active_review["api_responses"]
-    
     return response_data
 
+@app.get("/stream/{review_id}")
+async def stream_events(review_id: str, request: Request, since: Optional[int] = None):
+    """以Server-Sent Events方式推送审查事件
+    
+    事件类型包括stage（阶段和专家进度变化）、status（会话状态变化）和
+    token（模型输出增量）。未指定since时与/ws相同，只推送快照之后的新事件，
+    不重放缓冲区中的旧事件；断线重连时浏览器会带上Last-Event-ID，从该序号之后继续推送。
+    """
+    session = get_session(review_id)
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = session.process.events.last_seq
+    
+    async def event_generator():
+        # 首先推送当前状态，客户端无需再调用/progress
+        snapshot = {
+            "status": session.status,
+            "progress": session.process.get_progress(),
+            "queue": scheduler.get_queue_info(review_id)
+        }
+        yield f"id: {since}\nevent: snapshot\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+        
+        async for event in session.process.events.subscribe(since, heartbeat=15):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            data = json.dumps(event["data"], ensure_ascii=False)
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# WebSocket命令对应的阶段名称，review表示一键执行所有未完成的阶段
+WS_STAGES = {"analysis", "discussion", "summary", "review"}
+
+def diff_progress(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """计算两次进度之间的变化
+    
+    Args:
+        previous: 上次发送的进度
+        current: 当前进度
+        
+    Returns:
+        只包含变化字段的进度字典，expert_progress只包含状态变化的专家
+    """
+    delta = {key: current[key] for key in ("stage", "status") if previous.get(key) != current.get(key)}
+    previous_experts = previous.get("expert_progress", {})
+    changed_experts = {
+        name: status for name, status in current.get("expert_progress", {}).items()
+        if previous_experts.get(name) != status
+    }
+    if changed_experts:
+        delta["expert_progress"] = changed_experts
+    return delta
+
+async def handle_ws_command(session: ReviewSession, message: Dict[str, Any]) -> Dict[str, Any]:
+    """处理WebSocket客户端命令
+    
+    Args:
+        session: 审查会话
+        message: 客户端消息，action为start/approve/cancel/set_experts/ping
+        
+    Returns:
+        命令执行结果
+    """
+    action = message.get("action")
+    if action == "start":
+        stage = message.get("stage") or next_stage(session)
+        if stage not in WS_STAGES:
+            raise HTTPException(status_code=400, detail="审查已全部完成" if stage is None else f"未知的审查阶段: {stage}")
+        return {"stage": stage, "queue": start_stage(session, stage, bool(message.get("pause_between_stages")))}
+    if action == "approve":
+        if session.awaiting_stage is None:
+            raise HTTPException(status_code=400, detail="审查没有在等待确认")
+        stage = session.awaiting_stage
+        return {"stage": stage, "queue": start_stage(session, "review", session.pause_between_stages)}
+    if action == "cancel":
+        return {"cancelled": cancel_review(session)}
+    if action == "set_experts":
+        ensure_idle(session)
+        try:
+            return {"experts": session.process.select_experts(message.get("experts"))}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if action == "ping":
+        return {"queue": scheduler.get_queue_info(session.review_id)}
+    raise HTTPException(status_code=400, detail=f"未知的命令: {action}")
+
+@app.websocket("/ws/{review_id}")
+async def review_websocket(websocket: WebSocket, review_id: str, since: int = 0):
+    """审查控制通道
+    
+    服务端推送snapshot（连接时的完整状态）、stage（进度变化部分）、status和token事件；
+    客户端发送{"action": "start"|"approve"|"cancel"|"set_experts"|"ping", ...}命令，
+    服务端以ack或error消息回复。
+    """
+    session = session_store.get(review_id) if session_store else None
+    if session is None:
+        await websocket.close(code=4404, reason="review not found")
+        return
+    await websocket.accept()
+    
+    last_progress = json.loads(json.dumps(session.process.get_progress()))
+    await websocket.send_json({
+        "type": "snapshot",
+        "seq": session.process.events.last_seq,
+        "data": {
+            "status": session.status,
+            "progress": last_progress,
+            "queue": scheduler.get_queue_info(review_id)
+        }
+    })
+    
+    async def push_events():
+        nonlocal last_progress
+        async for event in session.process.events.subscribe(since or session.process.events.last_seq, heartbeat=15):
+            if event is None:
+                await websocket.send_json({"type": "ping"})
+                continue
+            data = event["data"]
+            if event["type"] == "stage":
+                delta = diff_progress(last_progress, data)
+                last_progress = data
+                if not delta:
+                    continue
+                data = delta
+            await websocket.send_json({"type": event["type"], "seq": event["seq"], "data": data})
+    
+    async def receive_commands():
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            try:
+                result = await handle_ws_command(session, message if isinstance(message, dict) else {})
+                await websocket.send_json({"type": "ack", "action": action, "data": result})
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "action": action, "message": e.detail})
+    
+    tasks = [asyncio.create_task(push_events()), asyncio.create_task(receive_commands())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.error(f"WebSocket连接异常: {str(task.exception())}")
+        if tasks[0] in done and tasks[0].exception() is None:
+            # 会话已被淘汰，事件流结束
+            await websocket.close()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
 @app.get("/report/{review_id}")
 async def get_report(review_id: str):
     """获取审查报告处理函数"""
-    global active_review
+    session = get_session(review_id)
     
-    if not active_review or active_review["review_id"] != review_id:
-        raise HTTPException(status_code=404, detail="未找到有效的审查任务")
-    
-    if active_review["status"] != "总结完成":
+    if session.status != "总结完成":
         raise HTTPException(status_code=400, detail="审查报告尚未生成完成")
     
-    # 确保reports目录存在
-    os.makedirs(REPORT_DIR, exist_ok=True)
+    # 优先使用生成报告时记录的路径，否则按review_id推断
+    report_file_path = session.results.get("report_path") or workspace_manager.report_path(review_id)
     
-    # 确保report_url使用绝对值的review_id，避免负号导致的URL问题
-    # 检查是否存在report_path
-    if "report_path" in active_review:
-        # 从report_path中提取文件名
-        report_filename = os.path.basename(active_review["report_path"])
-        report_url = f"/reports/{report_filename}"
-        
-        # 检查报告文件是否存在
-        report_file_path = os.path.join(REPORT_DIR, report_filename)
-        if not os.path.exists(report_file_path):
-            raise HTTPException(status_code=404, detail="报告文件不存在")
-    else:
-        # 兼容旧逻辑，使用绝对值的review_id
-        abs_review_id = abs(int(review_id))
-        report_filename = f"{abs_review_id}.html"
-        report_url = f"/reports/{report_filename}"
-        
-        # 检查报告文件是否存在
-        report_file_path = os.path.join(REPORT_DIR, report_filename)
-        if not os.path.exists(report_file_path):
-            raise HTTPException(status_code=404, detail="报告文件不存在")
+    # 检查报告文件是否存在（工作目录可能已被回收）
+    if not os.path.exists(report_file_path):
+        raise HTTPException(status_code=404, detail="报告文件不存在")
     
     return {
         "review_id": review_id,
-        "report_url": report_url,
-        "final_report": active_review["final_report"]
+        "report_url": f"/reports/{review_id}.html",
+        "final_report": session.results["final_report"]
+    }
+
+@app.get("/reports/{report_file}")
+async def download_report(report_file: str):
+    """返回审查工作目录中的HTML报告，URL格式为/reports/<review_id>.html"""
+    review_id, ext = os.path.splitext(report_file)
+    if ext != ".html":
+        raise HTTPException(status_code=404, detail="报告文件不存在")
+    try:
+        report_path = workspace_manager.report_path(review_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="报告文件不存在")
+    if not os.path.exists(report_path):
+        raise HTTPException(status_code=404, detail="报告文件不存在")
+    workspace_manager.touch(review_id)
+    return FileResponse(report_path, media_type="text/html")
+
+@app.get("/storage/stats")
+async def get_storage_stats():
+    """获取审查工作目录和上传文件的磁盘占用及回收统计"""
+    workspaces, uploads = await asyncio.gather(
+        to_thread(workspace_manager.get_stats),
+        to_thread(upload_store.get_stats)
+    )
+    return {"workspaces": workspaces, "uploads": uploads}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """获取模型响应缓存的命中统计"""
+    if role_manager.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **role_manager.response_cache.get_stats()}
+
+@app.get("/transport/stats")
+async def get_transport_stats():
+    """获取各模型端点共享连接池的状态"""
+    return role_manager.transports.get_stats()
+
+@app.get("/hedge/stats")
+async def get_hedge_stats():
+    """获取各专家的对冲请求统计"""
+    return {"experts": role_manager.get_hedge_stats()}
+
+@app.get("/usage/summary")
+async def get_usage_summary():
+    """获取服务启动以来的token用量和估算费用，以及当前各审查的用量"""
+    reviews = [
+        {
+            "review_id": session.review_id,
+            "file_name": session.file_name,
+            "status": session.status,
+            **session.process.telemetry.get_usage()["total"]
+        }
+        for session in (session_store.list_sessions() if session_store else [])
+    ]
+    return {
+        **role_manager.usage_ledger.summary(),
+        # 费用最高的审查排在前面
+        "reviews": sorted(reviews, key=lambda review: review["cost"], reverse=True)
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """以Prometheus文本格式输出监控指标"""
+    if not metrics.REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="监控指标未启用")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.delete("/cache")
+async def clear_cache():
+    """清空模型响应缓存"""
+    if role_manager.response_cache is None:
+        raise HTTPException(status_code=400, detail="响应缓存未启用")
+    role_manager.response_cache.clear()
+    return {"message": "响应缓存已清空"}
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8002, reload=True)
\ No newline at end of file
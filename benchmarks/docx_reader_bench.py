@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Word文档解析基准：对比python-docx整树解析与流式读取的耗时和峰值内存
+
+用法:
+    python benchmarks/docx_reader_bench.py [--paragraphs 50000] [--table-every 200]
+
+每种方式在独立的子进程中运行，峰值内存取子进程的最大常驻内存（RSS）
+与导入依赖后当前常驻内存的差值，避免不同方式之间互相影响。
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def make_large_docx(path: str, paragraphs: int, table_every: int) -> None:
+    """生成包含大量段落、标题和表格的Word文档
+
+    以python-docx创建的空白文档为模板（保留样式表），直接写入正文XML，
+    避免逐段调用python-docx生成超大文档过慢。
+    """
+    import docx
+    template = path + ".template"
+    docx.Document().save(template)
+
+    body = []
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            body.append(f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>第{i // 50 + 1}章</w:t></w:r></w:p>')
+        text = escape(f"第{i + 1}段：本段用于测试解析性能，包含一定长度的中文正文内容。" * 3)
+        body.append(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>")
+        if table_every and i % table_every == table_every - 1:
+            rows = "".join(
+                f"<w:tr>{''.join(f'<w:tc><w:p><w:r><w:t>单元格{r}-{c}</w:t></w:r></w:p></w:tc>' for c in range(4))}</w:tr>"
+                for r in range(5)
+            )
+            body.append(f"<w:tbl>{rows}</w:tbl>")
+    document = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                f'<w:document xmlns:w="{W_NS}"><w:body>{"".join(body)}<w:sectPr/></w:body></w:document>')
+
+    with zipfile.ZipFile(template) as source, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = document.encode("utf-8") if item.filename == "word/document.xml" else source.read(item.filename)
+            target.writestr(item, data)
+    os.remove(template)
+
+
+def parse_with_python_docx(path: str) -> int:
+    """原实现：加载python-docx整棵文档树，分两次遍历段落"""
+    import docx
+    doc = docx.Document(path)
+    paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+    headings = [para.text for para in doc.paragraphs if para.style.name.startswith("Heading")]
+    return len(paragraphs) + len(headings)
+
+
+def parse_with_stream_reader(path: str) -> int:
+    """流式读取：单次遍历document.xml，同时提取表格、页眉页脚和注释"""
+    from modules.docx_reader import read_docx
+    result = read_docx(path)
+    return len(result["paragraphs"]) + len(result["headings"])
+
+
+def _current_rss_kb() -> int:
+    """当前常驻内存（KB），非Linux平台退化为最大常驻内存"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(name: str, path: str, queue) -> None:
+    """子进程入口：导入依赖后记录基线内存，再执行解析"""
+    import docx  # noqa: F401
+    from modules import docx_reader  # noqa: F401
+    baseline = _current_rss_kb()
+    started_at = time.perf_counter()
+    count = METHODS[name](path)
+    elapsed = time.perf_counter() - started_at
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - baseline) / 1024, count))
+
+
+METHODS = {
+    "python-docx": parse_with_python_docx,
+    "stream": parse_with_stream_reader
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Word文档解析基准")
+    parser.add_argument("--paragraphs", type=int, default=50000, help="正文段落数")
+    parser.add_argument("--table-every", type=int, default=200, help="每隔多少段插入一个表格，0表示不插入")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式的运行次数，取耗时中位数")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docx-bench-")
+    try:
+        path = os.path.join(workdir, "large.docx")
+        make_large_docx(path, args.paragraphs, args.table_every)
+        print(f"文档: {args.paragraphs}段，{os.path.getsize(path) / 1024 / 1024:.1f}MB（压缩后）")
+        print(f"{'方式':<14}{'耗时中位数(秒)':>16}{'峰值内存增量(MB)':>20}{'段落+标题':>12}")
+
+        context = multiprocessing.get_context("spawn")
+        for name in METHODS:
+            runs = []
+            for _ in range(args.repeat):
+                queue = context.Queue()
+                process = context.Process(target=_measure, args=(name, path, queue))
+                process.start()
+                runs.append(queue.get())
+                process.join()
+            runs.sort()
+            elapsed, memory, count = runs[len(runs) // 2]
+            print(f"{name:<14}{elapsed:>16.2f}{max(memory, 0):>20.1f}{count:>12}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""本地OpenAI兼容模拟服务，用于在不访问真实服务商的情况下压测审查流程
+
+用法:
+    python benchmarks/mock_openai_server.py [--port 9100] [--latency-dist lognormal] [--latency-mean 1.0]
+                                            [--error-rate 0.01] [--rate-limit-rate 0.02]
+
+提供/v1/chat/completions（支持stream和stream_options.include_usage）和/v1/models，
+/stats返回收到的请求数、注入的错误数和429次数。每次调用的耗时从指定分布中抽样，
+流式调用先等待首个数据块的耗时，再把剩余耗时平均分到各个数据块之间。
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Dict, Any
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class LatencyModel:
+    """调用耗时分布"""
+
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, dist: str = "lognormal", mean: float = 1.0, spread: float = 0.5, seed=None):
+        """初始化耗时分布
+
+        Args:
+            dist: 分布类型，fixed为固定值，uniform为[mean-spread, mean+spread]均匀分布，
+                normal为标准差为spread的正态分布，lognormal为对数标准差为spread、均值为mean的对数正态分布
+            mean: 平均耗时（秒）
+            spread: 分布的离散程度，含义见dist
+            seed: 随机数种子
+        """
+        if dist not in self.DISTRIBUTIONS:
+            raise ValueError(f"不支持的耗时分布: {dist}")
+        self.dist = dist
+        self.mean = mean
+        self.spread = spread
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        """抽样一次调用耗时（秒）"""
+        if self.dist == "fixed":
+            value = self.mean
+        elif self.dist == "uniform":
+            value = self.random.uniform(self.mean - self.spread, self.mean + self.spread)
+        elif self.dist == "normal":
+            value = self.random.gauss(self.mean, self.spread)
+        else:
+            # 对数正态分布的均值为exp(mu + sigma^2/2)，据此反推mu使均值等于mean
+            mu = math.log(self.mean) - self.spread ** 2 / 2
+            value = self.random.lognormvariate(mu, self.spread)
+        return max(value, 0.0)
+
+
+def create_app(latency: LatencyModel, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+               retry_after: float = 1.0, output_chars: int = 200, chunks: int = 20,
+               first_chunk_ratio: float = 0.3) -> FastAPI:
+    """创建模拟服务
+
+    Args:
+        latency: 调用耗时分布
+        error_rate: 返回500错误的请求比例
+        rate_limit_rate: 返回429限流的请求比例
+        retry_after: 429响应中Retry-After的秒数
+        output_chars: 每次回复的字符数
+        chunks: 流式回复的数据块数
+        first_chunk_ratio: 首个数据块到达时间占总耗时的比例
+
+    Returns:
+        FastAPI应用
+    """
+    app = FastAPI()
+    stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0, "started_at": time.time()}
+    text = ("模拟审查意见：本段表述基本清晰，建议补充数据来源并统一术语。" * (output_chars // 30 + 1))[:output_chars]
+    pieces = [text[i * len(text) // chunks:(i + 1) * len(text) // chunks] for i in range(chunks)]
+
+    def usage(body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt_tokens = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text),
+            "total_tokens": prompt_tokens + len(text),
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+
+    def chunk(body: Dict[str, Any], **fields) -> str:
+        data = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "mock"), **fields}
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        roll = latency.random.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+                content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}
+            )
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            # 错误响应同样经过一段耗时，模拟服务端处理到一半失败
+            await asyncio.sleep(latency.sample() * first_chunk_ratio)
+            return JSONResponse(status_code=500, content={"error": {"message": "Injected failure", "type": "server_error"}})
+
+        elapsed = latency.sample()
+        if not body.get("stream"):
+            await asyncio.sleep(elapsed)
+            return {
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage(body)
+            }
+
+        stats["streams"] += 1
+
+        async def generate():
+            await asyncio.sleep(elapsed * first_chunk_ratio)
+            interval = elapsed * (1 - first_chunk_ratio) / max(len(pieces) - 1, 1)
+            for index, piece in enumerate(pieces):
+                if index:
+                    await asyncio.sleep(interval)
+                yield chunk(body, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            yield chunk(body, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(body, choices=[], usage=usage(body))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加模拟服务的命令行参数，压测脚本复用同一组参数"""
+    parser.add_argument("--latency-dist", choices=LatencyModel.DISTRIBUTIONS, default="lognormal", help="调用耗时分布")
+    parser.add_argument("--latency-mean", type=float, default=1.0, help="平均调用耗时（秒）")
+    parser.add_argument("--latency-spread", type=float, default=0.5, help="耗时离散程度：uniform为半宽，normal为标准差，lognormal为对数标准差")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500错误的请求比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429限流的请求比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429响应中Retry-After的秒数")
+    parser.add_argument("--output-chars", type=int, default=200, help="每次回复的字符数")
+    parser.add_argument("--chunks", type=int, default=20, help="流式回复的数据块数")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子")
+
+
+def mock_options(args: argparse.Namespace) -> list:
+    """把解析后的参数还原为命令行参数，用于启动模拟服务子进程"""
+    options = [
+        "--latency-dist", args.latency_dist, "--latency-mean", str(args.latency_mean),
+        "--latency-spread", str(args.latency_spread), "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate), "--retry-after", str(args.retry_after),
+        "--output-chars", str(args.output_chars), "--chunks", str(args.chunks)
+    ]
+    if args.seed is not None:
+        options += ["--seed", str(args.seed)]
+    return options
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=9100, help="监听端口")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_app(
+        LatencyModel(args.latency_dist, args.latency_mean, args.latency_spread, args.seed),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        output_chars=args.output_chars,
+        chunks=args.chunks
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
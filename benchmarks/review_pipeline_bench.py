@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""审查流程端到端基准：用本地模拟服务代替模型服务商，压测真实的FastAPI服务
+
+用法:
+    python benchmarks/review_pipeline_bench.py [--reviews 20] [--concurrency 5] [--experts 3]
+                                               [--latency-mean 1.0] [--rate-limit-rate 0.02]
+                                               [--save-baseline] [--compare]
+
+启动模拟服务（benchmarks/mock_openai_server.py）和使用临时工作目录、指向模拟服务的审查服务，
+以concurrency个并发客户端依次执行/upload、/analyze、/discuss、/summarize，
+每个阶段的耗时从提交请求算到/progress显示该阶段完成，包含排队时间。
+输出各阶段耗时的p50/p95/p99和每分钟完成的审查数。
+
+--save-baseline把结果保存为基线，--compare与基线比较，任一阶段的耗时分位数
+或吞吐量变差超过--tolerance时以退出码1结束，可用于回归检查。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+from docx_reader_bench import make_large_docx
+from mock_openai_server import add_arguments, mock_options
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "review_pipeline.json")
+
+# 阶段接口和完成后的会话状态
+STAGES = (("analysis", "analyze", "分析完成"), ("discussion", "discuss", "讨论完成"), ("summary", "summarize", "总结完成"))
+# 输出和比较的耗时分位数
+PERCENTILES = (50, 95, 99)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """按最近秩法计算分位数，与对冲策略的阈值计算方式一致"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    summary = {"count": len(values), "mean": round(sum(values) / len(values), 3) if values else None}
+    for p in PERCENTILES:
+        value = percentile(values, p)
+        summary[f"p{p}"] = round(value, 3) if value is not None else None
+    return summary
+
+
+def write_config(workdir: str, mock_base: str, args: argparse.Namespace) -> None:
+    """生成指向模拟服务的审查服务配置，关闭响应缓存和解析缓存，使每次审查都真实调用"""
+    def role(name: str, role_name: str, **extra) -> Dict[str, Any]:
+        return {"api_base": mock_base, "model_name": name, "api_key": "bench", "role_name": role_name, **extra}
+
+    config = {
+        "organizer": role("bench-organizer", "organizer"),
+        "experts": [role(f"bench-expert-{i}", "expert", expertise=f"专家{i}") for i in range(args.experts)],
+        "scheduler": {"max_workers": args.max_workers, "max_queue": max(100, args.reviews * 3)},
+        "session": {"max_sessions": max(100, args.reviews * 2)},
+        "cache": {"enabled": False},
+        "parse_cache": {"enabled": False}
+    }
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    """等待子进程中的服务可以响应"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务进程已退出: {url}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务未在{timeout}秒内启动: {url}")
+
+
+async def wait_status(client: httpx.AsyncClient, review_id: str, done: str, poll_interval: float) -> None:
+    """轮询进度直到会话状态变为done，阶段失败或被取消时抛出异常"""
+    while True:
+        response = await client.get(f"/progress/{review_id}")
+        response.raise_for_status()
+        status = response.json()["status"]
+        if status == done:
+            return
+        if "失败" in status or status == "已取消":
+            raise RuntimeError(status)
+        await asyncio.sleep(poll_interval)
+
+
+async def run_review(client: httpx.AsyncClient, index: int, document: bytes,
+                     args: argparse.Namespace, timings: Dict[str, List[float]]) -> None:
+    """执行一次完整审查，各阶段耗时追加到timings"""
+    review_started = time.monotonic()
+    started_at = review_started
+    # 每次上传创建独立的审查会话，相同内容的文件只存储一份
+    response = await client.post("/upload", files={"file": (f"bench-{index}.docx", document)})
+    response.raise_for_status()
+    review_id = response.json()["review_id"]
+    timings["upload"].append(time.monotonic() - started_at)
+
+    for stage, endpoint, done in STAGES:
+        started_at = time.monotonic()
+        response = await client.post(f"/{endpoint}/{review_id}")
+        response.raise_for_status()
+        await wait_status(client, review_id, done, args.poll_interval)
+        timings[stage].append(time.monotonic() - started_at)
+    timings["review"].append(time.monotonic() - review_started)
+
+
+async def drive(app_url: str, document: bytes, args: argparse.Namespace) -> Dict[str, Any]:
+    """以concurrency个并发客户端完成reviews次审查"""
+    timings: Dict[str, List[float]] = {name: [] for name in ("upload", "analysis", "discussion", "summary", "review")}
+    failures: List[str] = []
+    next_index = iter(range(args.reviews))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for index in next_index:
+            try:
+                await run_review(client, index, document, args, timings)
+            except (httpx.HTTPError, RuntimeError) as e:
+                failures.append(f"bench-{index}: {str(e)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.stage_timeout, limits=limits) as client:
+        started_at = time.monotonic()
+        await asyncio.gather(*[worker(client) for _ in range(args.concurrency)])
+        wall_time = time.monotonic() - started_at
+
+    completed = len(timings["review"])
+    return {
+        "wall_seconds": round(wall_time, 3),
+        "completed": completed,
+        "failed": len(failures),
+        "failures": failures[:10],
+        "reviews_per_minute": round(completed / wall_time * 60, 3) if wall_time else 0.0,
+        "stages": {name: summarize(values) for name, values in timings.items()}
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """启动模拟服务和审查服务，执行压测后关闭"""
+    workdir = tempfile.mkdtemp(prefix="review-bench-")
+    processes: List[subprocess.Popen] = []
+    logs = []
+    try:
+        mock_port, app_port = free_port(), free_port()
+        logs.append(open(os.path.join(workdir, "mock.log"), "w"))
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "mock_openai_server.py"), "--port", str(mock_port)] + mock_options(args),
+            stdout=logs[-1], stderr=subprocess.STDOUT
+        ))
+        mock_url = f"http://127.0.0.1:{mock_port}"
+        await wait_ready(f"{mock_url}/v1/models", processes[-1])
+
+        # 审查服务在临时工作目录中运行，上传文件、工作目录和日志不写入仓库
+        write_config(workdir, f"{mock_url}/v1", args)
+        os.symlink(os.path.join(REPO_DIR, "static"), os.path.join(workdir, "static"))
+        logs.append(open(os.path.join(workdir, "app.out"), "w"))
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", REPO_DIR,
+             "--port", str(app_port), "--log-level", "warning"],
+            cwd=workdir, stdout=logs[-1], stderr=subprocess.STDOUT
+        ))
+        app_url = f"http://127.0.0.1:{app_port}"
+        await wait_ready(f"{app_url}/", processes[-1])
+
+        document_path = os.path.join(workdir, "bench.docx")
+        make_large_docx(document_path, args.paragraphs, table_every=0)
+        with open(document_path, "rb") as f:
+            document = f.read()
+
+        results = await drive(app_url, document, args)
+        async with httpx.AsyncClient() as client:
+            results["mock"] = (await client.get(f"{mock_url}/stats")).json()
+        if args.keep_workdir:
+            print(f"工作目录: {workdir}")
+        return results
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for log in logs:
+            log.close()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回超出容差的退化项"""
+    regressions = []
+    for stage, summary in results["stages"].items():
+        base = baseline["stages"].get(stage, {})
+        for p in PERCENTILES:
+            current, previous = summary.get(f"p{p}"), base.get(f"p{p}")
+            if current is not None and previous and current > previous * (1 + tolerance):
+                regressions.append(f"{stage} p{p}: {previous:.3f}s -> {current:.3f}s (+{current / previous - 1:.0%})")
+    current, previous = results["reviews_per_minute"], baseline["reviews_per_minute"]
+    if previous and current < previous * (1 - tolerance):
+        regressions.append(f"reviews/min: {previous:.2f} -> {current:.2f} ({current / previous - 1:.0%})")
+    return regressions
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    print(f"完成 {results['completed']} 次审查，失败 {results['failed']} 次，"
+          f"耗时 {results['wall_seconds']:.1f} 秒，吞吐量 {results['reviews_per_minute']:.2f} 次/分钟")
+    print(f"{'阶段':<12}{'次数':>6}{'p50(秒)':>10}{'p95(秒)':>10}{'p99(秒)':>10}" + (f"{'基线p95':>10}" if baseline else ""))
+    for stage, summary in results["stages"].items():
+        if not summary["count"]:
+            continue
+        line = f"{stage:<12}{summary['count']:>6}" + "".join(f"{summary[f'p{p}']:>10.3f}" for p in PERCENTILES)
+        if baseline:
+            base = baseline["stages"].get(stage, {}).get("p95")
+            line += f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+        print(line)
+    mock = results.get("mock", {})
+    print(f"模拟服务: 请求 {mock.get('requests', 0)} 次，注入错误 {mock.get('errors', 0)} 次，限流 {mock.get('rate_limited', 0)} 次")
+    for failure in results["failures"]:
+        print(f"  失败: {failure}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="审查流程端到端基准")
+    parser.add_argument("--reviews", type=int, default=20, help="审查总数")
+    parser.add_argument("--concurrency", type=int, default=5, help="同时进行的审查数")
+    parser.add_argument("--experts", type=int, default=3, help="专家数")
+    parser.add_argument("--max-workers", type=int, default=4, help="审查服务同时执行的阶段数（scheduler.max_workers）")
+    parser.add_argument("--paragraphs", type=int, default=200, help="测试文档的段落数，每50段一个章节")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="轮询进度的间隔（秒）")
+    parser.add_argument("--stage-timeout", type=float, default=600, help="单个请求的超时时间（秒）")
+    parser.add_argument("--output", help="把结果另存为JSON文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线比较，退化超出容差时以退出码1结束")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留临时工作目录（含服务日志）")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    results = {
+        "benchmark": "review_pipeline",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "baseline", "save_baseline", "compare", "tolerance", "keep_workdir")},
+        **results
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != results["params"]:
+            print("警告: 基线的压测参数与本次不同，比较结果仅供参考")
+    print_results(results, baseline)
+
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"相对基线退化超过{args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"与基线相比未见超过{args.tolerance:.0%}的退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ from .config_manager import ConfigManager
 from .role_manager import RoleManager, AIModel, OrganizerModel, ExpertModel
 from .file_parser import FileParser
 from .review_process import ReviewProcess
+from .session_store import ReviewSession, ReviewSessionStore
 
 __all__ = [
     'ConfigManager',
@@ -14,5 +15,7 @@ __all__ = [
     'OrganizerModel',
     'ExpertModel',
     'FileParser',
-    'ReviewProcess'
+    'ReviewProcess',
+    'ReviewSession',
+    'ReviewSessionStore'
 ]
\ No newline at end of file
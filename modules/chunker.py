@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Any, List, Optional
+from .rate_limiter import estimate_text_tokens
+
+class DocumentChunker:
+    """按文档结构把文件内容切分为token数受限的章节片段
+
+    Word文档按标题切分章节，PDF按页切分；相邻的短章节合并为一个片段，
+    超出上限的章节在段落边界处拆分，单个超长段落按字符截断。
+    """
+
+    def __init__(self, max_tokens: int = 3000):
+        """初始化切分器
+
+        Args:
+            max_tokens: 单个片段的最大token数
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens必须大于0")
+        self.max_tokens = max_tokens
+
+    def split(self, file_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """切分解析结果
+
+        Args:
+            file_result: FileParser.parse_file的返回结果
+
+        Returns:
+            片段列表，每个片段包含index、title、content、tokens，PDF片段另含pages（起止页码）
+        """
+        if file_result.get("pages"):
+            sections = self._page_sections(file_result["pages"])
+        else:
+            paragraphs = file_result.get("paragraphs")
+            if paragraphs is None:
+                paragraphs = [p for p in file_result.get("content", "").split("\n\n") if p.strip()]
+            sections = self._heading_sections(paragraphs, file_result.get("headings") or [])
+
+        packer = self.packer()
+        chunks = []
+        for section in sections:
+            chunks.extend(packer.add(section))
+        chunks.extend(packer.finish())
+        if not chunks:
+            chunks.append(self.whole_document(file_result))
+        return chunks
+
+    def packer(self) -> "ChunkPacker":
+        """创建增量打包器，用于边解析边切分
+
+        Returns:
+            打包器实例，产出的片段与split对相同章节的切分结果一致
+        """
+        return ChunkPacker(self)
+
+    @staticmethod
+    def whole_document(file_result: Dict[str, Any]) -> Dict[str, Any]:
+        """没有可切分的内容时，把全文作为唯一片段
+
+        Args:
+            file_result: FileParser.parse_file的返回结果
+
+        Returns:
+            片段字典
+        """
+        return {"index": 0, "title": "全文", "content": file_result.get("content", ""), "tokens": 0}
+
+    def _heading_sections(self, paragraphs: List[str], headings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按标题把段落分组为章节，标题之前的段落单独成为一节"""
+        heading_texts = [heading["text"] for heading in headings]
+        next_heading = 0
+        sections = [{"title": "开头部分", "paragraphs": []}]
+        for para in paragraphs:
+            # 标题按在文档中出现的顺序依次匹配，正文中与标题同名的段落不会被误判
+            if next_heading < len(heading_texts) and para == heading_texts[next_heading]:
+                next_heading += 1
+                sections.append({"title": para.strip(), "paragraphs": [para]})
+            else:
+                sections[-1]["paragraphs"].append(para)
+        return [section for section in sections if section["paragraphs"]]
+
+    def _page_sections(self, pages: List[str]) -> List[Dict[str, Any]]:
+        """每页作为一节，页内按行拆分段落"""
+        sections = []
+        for number, page_text in enumerate(pages, start=1):
+            section = self.page_section(number, page_text)
+            if section is not None:
+                sections.append(section)
+        return sections
+
+    @staticmethod
+    def page_section(number: int, page_text: Optional[str]) -> Optional[Dict[str, Any]]:
+        """把一页文本转换为章节，页内按行拆分段落
+
+        Args:
+            number: 页码（从1开始）
+            page_text: 页面文本
+
+        Returns:
+            章节字典，空白页返回None
+        """
+        paragraphs = [p.strip() for p in (page_text or "").split("\n") if p.strip()]
+        if not paragraphs:
+            return None
+        return {"title": f"第{number}页", "paragraphs": paragraphs, "pages": [number, number]}
+
+    def _split_section(self, section: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """在段落边界处把超长章节拆分为多个不超过上限的部分"""
+        parts = []
+        paragraphs: List[str] = []
+        tokens = 0
+        for para in section["paragraphs"]:
+            for piece in self._split_paragraph(para):
+                piece_tokens = estimate_text_tokens(piece)
+                if paragraphs and tokens + piece_tokens > self.max_tokens:
+                    parts.append((paragraphs, tokens))
+                    paragraphs, tokens = [], 0
+                paragraphs.append(piece)
+                tokens += piece_tokens
+        if paragraphs:
+            parts.append((paragraphs, tokens))
+
+        result = []
+        for i, (paragraphs, tokens) in enumerate(parts):
+            title = section["title"] if i == 0 else f"{section['title']}（续{i}）"
+            result.append({"title": title, "paragraphs": paragraphs, "tokens": tokens, "pages": section.get("pages")})
+        return result
+
+    def _split_paragraph(self, para: str) -> List[str]:
+        """把超过上限的单个段落按字符截断为多段"""
+        if estimate_text_tokens(para) <= self.max_tokens:
+            return [para]
+        # 按最坏情况（每个字符1个token）截断，保证每段都不超过上限
+        return [para[i:i + self.max_tokens] for i in range(0, len(para), self.max_tokens)]
+
+    @classmethod
+    def from_config(cls, chunking_config: Dict[str, Any]) -> "DocumentChunker":
+        """根据切分配置创建切分器
+
+        Args:
+            chunking_config: 切分配置字典
+
+        Returns:
+            切分器实例
+        """
+        return cls(max_tokens=chunking_config["max_tokens"])
+
+
+class ChunkPacker:
+    """增量打包器：按顺序接收章节，拆分超长章节并合并相邻的短章节
+
+    当前片段再也放不下下一部分时即产出该片段，因此流式解析时
+    前面的片段不必等待整个文件解析完成。
+    """
+
+    def __init__(self, chunker: DocumentChunker):
+        """初始化打包器
+
+        Args:
+            chunker: 提供token上限和章节拆分规则的切分器
+        """
+        self.chunker = chunker
+        self.count = 0
+        self._current: Optional[Dict[str, Any]] = None
+
+    def add(self, section: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """加入一个章节
+
+        Args:
+            section: 章节字典，包含title、paragraphs，PDF章节另含pages
+
+        Returns:
+            因此而完成的片段列表
+        """
+        done = []
+        for piece in self.chunker._split_section(section):
+            current = self._current
+            if current is not None and current["tokens"] + piece["tokens"] <= self.chunker.max_tokens:
+                current["paragraphs"].extend(piece["paragraphs"])
+                current["tokens"] += piece["tokens"]
+                current["last_title"] = piece["title"]
+                if piece.get("pages"):
+                    current["pages"] = [current["pages"][0], piece["pages"][1]]
+                continue
+            if current is not None:
+                done.append(self._emit(current))
+            self._current = dict(piece, paragraphs=list(piece["paragraphs"]), last_title=piece["title"])
+        return done
+
+    def add_page(self, number: int, page_text: Optional[str]) -> List[Dict[str, Any]]:
+        """加入一页PDF文本
+
+        Args:
+            number: 页码（从1开始）
+            page_text: 页面文本
+
+        Returns:
+            因此而完成的片段列表
+        """
+        section = self.chunker.page_section(number, page_text)
+        return self.add(section) if section is not None else []
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """结束打包，产出最后一个未完成的片段
+
+        Returns:
+            剩余的片段列表
+        """
+        if self._current is None:
+            return []
+        current, self._current = self._current, None
+        return [self._emit(current)]
+
+    def _emit(self, section: Dict[str, Any]) -> Dict[str, Any]:
+        """把合并完成的章节转换为片段"""
+        last_title = section["last_title"]
+        title = section["title"]
+        if section.get("pages"):
+            start, end = section["pages"]
+            title = f"第{start}页" if start == end else f"第{start}-{end}页"
+        elif last_title != title:
+            title = f"{title} ~ {last_title}"
+        content = "\n\n".join(section["paragraphs"])
+        chunk = {
+            "index": self.count,
+            "title": title,
+            "content": content,
+            "tokens": estimate_text_tokens(content)
+        }
+        if section.get("pages"):
+            chunk["pages"] = section["pages"]
+        self.count += 1
+        return chunk
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import contextvars
+import functools
+from typing import Any, Callable
+
+async def to_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在默认线程池中执行同步函数，等同于Python 3.9+的asyncio.to_thread
+
+    Python 3.8没有asyncio.to_thread，这里用run_in_executor实现，并同样复制当前的上下文变量，
+    线程中的日志仍能关联到所属的审查。
+
+    Args:
+        func: 同步函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数的返回值
+    """
+    if hasattr(asyncio, "to_thread"):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, func, *args, **kwargs))
@@ -79,6 +79,180 @@ class ConfigManager:
         """
         return self.config['experts']
     
+    def get_upload_config(self) -> Dict[str, Any]:
+        """获取文件上传配置
+        
+        Returns:
+            上传配置字典，未配置的项使用默认值
+        """
+        defaults = {"directory": "uploads", "max_size_mb": 10, "ttl_seconds": 86400, "max_total_mb": 2048}
+        return {**defaults, **self.config.get('upload', {})}
+    
+    def get_session_config(self) -> Dict[str, Any]:
+        """获取审查会话仓库配置
+        
+        Returns:
+            会话配置字典，未配置的项使用默认值
+        """
+        defaults = {"max_sessions": 100, "ttl_seconds": 3600, "log_capacity": 500}
+        return {**defaults, **self.config.get('session', {})}
+    
+    def get_scheduler_config(self) -> Dict[str, Any]:
+        """获取审查调度配置
+        
+        Returns:
+            调度配置字典，未配置的项使用默认值
+        """
+        defaults = {
+            "max_workers": 4,
+            "max_queue": 100,
+            "endpoint_concurrency": {},
+            "default_endpoint_concurrency": 8,
+            "default_model_concurrency": 4
+        }
+        return {**defaults, **self.config.get('scheduler', {})}
+    
+    def get_rate_limit_config(self) -> Dict[str, Any]:
+        """获取服务商限流配置
+        
+        Returns:
+            限流配置字典，default为默认限流，providers按api_base单独配置
+        """
+        defaults = {"default": {}, "providers": {}}
+        return {**defaults, **self.config.get('rate_limits', {})}
+    
+    def get_retry_config(self) -> Dict[str, Any]:
+        """获取API调用重试配置
+        
+        Returns:
+            重试配置字典，未配置的项使用默认值
+        """
+        defaults = {"max_attempts": 4, "base_delay": 1.0, "max_delay": 30.0, "budget_seconds": 120.0}
+        return {**defaults, **self.config.get('retry', {})}
+    
+    def get_chunking_config(self) -> Dict[str, Any]:
+        """获取文档切分配置
+        
+        Returns:
+            切分配置字典，未配置的项使用默认值
+        """
+        defaults = {"max_tokens": 3000}
+        return {**defaults, **self.config.get('chunking', {})}
+    
+    def get_cache_config(self) -> Dict[str, Any]:
+        """获取模型响应缓存配置
+        
+        Returns:
+            缓存配置字典，未配置的项使用默认值
+        """
+        defaults = {"enabled": True, "path": "cache/responses.db", "max_size_mb": 100, "ttl_seconds": 604800}
+        return {**defaults, **self.config.get('cache', {})}
+    
+    def get_parse_cache_config(self) -> Dict[str, Any]:
+        """获取文件解析结果缓存配置
+        
+        Returns:
+            解析缓存配置字典，未配置的项使用默认值
+        """
+        defaults = {"enabled": True, "directory": "cache/parsed", "memory_entries": 32, "max_disk_entries": 500}
+        return {**defaults, **self.config.get('parse_cache', {})}
+    
+    def get_pdf_config(self) -> Dict[str, Any]:
+        """获取PDF提取配置
+        
+        Returns:
+            PDF提取配置字典，未配置的项使用默认值
+        """
+        defaults = {"backends": ["pypdf2", "pdfplumber"], "sample_pages": 3, "max_workers": 0, "parallel_threshold": 16}
+        return {**defaults, **self.config.get('pdf', {})}
+    
+    def get_parse_pool_config(self) -> Dict[str, Any]:
+        """获取文件解析进程池配置
+        
+        Returns:
+            解析进程池配置字典，未配置的项使用默认值
+        """
+        defaults = {"enabled": True, "max_workers": 2, "timeout_seconds": 120, "memory_limit_mb": 2048}
+        return {**defaults, **self.config.get('parse_pool', {})}
+    
+    def get_workspace_config(self) -> Dict[str, Any]:
+        """获取审查工作目录配置
+        
+        Returns:
+            工作目录配置字典，未配置的项使用默认值
+        """
+        defaults = {
+            "directory": "workspaces",
+            "ttl_seconds": 86400,
+            "max_total_mb": 2048,
+            "gc_interval_seconds": 600,
+            "keep_temp_text": False
+        }
+        return {**defaults, **self.config.get('workspace', {})}
+    
+    def get_http_config(self) -> Dict[str, Any]:
+        """获取模型API的HTTP连接配置
+        
+        Returns:
+            HTTP连接配置字典，未配置的项使用默认值
+        """
+        defaults = {
+            "max_connections": 100,
+            "max_keepalive_connections": 20,
+            "keepalive_expiry": 30,
+            "connect_timeout": 10,
+            "read_timeout": 600,
+            "prewarm_connections": 2
+        }
+        return {**defaults, **self.config.get('http', {})}
+    
+    def get_metrics_config(self) -> Dict[str, Any]:
+        """获取监控指标配置
+        
+        Returns:
+            监控指标配置字典，未配置的项使用默认值
+        """
+        defaults = {"enabled": True}
+        return {**defaults, **self.config.get('metrics', {})}
+    
+    def get_usage_config(self) -> Dict[str, Any]:
+        """获取token用量统计和计价配置
+        
+        Returns:
+            用量统计配置字典，未配置的项使用默认值
+        """
+        defaults = {"stream_usage": False, "currency": "USD", "prices": {}}
+        return {**defaults, **self.config.get('usage', {})}
+    
+    def get_deadline_config(self) -> Dict[str, Any]:
+        """获取审查阶段和模型调用的期限配置
+        
+        Returns:
+            期限配置字典，未配置的项使用默认值
+        """
+        defaults = {"call_timeout_seconds": 300, "stage_timeout_seconds": 1800}
+        return {**defaults, **self.config.get('deadlines', {})}
+    
+    def get_hedge_config(self, role_config: Dict[str, Any]) -> Dict[str, Any]:
+        """获取角色的对冲请求配置
+        
+        Args:
+            role_config: 组织者或专家配置，其中的hedge字段覆盖全局hedging配置
+            
+        Returns:
+            对冲配置字典，未配置的项使用默认值
+        """
+        defaults = {
+            "enabled": False,
+            "percentile": 95,
+            "min_samples": 20,
+            "window": 200,
+            "min_delay": 0.5,
+            "max_rate": 0.1,
+            "backup": None
+        }
+        return {**defaults, **self.config.get('hedging', {}), **role_config.get('hedge', {})}
+    
     def update_config(self, new_config: Dict[str, Any]) -> None:
         """更新配置并保存到文件
         
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W = f"{{{W_NS}}}"
+
+# 段落内会产生文本的元素
+_TEXT_TAGS = {f"{W}t": None, f"{W}tab": "\t", f"{W}br": "\n", f"{W}cr": "\n", f"{W}noBreakHyphen": "-"}
+_HEADING_NAME = re.compile(r"^heading\s*(\d+)$", re.IGNORECASE)
+
+
+class DocxStreamReader:
+    """流式读取Word文档
+
+    用iterparse单次遍历word/document.xml，按文档顺序产出段落和表格；
+    每处理完一个正文顶层元素即释放其XML节点，内存占用与单个段落或表格
+    的大小相关，而与文档总长度无关。页眉、页脚、脚注和尾注从各自的部件中读取。
+    """
+
+    def __init__(self, file_path: str):
+        """初始化读取器
+
+        Args:
+            file_path: .docx文件路径
+        """
+        self.file_path = file_path
+        self._heading_levels: Optional[Dict[str, int]] = None
+
+    def _read_heading_levels(self, archive: zipfile.ZipFile) -> Dict[str, int]:
+        """读取styles.xml，返回标题样式ID到标题级别的映射"""
+        levels: Dict[str, int] = {}
+        if "word/styles.xml" not in archive.namelist():
+            return levels
+        with archive.open("word/styles.xml") as f:
+            root = ET.parse(f).getroot()
+        based_on: Dict[str, str] = {}
+        for style in root.iter(f"{W}style"):
+            if style.get(f"{W}type") != "paragraph":
+                continue
+            style_id = style.get(f"{W}styleId")
+            name = style.find(f"{W}name")
+            match = _HEADING_NAME.match(name.get(f"{W}val", "")) if name is not None else None
+            outline = style.find(f"{W}pPr/{W}outlineLvl")
+            parent = style.find(f"{W}basedOn")
+            if match:
+                levels[style_id] = int(match.group(1))
+            elif outline is not None and outline.get(f"{W}val", "").isdigit() and int(outline.get(f"{W}val")) < 9:
+                levels[style_id] = int(outline.get(f"{W}val")) + 1
+            elif parent is not None:
+                based_on[style_id] = parent.get(f"{W}val")
+        # 继承自标题样式的自定义样式同样视为标题
+        for style_id, parent_id in based_on.items():
+            seen = {style_id}
+            while parent_id is not None and parent_id not in levels and parent_id not in seen:
+                seen.add(parent_id)
+                parent_id = based_on.get(parent_id)
+            if parent_id in levels:
+                levels[style_id] = levels[parent_id]
+        return levels
+
+    def iter_body(self) -> Iterator[Tuple[str, Any]]:
+        """按文档顺序产出正文内容
+
+        Yields:
+            ("paragraph", (文本, 标题级别))，非标题段落的级别为0；
+            ("table", 行列表)，每行为单元格文本列表，嵌套表格的文本并入所在单元格
+        """
+        with zipfile.ZipFile(self.file_path) as archive:
+            if self._heading_levels is None:
+                self._heading_levels = self._read_heading_levels(archive)
+            with archive.open("word/document.xml") as f:
+                yield from self._iter_document(f)
+
+    def _iter_document(self, f) -> Iterator[Tuple[str, Any]]:
+        """遍历document.xml的解析事件"""
+        body = None
+        # 段落文本缓冲区栈，文本框中的段落嵌套在外层段落内
+        paragraphs: List[Dict[str, Any]] = []
+        # 表格栈，每个表格为行列表，当前行和当前单元格分别用列表暂存
+        tables: List[Dict[str, Any]] = []
+
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == f"{W}body":
+                    body = elem
+                elif tag == f"{W}p":
+                    paragraphs.append({"parts": [], "level": 0})
+                elif tag == f"{W}tbl":
+                    tables.append({"rows": [], "row": None, "cell": None})
+                elif tag == f"{W}tr" and tables:
+                    tables[-1]["row"] = []
+                elif tag == f"{W}tc" and tables:
+                    tables[-1]["cell"] = []
+                continue
+
+            if tag in _TEXT_TAGS and paragraphs:
+                text = elem.text if _TEXT_TAGS[tag] is None else _TEXT_TAGS[tag]
+                if text:
+                    paragraphs[-1]["parts"].append(text)
+            elif tag == f"{W}pStyle" and paragraphs:
+                paragraphs[-1]["level"] = self._heading_levels.get(elem.get(f"{W}val"), 0)
+            elif tag == f"{W}outlineLvl" and paragraphs and paragraphs[-1]["level"] == 0:
+                value = elem.get(f"{W}val", "")
+                if value.isdigit() and int(value) < 9:
+                    paragraphs[-1]["level"] = int(value) + 1
+            elif tag == f"{W}p" and paragraphs:
+                paragraph = paragraphs.pop()
+                text = "".join(paragraph["parts"])
+                if tables and tables[-1]["cell"] is not None:
+                    if text.strip():
+                        tables[-1]["cell"].append(text)
+                elif text.strip():
+                    yield "paragraph", (text, paragraph["level"])
+            elif tag == f"{W}tc" and tables:
+                table = tables[-1]
+                if table["row"] is not None:
+                    table["row"].append("\n".join(table["cell"] or []))
+                table["cell"] = None
+            elif tag == f"{W}tr" and tables:
+                table = tables[-1]
+                if table["row"] is not None and any(cell.strip() for cell in table["row"]):
+                    table["rows"].append(table["row"])
+                table["row"] = None
+            elif tag == f"{W}tbl" and tables:
+                rows = tables.pop()["rows"]
+                if tables and tables[-1]["cell"] is not None:
+                    # 嵌套表格按行并入外层单元格
+                    tables[-1]["cell"].extend(" | ".join(row) for row in rows)
+                elif rows:
+                    yield "table", rows
+
+            # 正文的顶层元素处理完毕后立即释放，避免整棵树驻留内存
+            if body is not None and not paragraphs and not tables and tag in (f"{W}p", f"{W}tbl", f"{W}sdt"):
+                del body[:]
+
+    def read_parts(self, kind: str) -> List[str]:
+        """读取页眉或页脚的文本
+
+        Args:
+            kind: "header"或"footer"
+
+        Returns:
+            去重后的文本列表，按部件名称排序
+        """
+        texts: List[str] = []
+        with zipfile.ZipFile(self.file_path) as archive:
+            names = sorted(name for name in archive.namelist()
+                           if re.fullmatch(rf"word/{kind}\d*\.xml", name))
+            for name in names:
+                with archive.open(name) as f:
+                    text = "\n".join(text for text, _ in self._paragraph_texts(f))
+                if text and text not in texts:
+                    texts.append(text)
+        return texts
+
+    def read_notes(self) -> List[Dict[str, str]]:
+        """读取脚注和尾注
+
+        Returns:
+            注释列表，每项包含type（footnote或endnote）、id和text
+        """
+        notes: List[Dict[str, str]] = []
+        with zipfile.ZipFile(self.file_path) as archive:
+            for kind in ("footnote", "endnote"):
+                name = f"word/{kind}s.xml"
+                if name not in archive.namelist():
+                    continue
+                with archive.open(name) as f:
+                    for event, elem in ET.iterparse(f, events=("end",)):
+                        if elem.tag != f"{W}{kind}":
+                            continue
+                        # 分隔线等特殊注释没有正文
+                        if elem.get(f"{W}type") in (None, "normal"):
+                            text = "\n".join(
+                                "".join(part for part in self._element_text(p)) for p in elem.iter(f"{W}p")
+                            ).strip()
+                            if text:
+                                notes.append({"type": kind, "id": elem.get(f"{W}id", ""), "text": text})
+                        elem.clear()
+        return notes
+
+    def _paragraph_texts(self, f) -> Iterator[Tuple[str, int]]:
+        """遍历页眉、页脚等部件中的非空段落"""
+        for event, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == f"{W}p":
+                text = "".join(self._element_text(elem))
+                if text.strip():
+                    yield text, 0
+
+    @staticmethod
+    def _element_text(elem: ET.Element) -> Iterator[str]:
+        """按顺序产出元素内的文本片段"""
+        for child in elem.iter():
+            if child.tag in _TEXT_TAGS:
+                text = child.text if _TEXT_TAGS[child.tag] is None else _TEXT_TAGS[child.tag]
+                if text:
+                    yield text
+
+
+def read_docx(file_path: str) -> Dict[str, Any]:
+    """单次遍历读取Word文档的正文、标题、表格、页眉页脚和注释
+
+    Args:
+        file_path: .docx文件路径
+
+    Returns:
+        结果字典，包含paragraphs（正文段落，表格每行作为一段，单元格以" | "分隔）、
+        headings（标题级别和文本）、tables（表格的行列表）、headers、footers和notes
+    """
+    reader = DocxStreamReader(file_path)
+    paragraphs: List[str] = []
+    headings: List[Dict[str, Any]] = []
+    tables: List[List[List[str]]] = []
+    for kind, payload in reader.iter_body():
+        if kind == "paragraph":
+            text, level = payload
+            paragraphs.append(text)
+            if level:
+                headings.append({"level": level, "text": text})
+        else:
+            tables.append(payload)
+            paragraphs.extend(" | ".join(row) for row in payload)
+    return {
+        "paragraphs": paragraphs,
+        "headings": headings,
+        "tables": tables,
+        "headers": reader.read_parts("header"),
+        "footers": reader.read_parts("footer"),
+        "notes": reader.read_notes()
+    }
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, AsyncIterator, Deque
+
+class ReviewEventStream:
+    """审查事件流，保存最近的事件并通知订阅者
+
+    每个事件带有单调递增的序号，历史事件保存在固定容量的环形缓冲区中。
+    订阅者按序号读取新事件，发布事件只需追加记录并唤醒等待者，
+    不为每个订阅者复制数据。
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """初始化事件流
+
+        Args:
+            capacity: 保留的历史事件数
+        """
+        self.capacity = capacity
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self.closed = False
+
+    @property
+    def last_seq(self) -> int:
+        """最近一条事件的序号，没有事件时为0"""
+        return self._next_seq - 1
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """发布事件，可在任意线程调用
+
+        Args:
+            event_type: 事件类型
+            data: 事件数据
+
+        Returns:
+            事件记录
+        """
+        with self._lock:
+            event = {"seq": self._next_seq, "type": event_type, "time": time.time(), "data": data}
+            self._next_seq += 1
+            self._events.append(event)
+        self._notify()
+        return event
+
+    def close(self) -> None:
+        """关闭事件流，订阅者读完剩余事件后退出"""
+        self.closed = True
+        self._notify()
+
+    def _notify(self) -> None:
+        """唤醒所有等待新事件的订阅者"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake()
+        else:
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def events_since(self, since: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取序号大于since的事件
+
+        Args:
+            since: 已读取的最后一条事件序号
+            limit: 最多返回的事件数
+
+        Returns:
+            事件列表，早于缓冲区容量的事件已被丢弃
+        """
+        with self._lock:
+            if not self._events:
+                return []
+            first_seq = self._events[0]["seq"]
+            start = max(0, since + 1 - first_seq)
+            stop = None if limit is None else start + limit
+            return list(itertools.islice(self._events, start, stop))
+
+    async def subscribe(self, since: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """订阅事件，先返回since之后的历史事件，再持续返回新事件
+
+        Args:
+            since: 已读取的最后一条事件序号
+            heartbeat: 超过该秒数没有新事件时返回None，便于调用方发送保活消息
+
+        Yields:
+            事件记录，心跳时为None
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        while True:
+            changed = self._changed
+            events = self.events_since(since)
+            for event in events:
+                since = event["seq"]
+                yield event
+            if events:
+                continue
+            if self.closed:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
@@ -1,20 +1,46 @@
 # -*- coding: utf-8 -*-
 import os
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, AsyncIterator, Tuple
 from pathlib import Path
+from .parse_cache import ParseCache
+from .pdf_engine import PdfExtractionEngine
+from .parse_pool import ParsePool
+from .docx_reader import read_docx
+from . import metrics
+from .compat import to_thread
 
 class FileParser:
     """文件解析类，负责解析Word和PDF文件"""
     
-    def __init__(self, temp_dir: str = "temp"):
+    # 解析结果格式的版本号，解析逻辑变化时递增，使旧的缓存结果失效
+    RESULT_VERSION = 3
+    
+    def __init__(self, temp_dir: str = "temp", parse_cache: Optional[ParseCache] = None,
+                 pdf_engine: Optional[PdfExtractionEngine] = None, parse_pool: Optional[ParsePool] = None,
+                 keep_temp_text: bool = True):
         """初始化文件解析器
         
         Args:
             temp_dir: 临时文件目录
+            parse_cache: 解析结果缓存，为None时每次都重新解析
+            pdf_engine: PDF提取引擎，为None时首次解析PDF时按默认配置创建
+            parse_pool: 解析进程池，为None时parse_file_async在线程池中解析
+            keep_temp_text: 是否把解析出的文本另存为临时.txt文件
         """
         self.temp_dir = temp_dir
-        self._ensure_temp_dir()
+        self.parse_cache = parse_cache
+        self.pdf_engine = pdf_engine
+        self.parse_pool = parse_pool
+        self.keep_temp_text = keep_temp_text
+        if keep_temp_text:
+            self._ensure_temp_dir()
+    
+    def _get_pdf_engine(self) -> PdfExtractionEngine:
+        if self.pdf_engine is None:
+            self.pdf_engine = PdfExtractionEngine()
+        return self.pdf_engine
     
     def _ensure_temp_dir(self) -> None:
         """确保临时目录存在"""
@@ -22,140 +48,337 @@ class FileParser:
             os.makedirs(self.temp_dir)
             logging.info(f"创建临时目录: {self.temp_dir}")
     
-    def parse_file(self, file_path: str) -> Dict[str, Any]:
-        """解析文件内容
+    def _write_temp_text(self, file_name: str, text: str, temp_dir: Optional[str] = None) -> Optional[str]:
+        """把解析出的文本保存为临时.txt文件
+        
+        Args:
+            file_name: 原始文件名，临时文件与其同名
+            text: 文本内容
+            temp_dir: 临时文件目录，为None时使用解析器的临时目录
+            
+        Returns:
+            临时文件路径，未启用keep_temp_text时不写入并返回None
+        """
+        if not self.keep_temp_text:
+            return None
+        temp_dir = temp_dir or self.temp_dir
+        os.makedirs(temp_dir, exist_ok=True)
+        temp_file_path = os.path.join(temp_dir, Path(file_name).stem + ".txt")
+        with open(temp_file_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return temp_file_path
+    
+    def cache_key(self, file_hash: str) -> str:
+        """根据文件内容摘要生成解析缓存键
+        
+        Args:
+            file_hash: 文件内容的SHA-256摘要
+            
+        Returns:
+            缓存键
+        """
+        return f"{file_hash}-v{self.RESULT_VERSION}"
+    
+    def is_cached(self, file_hash: str) -> bool:
+        """判断内容相同的文件是否已解析过
+        
+        Args:
+            file_hash: 文件内容的SHA-256摘要
+            
+        Returns:
+            已有缓存的解析结果时返回True
+        """
+        return self.parse_cache is not None and self.parse_cache.contains(self.cache_key(file_hash))
+    
+    def _check_file(self, file_path: str) -> str:
+        """检查文件是否存在且格式受支持
         
         Args:
             file_path: 文件路径
             
         Returns:
-            解析结果字典，包含文本内容和元数据
+            小写的文件扩展名
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"文件不存在: {file_path}")
         
         file_ext = Path(file_path).suffix.lower()
-        
-        if file_ext == ".docx":
-            return self._parse_docx(file_path)
-        elif file_ext == ".pdf":
-            return self._parse_pdf(file_path)
-        else:
+        if file_ext not in (".docx", ".pdf"):
             raise ValueError(f"不支持的文件格式: {file_ext}，仅支持.docx和.pdf格式")
+        return file_ext
+    
+    def _get_cached(self, file_path: str, file_hash: Optional[str], file_name: Optional[str] = None) -> tuple:
+        """查找解析缓存
+        
+        缓存按文件内容共享，命中时把结果中的文件名替换为本次的原始文件名。
+        
+        Args:
+            file_path: 文件路径
+            file_hash: 文件内容的SHA-256摘要，为None时计算
+            file_name: 原始文件名，为None时使用文件路径中的文件名
+            
+        Returns:
+            (缓存键, 缓存的解析结果)，未启用缓存时缓存键为None，未命中时结果为None
+        """
+        if self.parse_cache is None:
+            return None, None
+        cache_key = self.cache_key(file_hash or ParseCache.hash_file(file_path))
+        cached = self.parse_cache.get(cache_key)
+        if cached is not None:
+            file_name = file_name or Path(file_path).name
+            logging.info(f"解析缓存命中，跳过解析: {file_name}")
+            cached.update({"file_name": file_name, "temp_file": None, "cache_hit": True})
+        return cache_key, cached
+    
+    def _put_cached(self, cache_key: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        """保存解析结果到缓存
+        
+        Args:
+            cache_key: 缓存键，为None时不保存
+            result: 解析结果字典
+            
+        Returns:
+            标注了cache_hit的解析结果
+        """
+        if cache_key is not None:
+            # 临时文本文件随会话清理，不放入缓存
+            self.parse_cache.put(cache_key, {k: v for k, v in result.items() if k != "temp_file"})
+        result["cache_hit"] = False
+        return result
+    
+    def parse_file(self, file_path: str, file_hash: Optional[str] = None,
+                   file_name: Optional[str] = None) -> Dict[str, Any]:
+        """解析文件内容，内容相同的文件直接返回缓存的解析结果
+        
+        Args:
+            file_path: 文件路径
+            file_hash: 文件内容的SHA-256摘要，为None时按需计算
+            file_name: 原始文件名，为None时使用文件路径中的文件名
+            
+        Returns:
+            解析结果字典，包含文本内容和元数据；cache_hit表示是否来自缓存
+        """
+        self._check_file(file_path)
+        cache_key, cached = self._get_cached(file_path, file_hash, file_name)
+        if cached is not None:
+            return cached
+        return self._put_cached(cache_key, self.parse_uncached(file_path, file_name=file_name))
+    
+    async def parse_file_async(self, file_path: str, file_hash: Optional[str] = None,
+                               progress: Optional[Callable[[str], None]] = None,
+                               on_page: Optional[Callable[[int, str], None]] = None,
+                               temp_dir: Optional[str] = None, file_name: Optional[str] = None) -> Dict[str, Any]:
+        """在事件循环之外解析文件，配置了解析进程池时在子进程中解析
+        
+        Args:
+            file_path: 文件路径
+            file_hash: 文件内容的SHA-256摘要，为None时按需计算
+            progress: 进度回调，在事件循环线程中调用
+            on_page: PDF逐页回调，传入页序号（从0开始）和文本，在事件循环线程中调用；
+                命中缓存或解析Word文档时不会调用
+            temp_dir: 临时文件目录（如审查的工作目录），为None时使用解析器的临时目录
+            file_name: 原始文件名，为None时使用文件路径中的文件名
+            
+        Returns:
+            解析结果字典，包含文本内容和元数据；cache_hit表示是否来自缓存
+        """
+        file_ext = self._check_file(file_path)
+        # 解析耗时按文件类型、大小区间和是否命中缓存记入监控指标
+        size = metrics.size_bucket(os.path.getsize(file_path))
+        with metrics.PARSE_DURATION.time(file_type=file_ext.lstrip("."), size=size, cache="miss") as labels:
+            cache_key, cached = await to_thread(self._get_cached, file_path, file_hash, file_name)
+            if cached is not None:
+                labels["cache"] = "hit"
+                return cached
+            
+            if self.parse_pool is not None:
+                pdf_options = self.pdf_engine.options() if self.pdf_engine is not None else None
+                # 子进程不写临时文件时传入None
+                pool_temp_dir = (temp_dir or self.temp_dir) if self.keep_temp_text else None
+                result = await self.parse_pool.parse(file_path, pool_temp_dir, pdf_options, progress, on_page,
+                                                     file_name=file_name)
+            else:
+                loop = asyncio.get_running_loop()
+            
+                def report(message: str) -> None:
+                    if progress is not None:
+                        loop.call_soon_threadsafe(progress, message)
+            
+                def report_page(index: int, text: str) -> None:
+                    if on_page is not None:
+                        loop.call_soon_threadsafe(on_page, index, text)
+            
+                result = await to_thread(self.parse_uncached, file_path, report, report_page,
+                                               temp_dir, file_name)
+            return await to_thread(self._put_cached, cache_key, result)
+    
+    async def iter_parse(self, file_path: str, file_hash: Optional[str] = None,
+                         progress: Optional[Callable[[str], None]] = None,
+                         temp_dir: Optional[str] = None,
+                         file_name: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """流式解析文件，边提取边产出页面
+        
+        PDF每提取完一页（按页序）产出("page", (页码, 文本))，页码从1开始；
+        解析结束后产出("result", 解析结果字典)。命中缓存或解析Word文档时只产出result。
+        调用方提前退出迭代时，未完成的解析任务会被取消。
+        
+        Args:
+            file_path: 文件路径
+            file_hash: 文件内容的SHA-256摘要，为None时按需计算
+            progress: 进度回调，在事件循环线程中调用
+            temp_dir: 临时文件目录，为None时使用解析器的临时目录
+            file_name: 原始文件名，为None时使用文件路径中的文件名
+            
+        Yields:
+            (事件类型, 事件内容)元组
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self.parse_file_async(
+            file_path,
+            file_hash,
+            progress,
+            on_page=lambda index, text: queue.put_nowait(("page", (index + 1, text))),
+            temp_dir=temp_dir,
+            file_name=file_name
+        ))
+        # 逐页回调先于任务完成进入队列，收到结束标记时所有页都已产出
+        task.add_done_callback(lambda _: queue.put_nowait(("done", None)))
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "done":
+                    break
+                yield kind, payload
+            yield "result", task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
     
-    def _parse_docx(self, file_path: str) -> Dict[str, Any]:
+    def parse_uncached(self, file_path: str, progress: Optional[Callable[[str], None]] = None,
+                       on_page: Optional[Callable[[int, str], None]] = None,
+                       temp_dir: Optional[str] = None, file_name: Optional[str] = None) -> Dict[str, Any]:
+        """不经过缓存直接解析文件
+        
+        Args:
+            file_path: 文件路径
+            progress: 进度回调
+            on_page: PDF逐页回调，传入页序号（从0开始）和文本
+            temp_dir: 临时文件目录，为None时使用解析器的临时目录
+            file_name: 原始文件名，写入解析结果并用于临时文本文件名，为None时使用文件路径中的文件名
+            
+        Returns:
+            解析结果字典
+        """
+        file_name = file_name or Path(file_path).name
+        if self._check_file(file_path) == ".docx":
+            if progress is not None:
+                progress("正在解析Word文档")
+            return self._parse_docx(file_path, temp_dir, file_name)
+        return self._parse_pdf(file_path, progress, on_page, temp_dir, file_name)
+    
+    def _parse_docx(self, file_path: str, temp_dir: Optional[str] = None,
+                    file_name: Optional[str] = None) -> Dict[str, Any]:
         """解析Word文档
         
         Args:
             file_path: 文件路径
+            temp_dir: 临时文件目录
+            file_name: 原始文件名
             
         Returns:
             解析结果字典
         """
+        file_name = file_name or Path(file_path).name
         try:
-            import docx
-            doc = docx.Document(file_path)
+            # 流式读取document.xml，一次遍历得到段落、标题层级和表格
+            document = read_docx(file_path)
+            paragraphs = document["paragraphs"]
             
-            # 提取文本内容，保留段落结构
-            paragraphs = []
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    paragraphs.append(para.text)
-            
-            # 提取标题层级
-            headings = []
-            for para in doc.paragraphs:
-                if para.style.name.startswith('Heading'):
-                    level = int(para.style.name.replace('Heading', ''))
-                    headings.append({
-                        "level": level,
-                        "text": para.text
-                    })
-            
-            # 保存到临时文本文件
-            temp_file_path = os.path.join(self.temp_dir, Path(file_path).stem + ".txt")
-            with open(temp_file_path, 'w', encoding='utf-8') as f:
-                f.write('\n\n'.join(paragraphs))
+            # 脚注和尾注附在正文之后，一并参与审查
+            for note in document["notes"]:
+                label = "脚注" if note["type"] == "footnote" else "尾注"
+                paragraphs.append(f"[{label}{note['id']}] {note['text']}")
+            
+            # 按配置保存到临时文本文件
+            temp_file_path = self._write_temp_text(file_name, '\n\n'.join(paragraphs), temp_dir)
             
             return {
                 "content": '\n\n'.join(paragraphs),
                 "paragraphs": paragraphs,
-                "headings": headings,
+                "headings": document["headings"],
+                "tables": document["tables"],
+                "headers": document["headers"],
+                "footers": document["footers"],
+                "notes": document["notes"],
                 "temp_file": temp_file_path,
                 "file_type": "docx",
-                "file_name": Path(file_path).name
+                "file_name": file_name
             }
-        except ImportError:
-            logging.error("缺少python-docx库，请安装: pip install python-docx")
-            raise
         except Exception as e:
             logging.error(f"解析Word文档失败: {str(e)}")
             raise ValueError(f"解析Word文档失败: {str(e)}")
     
-    def _parse_pdf(self, file_path: str) -> Dict[str, Any]:
+    def _parse_pdf(self, file_path: str, progress: Optional[Callable[[str], None]] = None,
+                   on_page: Optional[Callable[[int, str], None]] = None,
+                   temp_dir: Optional[str] = None, file_name: Optional[str] = None) -> Dict[str, Any]:
         """解析PDF文档
         
         Args:
             file_path: 文件路径
+            progress: 进度回调
+            on_page: 逐页回调，传入页序号（从0开始）和文本
+            temp_dir: 临时文件目录
+            file_name: 原始文件名
             
         Returns:
             解析结果字典
         """
+        file_name = file_name or Path(file_path).name
         try:
-            from PyPDF2 import PdfReader
-            
-            reader = PdfReader(file_path)
+            # 引擎采样前几页选定后端，整个文件只用该后端提取一次
+            extraction = self._get_pdf_engine().extract(file_path, progress, on_page)
+            # 每页的文本，保留页码位置，供按页切分
+            pages = extraction["pages"]
             text_content = ""
             paragraphs = []
             
-            # 提取文本内容
-            for page in reader.pages:
-                page_text = page.extract_text()
+            for page_text in pages:
                 if page_text:
                     text_content += page_text + "\n\n"
                     # 简单按换行符分割段落
                     page_paragraphs = [p.strip() for p in page_text.split('\n') if p.strip()]
                     paragraphs.extend(page_paragraphs)
             
-            # 尝试使用pdfplumber获取更精确的文本（如果可用）
-            try:
-                import pdfplumber
-                with pdfplumber.open(file_path) as pdf:
-                    plumber_paragraphs = []
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            page_paragraphs = [p.strip() for p in page_text.split('\n') if p.strip()]
-                            plumber_paragraphs.extend(page_paragraphs)
-                    
-                    # 如果pdfplumber提取的文本更多，则使用它
-                    if len(plumber_paragraphs) > len(paragraphs):
-                        paragraphs = plumber_paragraphs
-                        text_content = '\n\n'.join(plumber_paragraphs)
-            except ImportError:
-                logging.warning("未安装pdfplumber库，使用PyPDF2提取的文本")
-            
-            # 保存到临时文本文件
-            temp_file_path = os.path.join(self.temp_dir, Path(file_path).stem + ".txt")
-            with open(temp_file_path, 'w', encoding='utf-8') as f:
-                f.write(text_content)
+            # 按配置保存到临时文本文件
+            temp_file_path = self._write_temp_text(file_name, text_content, temp_dir)
             
             return {
                 "content": text_content,
                 "paragraphs": paragraphs,
+                "pages": pages,
+                "page_timings": extraction["page_timings"],
+                "pdf_backend": extraction["backend"],
                 "temp_file": temp_file_path,
                 "file_type": "pdf",
-                "file_name": Path(file_path).name
+                "file_name": file_name
             }
         except ImportError:
-            logging.error("缺少PyPDF2库，请安装: pip install PyPDF2")
+            logging.error("缺少PDF解析库，请安装: pip install PyPDF2 pdfplumber")
             raise
         except Exception as e:
             logging.error(f"解析PDF文档失败: {str(e)}")
             raise ValueError(f"解析PDF文档失败: {str(e)}")
     
     def cleanup(self) -> None:
-        """清理临时文件"""
+        """清理临时文件，并关闭PDF提取进程池和解析进程池"""
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+        if self.pdf_engine is not None:
+            self.pdf_engine.shutdown()
         import shutil
         if os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import math
+from collections import deque
+from typing import Dict, Any, Optional
+
+class HedgePolicy:
+    """对冲请求策略
+
+    记录模型最近window次调用的耗时；调用耗时超过历史耗时的percentile分位数时，
+    向同一模型或备用端点再发一次相同的请求，先返回的结果胜出，另一请求被取消。
+    流式调用以首个数据块到达的耗时计算。历史样本不足min_samples时不对冲，
+    已对冲的调用比例达到max_rate后暂停对冲，避免服务整体变慢时请求量翻倍。
+    """
+
+    def __init__(self, percentile: float = 95, min_samples: int = 20, window: int = 200,
+                 min_delay: float = 0.5, max_rate: float = 0.1):
+        """初始化对冲策略
+
+        Args:
+            percentile: 触发对冲的耗时分位数（0-100）
+            min_samples: 开始对冲前至少需要的历史样本数
+            window: 保留的历史耗时样本数
+            min_delay: 对冲等待时间的下限（秒）
+            max_rate: 对冲调用占全部调用的最大比例，为0时不限制
+        """
+        if not 0 < percentile <= 100:
+            raise ValueError(f"对冲分位数必须在0到100之间: {percentile}")
+        self.percentile = percentile
+        self.min_samples = max(1, min_samples)
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, latency: float) -> None:
+        """记录一次调用耗时
+
+        Args:
+            latency: 耗时（秒）；被取消的调用传入取消时已等待的时间
+        """
+        self.samples.append(latency)
+
+    def threshold(self) -> Optional[float]:
+        """计算当前历史耗时的分位数
+
+        Returns:
+            分位数耗时（秒），样本不足时返回None
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return ordered[rank]
+
+    def hedge_delay(self) -> Optional[float]:
+        """开始一次调用，返回发出对冲请求前的等待时间
+
+        Returns:
+            等待秒数，本次调用不对冲时返回None
+        """
+        self.calls += 1
+        threshold = self.threshold()
+        if threshold is None:
+            return None
+        if self.max_rate and self.hedged >= self.max_rate * self.calls:
+            return None
+        return max(threshold, self.min_delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计信息
+
+        Returns:
+            统计信息字典，hedge_rate为发出对冲请求的调用比例，
+            win_rate为对冲请求先于原请求返回的比例
+        """
+        threshold = self.threshold()
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "win_rate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            "threshold_seconds": round(threshold, 3) if threshold is not None else None,
+            "samples": len(self.samples)
+        }
+
+    @classmethod
+    def from_config(cls, hedge_config: Dict[str, Any]) -> Optional["HedgePolicy"]:
+        """根据对冲配置创建策略
+
+        Args:
+            hedge_config: 对冲配置字典
+
+        Returns:
+            对冲策略实例，未启用时返回None
+        """
+        if not hedge_config.get("enabled"):
+            return None
+        return cls(
+            percentile=hedge_config["percentile"],
+            min_samples=hedge_config["min_samples"],
+            window=hedge_config["window"],
+            min_delay=hedge_config["min_delay"],
+            max_rate=hedge_config["max_rate"]
+        )
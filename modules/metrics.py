@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """指标注册表，按Prometheus文本格式输出所有指标
+
+    指标只在内存中累加，记录一次观测只需一次加锁和几次加法；
+    enabled为False时所有记录操作直接返回。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics: List["Metric"] = []
+
+    def register(self, metric: "Metric") -> None:
+        """注册指标
+
+        Args:
+            metric: 指标实例
+        """
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """生成Prometheus文本格式的指标内容
+
+        Returns:
+            指标文本
+        """
+        return "".join(metric.render() for metric in self._metrics)
+
+
+class Metric(ABC):
+    """指标基类"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = (),
+                 registry: Optional[MetricsRegistry] = None):
+        """初始化指标
+
+        Args:
+            name: 指标名称
+            description: 指标说明
+            labelnames: 标签名称
+            registry: 注册表，为None时注册到默认注册表
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.registry = registry if registry is not None else REGISTRY
+        self._lock = threading.Lock()
+        self.registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标{self.name}的标签应为{self.labelnames}: {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> str:
+        return f"# HELP {self.name} {self.description}\n# TYPE {self.name} {self.type_name}\n"
+
+    @abstractmethod
+    def render(self) -> str:
+        """按Prometheus文本格式输出该指标"""
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """计数增加
+
+        Args:
+            amount: 增加量
+            **labels: 标签值
+        """
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """获取当前计数，主要用于测试"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> str:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}\n" for key, value in values]
+        return self._header() + "".join(lines)
+
+
+class Gauge(Metric):
+    """可增可减的当前值，可以指定在输出时调用的取值函数"""
+
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        """设置当前值
+
+        Args:
+            value: 当前值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Optional[Callable[[], float]]) -> None:
+        """指定取值函数，输出时调用，适用于无标签的指标
+
+        Args:
+            function: 返回当前值的函数，为None时取消
+        """
+        self._function = function
+
+    def render(self) -> str:
+        if self._function is not None:
+            values = [((), self._function())]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        lines = [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}\n" for key, value in values]
+        return self._header() + "".join(lines)
+
+
+class Histogram(Metric):
+    """按固定分桶统计观测值的分布"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+                 registry: Optional[MetricsRegistry] = None):
+        """初始化直方图
+
+        Args:
+            name: 指标名称
+            description: 指标说明
+            labelnames: 标签名称
+            buckets: 分桶上界，按升序排列，自动追加+Inf
+            registry: 注册表，为None时注册到默认注册表
+        """
+        super().__init__(name, description, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签的[各分桶计数（非累计，最后一个为+Inf）, 总和, 次数]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """记录一次观测
+
+        Args:
+            value: 观测值
+            **labels: 标签值
+        """
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块的耗时
+
+        标签中包含outcome且未指定时，按代码块的结果填入completed、error或cancelled。
+        产生的标签字典会传给代码块，可在代码块内补充或修改标签值。
+
+        Args:
+            **labels: 标签值
+        """
+        started_at = time.monotonic()
+        fill_outcome = "outcome" in self.labelnames and "outcome" not in labels
+        try:
+            yield labels
+            if fill_outcome:
+                labels["outcome"] = "completed"
+        except asyncio.CancelledError:
+            if fill_outcome:
+                labels["outcome"] = "cancelled"
+            raise
+        except BaseException:
+            if fill_outcome:
+                labels["outcome"] = "error"
+            raise
+        finally:
+            self.observe(time.monotonic() - started_at, **labels)
+
+    def count(self, **labels) -> int:
+        """获取观测次数，主要用于测试"""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def render(self) -> str:
+        with self._lock:
+            values = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}\n")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}\n")
+            lines.append(f"{self.name}_count{labels} {count}\n")
+        return self._header() + "".join(lines)
+
+
+def timed(histogram: Histogram, **labels):
+    """记录协程函数耗时的装饰器
+
+    Args:
+        histogram: 记录耗时的直方图
+        **labels: 标签值
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def size_bucket(size: int) -> str:
+    """把文件大小归入固定的区间，避免标签取值过多
+
+    Args:
+        size: 文件大小（字节）
+
+    Returns:
+        区间名称
+    """
+    for limit, name in ((100 * 1024, "<100KB"), (1024 * 1024, "100KB-1MB"), (10 * 1024 * 1024, "1MB-10MB")):
+        if size < limit:
+            return name
+    return ">=10MB"
+
+
+REGISTRY = MetricsRegistry()
+
+MODEL_CALL_DURATION = Histogram(
+    "ai_check_model_call_duration_seconds", "模型调用耗时，流式调用为读完整个流的耗时",
+    ("model", "role", "outcome"),
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+)
+MODEL_API_ERRORS = Counter(
+    "ai_check_model_api_errors_total", "模型API调用失败次数，status为服务商返回的HTTP状态码或timeout、connection",
+    ("model", "role", "status")
+)
+STAGE_DURATION = Histogram(
+    "ai_check_review_stage_duration_seconds", "审查阶段耗时",
+    ("stage", "outcome"),
+    buckets=(5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+PARSE_DURATION = Histogram(
+    "ai_check_file_parse_duration_seconds", "文件解析耗时，按文件类型、大小区间和是否命中解析缓存统计",
+    ("file_type", "size", "cache", "outcome"),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+REPORT_DURATION = Histogram(
+    "ai_check_report_generation_duration_seconds", "HTML报告生成耗时",
+    ("outcome",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+HTTP_RESPONSES = Counter(
+    "ai_check_http_responses_total", "接口响应次数，按方法、路由和HTTP状态码统计",
+    ("method", "route", "status")
+)
+REVIEWS_ACTIVE = Gauge("ai_check_reviews_active", "正在执行的审查阶段数")
+REVIEWS_QUEUED = Gauge("ai_check_reviews_queued", "排队等待执行的审查阶段数")
+REVIEW_SESSIONS = Gauge("ai_check_review_sessions", "服务中保留的审查会话数")
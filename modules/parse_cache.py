@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+class ParseCache:
+    """文件解析结果缓存，按文件内容的SHA-256摘要保存
+
+    内存层保存最近使用的memory_entries个结果，按LRU淘汰；
+    磁盘层每个结果一个JSON文件，超过max_disk_entries时按最近访问时间淘汰。
+    内容相同的文件无论文件名如何都命中同一条缓存。
+    """
+
+    def __init__(self, directory: str = "cache/parsed", memory_entries: int = 32, max_disk_entries: int = 500):
+        """初始化解析结果缓存
+
+        Args:
+            directory: 磁盘缓存目录
+            memory_entries: 内存中保留的结果数
+            max_disk_entries: 磁盘上保留的结果数
+        """
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """计算文件内容的SHA-256摘要
+
+        Args:
+            file_path: 文件路径
+            chunk_size: 每次读取的字节数
+
+        Returns:
+            十六进制摘要
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def contains(self, key: str) -> bool:
+        """判断是否已缓存，不计入命中统计
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            已缓存时返回True
+        """
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._disk_path(key))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取解析结果，磁盘命中时提升到内存层
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            解析结果字典的副本，未命中时返回None
+        """
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            # 刷新访问时间，磁盘淘汰按最近访问排序
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取解析缓存失败，忽略该条目: {str(e)}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, result)
+            self.hits += 1
+        return dict(result)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """保存解析结果到内存和磁盘
+
+        Args:
+            key: 缓存键
+            result: 可JSON序列化的解析结果
+        """
+        with self._lock:
+            self._remember(key, dict(result))
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            # 先写临时文件再替换，并发读取不会看到写了一半的文件
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"写入解析缓存失败: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        """写入内存层，超出容量时淘汰最久未使用的结果（调用方持有锁）"""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """磁盘条目超过上限时删除最久未访问的文件"""
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        overflow = len(entries) - self.max_disk_entries
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:overflow]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            memory_entries = len(self._memory)
+        disk_entries = sum(1 for entry in os.scandir(self.directory) if entry.name.endswith(".json"))
+        return {
+            "memory_entries": memory_entries,
+            "disk_entries": disk_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> Optional["ParseCache"]:
+        """根据解析缓存配置创建缓存
+
+        Args:
+            cache_config: 解析缓存配置字典
+
+        Returns:
+            解析结果缓存实例，未启用时返回None
+        """
+        if not cache_config["enabled"]:
+            return None
+        return cls(
+            directory=cache_config["directory"],
+            memory_entries=cache_config["memory_entries"],
+            max_disk_entries=cache_config["max_disk_entries"]
+        )
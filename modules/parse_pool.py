@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, Any, Optional, Callable, Set
+from .compat import to_thread
+
+class ParseError(ValueError):
+    """文件解析失败，包括解析进程崩溃和超出内存上限"""
+
+
+class ParseTimeoutError(ParseError):
+    """文件解析超时"""
+
+
+def _run_parse_job(conn, file_path: str, temp_dir: Optional[str], pdf_options: Optional[Dict[str, Any]],
+                   memory_limit_bytes: int, file_name: Optional[str] = None) -> None:
+    """解析子进程入口，通过管道回传进度消息和解析结果"""
+    # 独立进程组，超时时连同PDF提取的孙进程一起终止
+    if hasattr(os, "setpgid"):
+        try:
+            os.setpgid(0, 0)
+        except OSError:
+            pass
+    if memory_limit_bytes:
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    engine = None
+    try:
+        from .file_parser import FileParser
+        from .pdf_engine import PdfExtractionEngine
+        engine = PdfExtractionEngine(**pdf_options) if pdf_options else None
+        # temp_dir为None时不写临时文本文件
+        parser = FileParser(temp_dir or "temp", pdf_engine=engine, keep_temp_text=temp_dir is not None)
+        result = parser.parse_uncached(
+            file_path,
+            progress=lambda message: conn.send(("progress", message)),
+            on_page=lambda index, text: conn.send(("page", (index, text))),
+            file_name=file_name
+        )
+        conn.send(("result", result))
+    except MemoryError:
+        conn.send(("error", "解析文件超出内存上限"))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        if engine is not None:
+            engine.shutdown()
+        conn.close()
+
+
+class ParsePool:
+    """文件解析进程池，每个解析任务在独立的子进程中执行
+
+    同时执行的任务数不超过max_workers，其余任务排队等待。子进程超时会被
+    强制终止；子进程崩溃或超出内存上限只会导致该文件解析失败，不影响服务进程。
+    """
+
+    def __init__(self, max_workers: int = 2, timeout_seconds: float = 120.0, memory_limit_mb: int = 2048):
+        """初始化解析进程池
+
+        Args:
+            max_workers: 同时执行的解析任务数
+            timeout_seconds: 单个解析任务的最长耗时（秒）
+            memory_limit_mb: 解析子进程的虚拟内存上限（MB），为0时不限制
+        """
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+        # forkserver从干净的服务进程派生子进程，避免复制事件循环和线程状态
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(method)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._active: Set[multiprocessing.process.BaseProcess] = set()
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    async def parse(self, file_path: str, temp_dir: Optional[str], pdf_options: Optional[Dict[str, Any]] = None,
+                    progress: Optional[Callable[[str], None]] = None,
+                    on_page: Optional[Callable[[int, str], None]] = None,
+                    file_name: Optional[str] = None) -> Dict[str, Any]:
+        """在子进程中解析文件
+
+        Args:
+            file_path: 文件路径
+            temp_dir: 临时文件目录，为None时不写临时文本文件
+            pdf_options: PDF提取引擎参数
+            progress: 进度回调，在事件循环线程中调用
+            on_page: PDF逐页回调，传入页序号（从0开始）和文本，在事件循环线程中调用
+            file_name: 原始文件名，为None时使用文件路径中的文件名
+
+        Returns:
+            解析结果字典
+
+        Raises:
+            ParseTimeoutError: 解析超时
+            ParseError: 解析失败或子进程异常退出
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        loop = asyncio.get_running_loop()
+
+        def report(kind: str, payload: Any) -> None:
+            if kind == "progress" and progress is not None:
+                loop.call_soon_threadsafe(progress, payload)
+            elif kind == "page" and on_page is not None:
+                loop.call_soon_threadsafe(on_page, *payload)
+
+        async with self._slots:
+            parent_conn, child_conn = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                target=_run_parse_job,
+                args=(child_conn, file_path, temp_dir, pdf_options, self.memory_limit_mb * 1024 * 1024, file_name),
+                name=f"parse-{os.path.basename(file_path)}"
+            )
+            process.start()
+            child_conn.close()
+            self._active.add(process)
+            try:
+                return await to_thread(self._supervise, process, parent_conn, report)
+            except asyncio.CancelledError:
+                # 审查被取消时不再等待解析结果；这里只发信号，不在事件循环中等待子进程退出，
+                # 由仍在线程中运行的_supervise在finally中回收
+                self._signal(process)
+                raise
+            finally:
+                self._active.discard(process)
+
+    def _supervise(self, process, conn, report: Callable[[str, Any], None]) -> Dict[str, Any]:
+        """在线程中等待子进程的消息，处理超时和异常退出"""
+        deadline = time.monotonic() + self.timeout_seconds
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._kill(process)
+                    self.timed_out += 1
+                    raise ParseTimeoutError(f"文件解析超时（{self.timeout_seconds}秒）")
+                if not conn.poll(min(remaining, 0.5)):
+                    if not process.is_alive() and not conn.poll():
+                        break
+                    continue
+                try:
+                    kind, payload = conn.recv()
+                except EOFError:
+                    break
+                if kind in ("progress", "page"):
+                    report(kind, payload)
+                elif kind == "result":
+                    self.completed += 1
+                    return payload
+                else:
+                    self.failed += 1
+                    raise ParseError(payload)
+
+            # 子进程没有回传结果就退出了（崩溃或被系统终止）
+            process.join(1)
+            self.failed += 1
+            logging.error(f"解析进程异常退出，退出码: {process.exitcode}")
+            raise ParseError(f"解析进程异常退出（退出码{process.exitcode}），文件可能已损坏")
+        finally:
+            conn.close()
+            process.join(1)
+
+    def _signal(self, process) -> None:
+        """向子进程及其进程组发送SIGKILL，不等待退出"""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError, OSError):
+            process.kill()
+
+    def _kill(self, process) -> None:
+        """强制终止子进程及其进程组，并等待其退出"""
+        self._signal(process)
+        process.join(1)
+
+    def shutdown(self) -> None:
+        """终止所有正在执行的解析子进程"""
+        for process in list(self._active):
+            self._kill(process)
+        self._active.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取解析进程池统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "max_workers": self.max_workers,
+            "active": len(self._active),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out
+        }
+
+    @classmethod
+    def from_config(cls, pool_config: Dict[str, Any]) -> Optional["ParsePool"]:
+        """根据解析进程池配置创建进程池
+
+        Args:
+            pool_config: 解析进程池配置字典
+
+        Returns:
+            解析进程池实例，未启用时返回None
+        """
+        if not pool_config["enabled"]:
+            return None
+        return cls(
+            max_workers=pool_config["max_workers"],
+            timeout_seconds=pool_config["timeout_seconds"],
+            memory_limit_mb=pool_config["memory_limit_mb"]
+        )
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+class PdfBackend(ABC):
+    """PDF文本提取后端基类"""
+
+    name = ""
+
+    @abstractmethod
+    def available(self) -> bool:
+        """判断后端依赖的库是否已安装
+
+        Returns:
+            可用时返回True
+        """
+
+    @abstractmethod
+    def extract_pages(self, file_path: str, indices: List[int]) -> List[Tuple[int, str, float]]:
+        """打开一次文件，提取指定页的文本
+
+        Args:
+            file_path: 文件路径
+            indices: 页序号列表（从0开始）
+
+        Returns:
+            (页序号, 文本, 耗时秒数)列表
+        """
+
+    @abstractmethod
+    def page_count(self, file_path: str) -> int:
+        """获取PDF页数
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            页数
+        """
+
+
+class PyPDF2Backend(PdfBackend):
+    """基于PyPDF2的提取后端，速度快，对复杂版面的还原较差"""
+
+    name = "pypdf2"
+
+    def available(self) -> bool:
+        try:
+            import PyPDF2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, file_path: str) -> int:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(file_path).pages)
+
+    def extract_pages(self, file_path: str, indices: List[int]) -> List[Tuple[int, str, float]]:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(file_path)
+        results = []
+        for index in indices:
+            started_at = time.perf_counter()
+            text = reader.pages[index].extract_text() or ""
+            results.append((index, text, time.perf_counter() - started_at))
+        return results
+
+
+class PdfplumberBackend(PdfBackend):
+    """基于pdfplumber的提取后端，按字符位置重建文本行，较慢但更精确"""
+
+    name = "pdfplumber"
+
+    def available(self) -> bool:
+        try:
+            import pdfplumber  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, file_path: str) -> int:
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+    def extract_pages(self, file_path: str, indices: List[int]) -> List[Tuple[int, str, float]]:
+        import pdfplumber
+        results = []
+        with pdfplumber.open(file_path) as pdf:
+            for index in indices:
+                started_at = time.perf_counter()
+                page = pdf.pages[index]
+                text = page.extract_text() or ""
+                # 释放页面缓存的版面对象，避免长文档占用过多内存
+                page.flush_cache()
+                results.append((index, text, time.perf_counter() - started_at))
+        return results
+
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend(), PdfplumberBackend())}
+
+
+def _extract_in_worker(backend_name: str, file_path: str, indices: List[int]) -> List[Tuple[int, str, float]]:
+    """进程池中执行的提取任务，按名称查找后端以便跨进程传递"""
+    return BACKENDS[backend_name].extract_pages(file_path, indices)
+
+
+class PdfExtractionEngine:
+    """PDF提取引擎，每个文件只完整解析一次
+
+    先用各候选后端提取前sample_pages页，选择提取出文本行数最多的后端
+    （行数相同时取靠前的后端），再只用该后端提取其余页；
+    剩余页数超过parallel_threshold时按连续页段分配到进程池并行提取。
+    """
+
+    # 单进程提取时每提取多少页报告一次进度，逐页回调时进程池每批也不超过该页数
+    PROGRESS_PAGES = 20
+
+    def __init__(self, backends: Optional[List[str]] = None, sample_pages: int = 3,
+                 max_workers: int = 0, parallel_threshold: int = 16):
+        """初始化提取引擎
+
+        Args:
+            backends: 候选后端名称，按优先级排列，为None时使用全部已安装的后端
+            sample_pages: 用于选择后端的采样页数
+            max_workers: 进程池大小，为0时使用CPU核数
+            parallel_threshold: 剩余页数超过该值时才使用进程池
+        """
+        names = backends or list(BACKENDS)
+        unknown = [name for name in names if name not in BACKENDS]
+        if unknown:
+            raise ValueError(f"未知的PDF提取后端: {', '.join(unknown)}")
+        self.backends = [BACKENDS[name] for name in names if BACKENDS[name].available()]
+        if not self.backends:
+            raise ImportError("没有可用的PDF提取库，请安装: pip install PyPDF2 pdfplumber")
+        self.sample_pages = max(1, sample_pages)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def options(self) -> Dict[str, Any]:
+        """获取构造参数，用于在解析子进程中创建相同配置的引擎
+
+        Returns:
+            构造参数字典
+        """
+        return {
+            "backends": [backend.name for backend in self.backends],
+            "sample_pages": self.sample_pages,
+            "max_workers": self.max_workers,
+            "parallel_threshold": self.parallel_threshold
+        }
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def choose_backend(self, file_path: str, page_count: int) -> Tuple[PdfBackend, List[Tuple[int, str, float]]]:
+        """采样前几页选择提取后端
+
+        Args:
+            file_path: 文件路径
+            page_count: 总页数
+
+        Returns:
+            (选中的后端, 该后端的采样页结果)，采样结果可直接复用
+        """
+        indices = list(range(min(self.sample_pages, page_count)))
+        best = None
+        for backend in self.backends:
+            try:
+                sample = backend.extract_pages(file_path, indices)
+            except Exception as e:
+                logging.warning(f"PDF后端{backend.name}采样失败: {str(e)}")
+                continue
+            lines = sum(len([line for line in text.split('\n') if line.strip()]) for _, text, _ in sample)
+            if best is None or lines > best[2]:
+                best = (backend, sample, lines)
+        if best is None:
+            raise ValueError("所有PDF提取后端都无法读取该文件")
+        return best[0], best[1]
+
+    def extract(self, file_path: str, progress: Optional[Callable[[str], None]] = None,
+                on_page: Optional[Callable[[int, str], None]] = None) -> Dict[str, Any]:
+        """提取PDF每一页的文本
+
+        Args:
+            file_path: 文件路径
+            progress: 进度回调，传入进度描述
+            on_page: 逐页回调，传入页序号（从0开始）和文本；按页序调用，
+                前面的页全部提取完成后立即回调，不等待整个文件
+
+        Returns:
+            结果字典，包含backend（后端名称）、pages（每页文本）和page_timings（每页耗时秒数）
+        """
+        started_at = time.perf_counter()
+        page_count = self.backends[0].page_count(file_path)
+        backend, sample = self.choose_backend(file_path, page_count)
+        results = {index: (text, seconds) for index, text, seconds in sample}
+        if progress is not None:
+            progress(f"PDF共{page_count}页，使用{backend.name}提取")
+        emitted = 0
+
+        def emit_ready() -> None:
+            # 按页序回调已连续提取完成的页
+            nonlocal emitted
+            if on_page is None:
+                return
+            while emitted < page_count and emitted in results:
+                on_page(emitted, results[emitted][0])
+                emitted += 1
+
+        emit_ready()
+        remaining = [index for index in range(page_count) if index not in results]
+        if len(remaining) > self.parallel_threshold and self.max_workers > 1:
+            # 按连续页段分批，每个子进程只打开一次文件；逐页回调时缩小批次，靠前的页尽早完成
+            batch_size = -(-len(remaining) // self.max_workers)
+            if on_page is not None:
+                batch_size = min(batch_size, self.PROGRESS_PAGES)
+            batches = [remaining[i:i + batch_size] for i in range(0, len(remaining), batch_size)]
+            pool = self._get_pool()
+            futures = [pool.submit(_extract_in_worker, backend.name, file_path, batch) for batch in batches]
+            for future in as_completed(futures):
+                for index, text, seconds in future.result():
+                    results[index] = (text, seconds)
+                emit_ready()
+                if progress is not None:
+                    progress(f"已提取{len(results)}/{page_count}页")
+        elif remaining and progress is None and on_page is None:
+            for index, text, seconds in backend.extract_pages(file_path, remaining):
+                results[index] = (text, seconds)
+        else:
+            # 需要报告进度或逐页回调时按页段提取，每段完成后报告一次
+            for start in range(0, len(remaining), self.PROGRESS_PAGES):
+                for index, text, seconds in backend.extract_pages(file_path, remaining[start:start + self.PROGRESS_PAGES]):
+                    results[index] = (text, seconds)
+                emit_ready()
+                if progress is not None:
+                    progress(f"已提取{len(results)}/{page_count}页")
+
+        pages = [results[index][0] for index in range(page_count)]
+        page_timings = [round(results[index][1], 4) for index in range(page_count)]
+        elapsed = time.perf_counter() - started_at
+        if page_timings:
+            slowest = max(range(page_count), key=lambda index: page_timings[index])
+            logging.info(f"PDF提取完成: {page_count}页，后端{backend.name}，总耗时{elapsed:.2f}秒，"
+                         f"最慢第{slowest + 1}页{page_timings[slowest]:.2f}秒")
+        return {
+            "backend": backend.name,
+            "pages": pages,
+            "page_timings": page_timings,
+            "elapsed": round(elapsed, 4)
+        }
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        if self._pool is not None:
+            if sys.version_info >= (3, 9):
+                self._pool.shutdown(cancel_futures=True)
+            else:
+                # Python 3.8不支持cancel_futures，等待已提交的页面批次完成
+                self._pool.shutdown()
+            self._pool = None
+
+    @classmethod
+    def from_config(cls, pdf_config: Dict[str, Any]) -> "PdfExtractionEngine":
+        """根据PDF解析配置创建提取引擎
+
+        Args:
+            pdf_config: PDF解析配置字典
+
+        Returns:
+            提取引擎实例
+        """
+        return cls(
+            backends=pdf_config.get("backends"),
+            sample_pages=pdf_config["sample_pages"],
+            max_workers=pdf_config["max_workers"],
+            parallel_threshold=pdf_config["parallel_threshold"]
+        )
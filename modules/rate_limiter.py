@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import openai
+
+class TokenBucket:
+    """令牌桶，按每分钟速率补充令牌
+
+    采用预留方式：取令牌时直接扣减（可扣为负数），并返回需要等待的秒数。
+    调用方按先来后到依次排在后面，无需加锁。
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """初始化令牌桶
+
+        Args:
+            rate_per_minute: 每分钟补充的令牌数
+            capacity: 桶容量，即允许的突发量，默认等于每分钟速率
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """预留令牌
+
+        Args:
+            amount: 需要的令牌数，超过容量时按容量计算
+
+        Returns:
+            需要等待的秒数
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def adjust(self, delta: float) -> None:
+        """修正已扣减的令牌数，delta为正时多扣，为负时退还
+
+        Args:
+            delta: 修正量
+        """
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+    def block(self, seconds: float) -> None:
+        """在指定时间内暂停发放令牌，用于服务端返回限流时整体退让
+
+        Args:
+            seconds: 暂停秒数
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """粗略估算文本的token数，中日韩字符按1个token，其他字符按4个字符1个token
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        估算的token数
+    """
+    cjk = 0
+    other = 0
+    for char in text:
+        if '⺀' <= char <= '鿿' or '가' <= char <= '힯' or '＀' <= char <= '￯':
+            cjk += 1
+        else:
+            other += 1
+    return cjk + other // 4
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """粗略估算消息的token数，每条消息另计4个token的格式开销
+
+    Args:
+        messages: 消息列表
+
+    Returns:
+        估算的token数
+    """
+    return sum(estimate_text_tokens(message.get("content") or "") for message in messages) + 4 * len(messages)
+
+
+class ProviderRateLimiter:
+    """按服务商（api_base）限制每分钟请求数和每分钟token数"""
+
+    def __init__(self, providers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 default: Optional[Dict[str, Any]] = None):
+        """初始化限流器
+
+        Args:
+            providers: 各api_base的限流配置，包含requests_per_minute、tokens_per_minute
+            default: 未单独配置的服务商使用的限流配置
+        """
+        self.providers = dict(providers or {})
+        self.default = dict(default or {})
+        self._buckets: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+
+    def _get_buckets(self, api_base: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        if api_base not in self._buckets:
+            limits = self.providers.get(api_base, self.default)
+            rpm = limits.get("requests_per_minute")
+            tpm = limits.get("tokens_per_minute")
+            self._buckets[api_base] = (
+                TokenBucket(rpm, limits.get("request_burst")) if rpm else None,
+                TokenBucket(tpm, limits.get("token_burst")) if tpm else None
+            )
+        return self._buckets[api_base]
+
+    async def acquire(self, api_base: str, tokens: int) -> float:
+        """等待直到可以向服务商发出一次请求
+
+        Args:
+            api_base: API基础URL
+            tokens: 预计消耗的token数
+
+        Returns:
+            实际等待的秒数
+        """
+        request_bucket, token_bucket = self._get_buckets(api_base)
+        wait = 0.0
+        if request_bucket:
+            wait = max(wait, request_bucket.reserve(1))
+        if token_bucket:
+            wait = max(wait, token_bucket.reserve(tokens))
+        if wait > 0:
+            logging.info(f"服务商{api_base}限流，等待{wait:.2f}秒")
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_usage(self, api_base: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """按实际用量修正token桶
+
+        Args:
+            api_base: API基础URL
+            estimated_tokens: 请求前预留的token数
+            actual_tokens: 服务端返回的实际token数，未知时为None
+        """
+        _, token_bucket = self._get_buckets(api_base)
+        if token_bucket and actual_tokens is not None:
+            token_bucket.adjust(actual_tokens - estimated_tokens)
+
+    def penalize(self, api_base: str, seconds: float) -> None:
+        """服务商返回限流时，暂停向其发放令牌
+
+        Args:
+            api_base: API基础URL
+            seconds: 暂停秒数
+        """
+        for bucket in self._get_buckets(api_base):
+            if bucket:
+                bucket.block(seconds)
+
+    @classmethod
+    def from_config(cls, rate_limit_config: Dict[str, Any]) -> "ProviderRateLimiter":
+        """根据限流配置创建限流器
+
+        Args:
+            rate_limit_config: 限流配置字典
+
+        Returns:
+            限流器实例
+        """
+        return cls(
+            providers=rate_limit_config.get("providers"),
+            default=rate_limit_config.get("default")
+        )
+
+
+# 可重试的HTTP状态码：请求超时、冲突、限流和服务端错误
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class RetryPolicy:
+    """API调用重试策略：指数退避加随机抖动，遵循Retry-After，并受单次调用的总时长预算约束"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 budget_seconds: float = 120.0):
+        """初始化重试策略
+
+        Args:
+            max_attempts: 最多尝试次数（含首次调用）
+            base_delay: 首次重试的基础等待秒数
+            max_delay: 单次退避的最大等待秒数
+            budget_seconds: 单次调用（含所有重试）允许的最长总时长
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """判断异常是否为可重试的临时错误
+
+        Args:
+            error: 调用异常
+
+        Returns:
+            可重试时返回True
+        """
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+
+    @staticmethod
+    def get_retry_after(error: Exception) -> Optional[float]:
+        """从异常响应头中读取服务端建议的等待时间
+
+        Args:
+            error: 调用异常
+
+        Returns:
+            等待秒数，响应头不存在或无法解析时返回None
+        """
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000.0
+            if "retry-after" in headers:
+                value = headers["retry-after"]
+                try:
+                    return float(value)
+                except ValueError:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+        return None
+
+    def next_delay(self, error: Exception, attempt: int, started_at: float) -> Optional[float]:
+        """计算下一次重试前的等待时间
+
+        Args:
+            error: 本次调用的异常
+            attempt: 已尝试次数
+            started_at: 首次调用的开始时间（time.monotonic）
+
+        Returns:
+            等待秒数，不应再重试时返回None
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(error):
+            return None
+
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(backoff / 2, backoff)
+        retry_after = self.get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if time.monotonic() - started_at + delay > self.budget_seconds:
+            return None
+        return delay
+
+    @classmethod
+    def from_config(cls, retry_config: Dict[str, Any]) -> "RetryPolicy":
+        """根据重试配置创建重试策略
+
+        Args:
+            retry_config: 重试配置字典
+
+        Returns:
+            重试策略实例
+        """
+        return cls(
+            max_attempts=retry_config["max_attempts"],
+            base_delay=retry_config["base_delay"],
+            max_delay=retry_config["max_delay"],
+            budget_seconds=retry_config["budget_seconds"]
+        )
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+class ResponseCache:
+    """模型响应的磁盘缓存，使用SQLite保存
+
+    缓存键为(api_base, model_name, messages, temperature)的SHA-256摘要，
+    相同提示词的重复调用直接返回缓存内容。超过ttl_seconds的条目视为过期，
+    总大小超过max_bytes时按最近访问时间淘汰最旧的条目。
+    """
+
+    def __init__(self, path: str = "cache/responses.db", max_bytes: int = 100 * 1024 * 1024,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        """初始化响应缓存
+
+        Args:
+            path: SQLite数据库文件路径，为":memory:"时只保存在内存中
+            max_bytes: 缓存内容的最大总字节数
+            ttl_seconds: 缓存条目的有效期（秒），为0时不过期
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if path != ":memory:" and directory:
+            os.makedirs(directory, exist_ok=True)
+        # 调用方通过线程池访问缓存，连接在多个线程间共享，由_lock串行化
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(api_base: str, model_name: str, messages: List[Dict[str, str]], temperature: float) -> str:
+        """计算缓存键
+
+        Args:
+            api_base: API基础URL
+            model_name: 模型名称
+            messages: 消息列表
+            temperature: 温度参数
+
+        Returns:
+            SHA-256十六进制摘要
+        """
+        payload = json.dumps([api_base, model_name, messages, temperature], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存内容
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的响应内容，未命中或已过期时返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, size, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            content, size, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= size
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return content
+
+    def set(self, key: str, content: str) -> None:
+        """写入缓存内容，超出容量时淘汰最久未访问的条目
+
+        Args:
+            key: 缓存键
+            content: 响应内容
+        """
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """按最近访问时间从旧到新淘汰条目，直到总大小不超过上限"""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 32"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+        logging.info("模型响应缓存已清空")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            total_bytes = self._total_bytes
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> Optional["ResponseCache"]:
+        """根据缓存配置创建响应缓存
+
+        Args:
+            cache_config: 缓存配置字典
+
+        Returns:
+            响应缓存实例，未启用时返回None
+        """
+        if not cache_config["enabled"]:
+            return None
+        return cls(
+            path=cache_config["path"],
+            max_bytes=int(cache_config["max_size_mb"] * 1024 * 1024),
+            ttl_seconds=cache_config["ttl_seconds"]
+        )
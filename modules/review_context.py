@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from .event_stream import ReviewEventStream
+
+# 当前执行上下文所属的审查ID和日志缓冲区。
+# asyncio任务创建时复制上下文，审查阶段内并发的专家调用会继承同一绑定。
+current_review_id: ContextVar[Optional[str]] = ContextVar("current_review_id", default=None)
+current_log_buffer: ContextVar[Optional[ReviewEventStream]] = ContextVar("current_log_buffer", default=None)
+
+@contextmanager
+def bind_review(review_id: str, log_buffer: Optional[ReviewEventStream] = None):
+    """在当前上下文中绑定审查会话，退出时恢复原绑定
+
+    Args:
+        review_id: 审查ID
+        log_buffer: 该审查的日志缓冲区
+    """
+    review_token = current_review_id.set(review_id)
+    log_token = current_log_buffer.set(log_buffer)
+    try:
+        yield
+    finally:
+        current_log_buffer.reset(log_token)
+        current_review_id.reset(review_token)
@@ -1,35 +1,66 @@
 # -*- coding: utf-8 -*-
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 import time
 from .role_manager import RoleManager, OrganizerModel, ExpertModel
 from .file_parser import FileParser
+from .chunker import DocumentChunker
+from .event_stream import ReviewEventStream
+from .telemetry import ResponseTelemetry
+from . import metrics
+from .metrics import timed
 
 class ReviewProcess:
     """审查流程类，负责协调分析、讨论和总结三个阶段"""
     
-    def __init__(self, role_manager: RoleManager, file_parser: FileParser):
+    # 审查阶段按执行顺序排列
+    STAGES = ("analysis", "discussion", "summary")
+    
+    # 未在期限内完成的片段结果的占位内容
+    MISSING_CONTENT = "（未在期限内完成）"
+    
+    def __init__(self, role_manager: RoleManager, file_parser: FileParser,
+                 chunker: Optional[DocumentChunker] = None, temp_dir: Optional[str] = None,
+                 call_timeout: float = 0, stage_timeout: float = 0):
         """初始化审查流程
         
         Args:
             role_manager: 角色管理器实例
             file_parser: 文件解析器实例
+            chunker: 文档切分器，为None时使用默认配置
+            temp_dir: 解析临时文件目录（审查的工作目录），为None时使用解析器的临时目录
+            call_timeout: 单次模型调用的期限（秒），从获得并发槽位开始计算，为0时不限制
+            stage_timeout: 每个阶段收集专家结果的最长时间（秒），从阶段开始计算，为0时不限制；
+                到期后未完成的专家调用被取消，组织者只汇总已完成的结果
         """
         self.role_manager = role_manager
         self.file_parser = file_parser
+        self.chunker = chunker or DocumentChunker()
+        self.temp_dir = temp_dir
+        self.call_timeout = call_timeout
+        self.stage_timeout = stage_timeout
         self.organizer = role_manager.get_organizer()
         self.experts = role_manager.get_experts()
         self.file_content = ""
         self.review_points = ""
+        # 按章节切分的文档片段，专家并发审查各片段后按章节汇总
+        self.chunks: List[Dict[str, Any]] = []
+        self.section_results: List[Dict[str, Any]] = []
         self.analysis_results = []
         self.discussion_results = []
         self.final_report = {}
+        # 各阶段未在期限内完成的专家，总结时写入报告
+        self.missing_experts: Dict[str, List[Dict[str, Any]]] = {}
         self.progress = {
             "stage": "初始化",
             "status": "准备中",
             "expert_progress": {}
         }
+        # 阶段变化和模型输出增量推送到事件流，供/stream接口实时下发
+        self.events = ReviewEventStream()
+        # 模型调用记录（模型、角色、耗时、输出内容）和token用量，由执行阶段时绑定到上下文
+        self.telemetry = ResponseTelemetry(currency=role_manager.usage_ledger.currency)
     
     def update_progress(self, stage: str, status: str, expert_name: str = None, expert_status: str = None) -> None:
         """更新进度信息
@@ -46,8 +77,66 @@ class ReviewProcess:
         if expert_name and expert_status:
             self.progress["expert_progress"][expert_name] = expert_status
         
+        self._publish_progress()
         logging.info(f"进度更新: {stage} - {status}")
     
+    def _publish_progress(self) -> None:
+        """将当前进度推送到事件流"""
+        self.events.publish("stage", {
+            "stage": self.progress["stage"],
+            "status": self.progress["status"],
+            "expert_progress": dict(self.progress["expert_progress"])
+        })
+    
+    def _delta_callback(self, role: str, model_name: str, expertise: str = "", section: str = "") -> Callable[[str], None]:
+        """创建把模型输出增量推送到事件流的回调
+        
+        Args:
+            role: 角色名称
+            model_name: 模型名称
+            expertise: 专业领域
+            section: 文档片段所属章节
+            
+        Returns:
+            增量内容回调
+        """
+        stage = self.progress["stage"]
+        
+        def on_delta(content: str) -> None:
+            self.events.publish("token", {
+                "stage": stage,
+                "role": role,
+                "model_name": model_name,
+                "expertise": expertise,
+                "section": section,
+                "content": content
+            })
+        
+        return on_delta
+    
+    def select_experts(self, names: Optional[List[str]] = None) -> List[str]:
+        """选择参与后续阶段的专家
+        
+        Args:
+            names: 专家的模型名称或专业领域列表，为空时恢复为全部专家
+            
+        Returns:
+            选中专家的模型名称列表
+        """
+        all_experts = self.role_manager.get_experts()
+        if not names:
+            self.experts = all_experts
+        else:
+            selected = [expert for expert in all_experts if expert.model_name in names or expert.expertise in names]
+            if not selected:
+                raise ValueError(f"未找到指定的专家: {', '.join(names)}")
+            self.experts = selected
+        
+        self.progress["expert_progress"] = {expert.model_name: "待命" for expert in self.experts}
+        self._publish_progress()
+        logging.info(f"参与审查的专家: {', '.join(expert.model_name for expert in self.experts)}")
+        return [expert.model_name for expert in self.experts]
+    
     def get_progress(self) -> Dict[str, Any]:
         """获取当前进度信息
         
@@ -56,41 +145,87 @@ class ReviewProcess:
         """
         return self.progress
     
-    async def analyze_document(self, file_path: str) -> Dict[str, Any]:
+    @timed(metrics.STAGE_DURATION, stage="analysis")
+    async def analyze_document(self, file_path: str, file_hash: Optional[str] = None,
+                               file_name: Optional[str] = None) -> Dict[str, Any]:
         """分析阶段：解析文件并收集专家审查要点
         
         Args:
             file_path: 文件路径
+            file_hash: 文件内容的SHA-256摘要，用于查找解析缓存
+            file_name: 用户上传时的原始文件名，为None时使用文件路径中的文件名
             
         Returns:
             分析结果字典
         """
+        self._require_experts()
         self.update_progress("分析阶段", "开始解析文件")
+        self.telemetry.stage = "analysis"
+        
+        self.chunks = []
+        deadline = self._stage_deadline()
+        # 每位专家在各片段上的分析任务，与self.experts按位置对应（多位专家可能使用同一模型），
+        # 片段一切分出来就立即派发
+        chunk_tasks: List[List[asyncio.Task]] = [[] for _ in self.experts]
         
         try:
-            # 解析文件
-            file_result = self.file_parser.parse_file(file_path)
-            self.file_content = file_result["content"]
-            self.update_progress("分析阶段", f"文件解析完成: {file_result['file_name']}")
+            start_time = time.time()
+            for expert in self.experts:
+                self.progress["expert_progress"][expert.model_name] = "分析中"
+            
+            def dispatch(chunk: Dict[str, Any]) -> None:
+                self.chunks.append(chunk)
+                prompt = self.organizer.generate_analysis_prompt(chunk["content"], chunk["title"])
+                for expert, tasks in zip(self.experts, chunk_tasks):
+                    tasks.append(asyncio.create_task(self._analyze_chunk(expert, chunk, prompt, tasks)))
             
-            # 生成分析提示词
-            prompt = self.organizer.generate_analysis_prompt(self.file_content)
+            # 流式解析：PDF前面的页切分出片段后即开始专家审查，与后续页的提取重叠进行
+            packer = self.chunker.packer()
+            file_result = None
+            streamed = False
+            parse_events = self.file_parser.iter_parse(
+                file_path,
+                file_hash,
+                progress=lambda message: self.update_progress("分析阶段", message),
+                temp_dir=self.temp_dir,
+                file_name=file_name
+            )
+            try:
+                async for kind, payload in parse_events:
+                    if kind == "page":
+                        streamed = True
+                        for chunk in packer.add_page(*payload):
+                            dispatch(chunk)
+                    else:
+                        file_result = payload
+            finally:
+                await parse_events.aclose()
+            
+            # Word文档和缓存命中的结果一次性返回，解析完成后整体切分
+            remaining = packer.finish() if streamed else self.chunker.split(file_result)
+            if not remaining and not self.chunks:
+                remaining = [self.chunker.whole_document(file_result)]
+            for chunk in remaining:
+                dispatch(chunk)
+            self.file_content = file_result["content"]
+            self.update_progress("分析阶段", f"文件解析完成: {file_result['file_name']}，切分为{len(self.chunks)}个片段")
             
             # 并行调用所有专家进行分析
             self.update_progress("分析阶段", f"开始收集专家审查要点 (0/{len(self.experts)})")
             
-            # 创建专家分析任务
-            expert_tasks = []
-            for expert in self.experts:
-                self.progress["expert_progress"][expert.model_name] = "分析中"
-                expert_tasks.append(self._analyze_with_expert(expert, prompt))
+            # 等待所有专家完成各自的片段任务
+            self.analysis_results = await asyncio.gather(*[
+                self._analyze_with_expert(expert, tasks, start_time, deadline)
+                for expert, tasks in zip(self.experts, chunk_tasks)
+            ])
             
-            # 等待所有专家完成分析
-            self.analysis_results = await asyncio.gather(*expert_tasks)
-            
-            # 汇总审查要点
+            # 汇总审查要点，组织者只汇总在期限内有结果的专家
             self.update_progress("分析阶段", "汇总审查要点")
-            self.review_points = self.organizer.summarize_review_points(self.analysis_results)
+            self.review_points = await self.organizer.summarize_review_points(
+                self._finished_results("analysis", self.analysis_results),
+                on_delta=self._delta_callback("organizer", self.organizer.model_name),
+                timeout=self._call_timeout()
+            )
             
             self.update_progress("分析阶段", "完成")
             
@@ -99,36 +234,72 @@ class ReviewProcess:
                 "expert_results": self.analysis_results,
                 "review_points": self.review_points
             }
-        except Exception as e:
-            self.update_progress("分析阶段", f"失败: {str(e)}")
-            logging.error(f"分析阶段失败: {str(e)}")
+        except BaseException as e:
+            # 解析失败或阶段被取消时，不再等待已派发的片段任务
+            for tasks in chunk_tasks:
+                for task in tasks:
+                    task.cancel()
+            if isinstance(e, Exception):
+                self.update_progress("分析阶段", f"失败: {str(e)}")
+                logging.error(f"分析阶段失败: {str(e)}")
             raise
     
-    async def _analyze_with_expert(self, expert: ExpertModel, prompt: str) -> Dict[str, Any]:
-        """使用单个专家进行分析
+    async def _analyze_chunk(self, expert: ExpertModel, chunk: Dict[str, Any], prompt: List[Dict[str, str]],
+                             siblings: List[asyncio.Task]) -> Dict[str, Any]:
+        """使用单个专家分析一个片段
         
         Args:
             expert: 专家模型实例
-            prompt: 分析提示词
+            chunk: 文档片段
+            prompt: 该片段的分析阶段消息列表
+            siblings: 该专家已派发的全部片段任务，用于显示进度
+            
+        Returns:
+            片段分析结果
+        """
+        try:
+            result = await expert.analyze_document(
+                prompt,
+                on_delta=self._delta_callback("expert", expert.model_name, expert.expertise, chunk["title"]),
+                timeout=self._call_timeout()
+            )
+        except TimeoutError:
+            # 单次调用超时只记该片段缺失，不影响该专家的其他片段
+            result = self._missing_result(expert)
+        done = sum(1 for task in siblings if task.done()) + 1
+        if len(siblings) > 1:
+            self.progress["expert_progress"][expert.model_name] = f"分析中 ({done}/{len(siblings)})"
+            self._publish_progress()
+        return result
+    
+    async def _analyze_with_expert(self, expert: ExpertModel, chunk_tasks: List[asyncio.Task],
+                                   start_time: float, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """等待单个专家的全部片段分析任务，并合并为一份结果
+        
+        Args:
+            expert: 专家模型实例
+            chunk_tasks: 与self.chunks一一对应的片段分析任务
+            start_time: 阶段开始时间，耗时从解析开始计算
+            deadline: 阶段截止时间（time.monotonic），到期未完成的片段任务被取消
             
         Returns:
             专家分析结果
         """
         try:
-            start_time = time.time()
-            result = expert.analyze_document(prompt)
+            chunk_results = await self._collect(expert, chunk_tasks, deadline)
+            result = self._merge_chunk_results(chunk_results)
             elapsed_time = time.time() - start_time
             
             # 更新专家进度
-            self.progress["expert_progress"][expert.model_name] = "完成"
-            completed = sum(1 for status in self.progress["expert_progress"].values() if status == "完成")
-            self.update_progress("分析阶段", f"收集专家审查要点 ({completed}/{len(self.experts)})")
+            self.progress["expert_progress"][expert.model_name] = self._expert_status(result)
+            self.update_progress("分析阶段", f"收集专家审查要点 ({self._finished_experts()}/{len(self.experts)})")
             
             # 添加耗时信息
             result["elapsed_time"] = elapsed_time
             return result
         except Exception as e:
             self.progress["expert_progress"][expert.model_name] = f"失败: {str(e)}"
+            self._publish_progress()
             logging.error(f"专家{expert.model_name}分析失败: {str(e)}")
             return {
                 "model_name": expert.model_name,
@@ -137,6 +308,7 @@ class ReviewProcess:
                 "elapsed_time": 0
             }
     
+    @timed(metrics.STAGE_DURATION, stage="discussion")
     async def discuss_document(self) -> Dict[str, Any]:
         """讨论阶段：专家基于审查要点讨论文档问题
         
@@ -145,12 +317,18 @@ class ReviewProcess:
         """
         if not self.file_content or not self.review_points:
             raise ValueError("请先完成分析阶段")
+        self._require_experts()
         
         self.update_progress("讨论阶段", "开始讨论文档问题")
+        self.telemetry.stage = "discussion"
+        deadline = self._stage_deadline()
         
         try:
-            # 生成讨论提示词
-            prompt = self.organizer.generate_discussion_prompt(self.file_content, self.review_points)
+            # 为每个片段生成讨论提示词，同一片段的材料前缀与分析阶段相同
+            prompts = [
+                self.organizer.generate_discussion_prompt(chunk["content"], self.review_points, chunk["title"])
+                for chunk in self.chunks
+            ]
             
             # 重置专家进度
             for expert in self.experts:
@@ -162,46 +340,51 @@ class ReviewProcess:
             # 创建专家讨论任务
             expert_tasks = []
             for expert in self.experts:
-                expert_tasks.append(self._discuss_with_expert(expert, prompt))
+                expert_tasks.append(self._discuss_with_expert(expert, prompts, deadline))
             
             # 等待所有专家完成讨论
             self.discussion_results = await asyncio.gather(*expert_tasks)
+            self.section_results = self._reduce_by_section(self.discussion_results)
             
             self.update_progress("讨论阶段", "完成")
             
             return {
-                "expert_results": self.discussion_results
+                "expert_results": self.discussion_results,
+                "sections": self.section_results
             }
         except Exception as e:
             self.update_progress("讨论阶段", f"失败: {str(e)}")
             logging.error(f"讨论阶段失败: {str(e)}")
             raise
     
-    async def _discuss_with_expert(self, expert: ExpertModel, prompt: str) -> Dict[str, Any]:
-        """使用单个专家进行讨论
+    async def _discuss_with_expert(self, expert: ExpertModel, prompts: List[List[Dict[str, str]]],
+                                   deadline: Optional[float] = None) -> Dict[str, Any]:
+        """使用单个专家并发讨论所有片段，并合并为一份结果
         
         Args:
             expert: 专家模型实例
-            prompt: 讨论提示词
+            prompts: 与self.chunks一一对应的讨论提示词
+            deadline: 阶段截止时间（time.monotonic），到期未完成的片段调用被取消
             
         Returns:
             专家讨论结果
         """
         try:
             start_time = time.time()
-            result = expert.discuss_document(prompt)
+            chunk_results = await self._map_chunks(expert, "讨论中", expert.discuss_document, prompts, deadline)
+            result = self._merge_chunk_results(chunk_results)
             elapsed_time = time.time() - start_time
             
             # 更新专家进度
-            self.progress["expert_progress"][expert.model_name] = "完成"
-            completed = sum(1 for status in self.progress["expert_progress"].values() if status == "完成")
-            self.update_progress("讨论阶段", f"收集专家讨论结果 ({completed}/{len(self.experts)})")
+            self.progress["expert_progress"][expert.model_name] = self._expert_status(result)
+            self.update_progress("讨论阶段", f"收集专家讨论结果 ({self._finished_experts()}/{len(self.experts)})")
             
             # 添加耗时信息
             result["elapsed_time"] = elapsed_time
             return result
         except Exception as e:
             self.progress["expert_progress"][expert.model_name] = f"失败: {str(e)}"
+            self._publish_progress()
             logging.error(f"专家{expert.model_name}讨论失败: {str(e)}")
             return {
                 "model_name": expert.model_name,
@@ -210,6 +393,202 @@ class ReviewProcess:
                 "elapsed_time": 0
             }
     
+    async def _map_chunks(self, expert: ExpertModel, status: str, call: Callable[..., Any],
+                          prompts: List[List[Dict[str, str]]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """让单个专家并发处理所有片段，实际并发数由角色管理器的并发限制器控制
+        
+        Args:
+            expert: 专家模型实例
+            status: 专家进度中显示的状态，如"分析中"
+            call: 专家的审查方法（analyze_document或discuss_document）
+            prompts: 与self.chunks一一对应的提示词
+            deadline: 阶段截止时间（time.monotonic），到期未完成的片段调用被取消
+            
+        Returns:
+            按片段顺序排列的结果列表，超时的片段为占位结果
+        """
+        total = len(prompts)
+        done = 0
+        
+        async def run(chunk: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+            nonlocal done
+            try:
+                result = await call(
+                    prompt,
+                    on_delta=self._delta_callback("expert", expert.model_name, expert.expertise, chunk["title"]),
+                    timeout=self._call_timeout()
+                )
+            except TimeoutError:
+                return self._missing_result(expert)
+            done += 1
+            if total > 1:
+                self.progress["expert_progress"][expert.model_name] = f"{status} ({done}/{total})"
+                self._publish_progress()
+            return result
+        
+        tasks = [asyncio.create_task(run(chunk, prompt)) for chunk, prompt in zip(self.chunks, prompts)]
+        return await self._collect(expert, tasks, deadline)
+    
+    def _require_experts(self) -> None:
+        """检查是否有参与审查的专家，没有时直接报错，而不是等到阶段期限后报告超时"""
+        if not self.experts:
+            raise ValueError("没有参与审查的专家，请检查专家配置或专家选择")
+    
+    def _stage_deadline(self) -> Optional[float]:
+        """计算当前阶段收集专家结果的截止时间
+        
+        Returns:
+            截止时间（time.monotonic），不限制时返回None
+        """
+        return time.monotonic() + self.stage_timeout if self.stage_timeout else None
+    
+    def _call_timeout(self) -> Optional[float]:
+        """单次模型调用的期限，不限制时返回None"""
+        return self.call_timeout or None
+    
+    async def _collect(self, expert: ExpertModel, tasks: List[asyncio.Task],
+                       deadline: Optional[float]) -> List[Dict[str, Any]]:
+        """等待单个专家的片段任务直到阶段截止时间
+        
+        到期未完成的任务被取消（中止进行中的模型调用），其结果以占位结果代替；
+        等待期间阶段被取消时，同时取消所有片段任务。
+        
+        Args:
+            expert: 专家模型实例
+            tasks: 与self.chunks一一对应的片段任务
+            deadline: 阶段截止时间（time.monotonic），为None时等待全部完成
+            
+        Returns:
+            按片段顺序排列的结果列表
+        """
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            pending = set()
+            if tasks:
+                _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                logging.warning(f"专家{expert.model_name}有{len(pending)}个片段未在阶段期限内完成，已取消")
+        finally:
+            for task in tasks:
+                task.cancel()
+        return [self._missing_result(expert) if task in pending else task.result() for task in tasks]
+    
+    def _missing_result(self, expert: ExpertModel) -> Dict[str, Any]:
+        """生成未在期限内完成的片段的占位结果"""
+        return {
+            "model_name": expert.model_name,
+            "expertise": expert.expertise,
+            "content": self.MISSING_CONTENT,
+            "response_time": 0,
+            "missing": True
+        }
+    
+    @staticmethod
+    def _expert_status(result: Dict[str, Any]) -> str:
+        """根据合并后的专家结果生成进度状态"""
+        if result["status"] == "timeout":
+            return "超时"
+        if result["status"] == "partial":
+            finished = len(result["sections"]) - len(result["missing_sections"])
+            return f"部分完成 ({finished}/{len(result['sections'])})"
+        return "完成"
+    
+    def _finished_experts(self) -> int:
+        """统计已结束（完成、部分完成或超时）的专家数"""
+        return sum(1 for status in self.progress["expert_progress"].values()
+                   if status.startswith(("完成", "部分完成", "超时")))
+    
+    def _finished_results(self, stage: str, expert_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """筛选在期限内有结果的专家，并记录缺失的专家供报告标注
+        
+        Args:
+            stage: 阶段名称（analysis/discussion）
+            expert_results: 各专家合并后的结果
+            
+        Returns:
+            至少完成了一个片段的专家结果
+            
+        Raises:
+            TimeoutError: 没有任何专家在期限内完成
+        """
+        self.missing_experts[stage] = [
+            {
+                "model_name": result["model_name"],
+                "expertise": result["expertise"],
+                "status": result["status"],
+                "missing_sections": result["missing_sections"]
+            }
+            for result in expert_results
+            if result.get("status") in ("partial", "timeout")
+        ]
+        finished = [result for result in expert_results if result.get("status") != "timeout"]
+        if not finished:
+            raise TimeoutError("没有专家在期限内完成")
+        return finished
+    
+    def _merge_chunk_results(self, chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """把单个专家在各片段上的结果合并为一份，内容按章节标注
+        
+        Args:
+            chunk_results: 按片段顺序排列的结果列表
+            
+        Returns:
+            合并后的专家结果，sections保存各片段的原始内容
+        """
+        result = dict(chunk_results[0])
+        result.pop("missing", None)
+        sections = [
+            {
+                "index": chunk["index"],
+                "title": chunk["title"],
+                "content": chunk_result["content"],
+                "missing": chunk_result.get("missing", False)
+            }
+            for chunk, chunk_result in zip(self.chunks, chunk_results)
+        ]
+        if len(sections) > 1:
+            result["content"] = "\n\n".join(f"【{section['title']}】\n{section['content']}" for section in sections)
+        result["sections"] = sections
+        result["response_time"] = round(sum(chunk_result.get("response_time", 0) for chunk_result in chunk_results), 3)
+        # 超时的片段记为缺失，全部缺失的专家不参与组织者汇总
+        result["missing_sections"] = [section["title"] for section in sections if section["missing"]]
+        if not result["missing_sections"]:
+            result["status"] = "completed"
+        elif len(result["missing_sections"]) == len(sections):
+            result["status"] = "timeout"
+        else:
+            result["status"] = "partial"
+        return result
+    
+    def _reduce_by_section(self, expert_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把各专家的结果按章节归并
+        
+        Args:
+            expert_results: 各专家合并后的结果
+            
+        Returns:
+            章节结果列表，每个章节包含各专家对该章节的意见
+        """
+        sections = []
+        for chunk in self.chunks:
+            section = {"index": chunk["index"], "title": chunk["title"], "expert_results": []}
+            if chunk.get("pages"):
+                section["pages"] = chunk["pages"]
+            for result in expert_results:
+                # 失败的专家没有分片段结果
+                expert_sections = result.get("sections") or []
+                if chunk["index"] < len(expert_sections) and expert_sections[chunk["index"]]["missing"]:
+                    section.setdefault("missing_experts", []).append(result["model_name"])
+                elif chunk["index"] < len(expert_sections):
+                    section["expert_results"].append({
+                        "model_name": result["model_name"],
+                        "expertise": result["expertise"],
+                        "content": expert_sections[chunk["index"]]["content"]
+                    })
+            sections.append(section)
+        return sections
+    
+    @timed(metrics.STAGE_DURATION, stage="summary")
     async def generate_summary(self) -> Dict[str, Any]:
         """总结阶段：生成最终审查报告
         
@@ -220,10 +599,26 @@ class ReviewProcess:
             raise ValueError("请先完成讨论阶段")
         
         self.update_progress("总结阶段", "开始生成最终报告")
+        self.telemetry.stage = "summary"
         
         try:
             # 生成最终报告
-            self.final_report = self.organizer.generate_final_report(self.discussion_results, self.file_content)
+            self.final_report = await self.organizer.generate_final_report(
+                self._finished_results("discussion", self.discussion_results),
+                self.file_content,
+                on_delta=self._delta_callback("organizer", self.organizer.model_name),
+                timeout=self._call_timeout()
+            )
+            # 报告中标注未在期限内完成的专家
+            missing = [
+                {"stage": stage, **expert}
+                for stage in ("analysis", "discussion")
+                for expert in self.missing_experts.get(stage, [])
+            ]
+            if missing:
+                self.final_report["missing_experts"] = missing
+            # 本次审查各阶段、各模型的token用量和估算费用
+            self.final_report["token_usage"] = self.telemetry.get_usage()
             
             self.update_progress("总结阶段", "完成")
             
@@ -233,6 +628,70 @@ class ReviewProcess:
             logging.error(f"总结阶段失败: {str(e)}")
             raise
     
+    def next_stage(self) -> Optional[str]:
+        """根据已完成的阶段确定下一个审查阶段
+        
+        Returns:
+            阶段名称（analysis/discussion/summary），全部完成时返回None
+        """
+        if not self.review_points:
+            return "analysis"
+        if not self.discussion_results:
+            return "discussion"
+        if not self.final_report:
+            return "summary"
+        return None
+    
+    async def run_all(self, file_path: str, file_hash: Optional[str] = None,
+                      approve: Optional[Callable[[str], Awaitable[bool]]] = None,
+                      on_stage_complete: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+                      file_name: Optional[str] = None) -> Dict[str, Any]:
+        """在服务端依次执行尚未完成的分析、讨论和总结阶段，阶段之间没有客户端往返
+        
+        Args:
+            file_path: 文件路径
+            file_hash: 文件内容的SHA-256摘要，用于查找解析缓存
+            approve: 进入讨论和总结阶段前调用，参数为阶段名称；返回False时暂停，
+                之后再次调用run_all从该阶段继续
+            on_stage_complete: 每个阶段完成后调用，参数为阶段名称和该阶段的结果
+            file_name: 用户上传时的原始文件名，为None时使用文件路径中的文件名
+            
+        Returns:
+            结果字典，completed为本次完成的阶段，paused_before为暂停前的下一阶段（未暂停时为None），
+            另含analysis_results、discussion_results和final_report
+        """
+        runners = {
+            "analysis": lambda: self.analyze_document(file_path, file_hash, file_name),
+            "discussion": self.discuss_document,
+            "summary": self.generate_summary
+        }
+        completed: List[str] = []
+        paused_before = None
+        
+        stage = self.next_stage()
+        while stage is not None:
+            # 第一个阶段由调用方发起，之后的阶段在开始前征求确认
+            if completed and approve is not None and not await approve(stage):
+                paused_before = stage
+                logging.info(f"审查暂停，等待确认后进入{stage}阶段")
+                break
+            result = await runners[stage]()
+            completed.append(stage)
+            if on_stage_complete is not None:
+                await on_stage_complete(stage, result)
+            stage = self.next_stage()
+            if stage in completed:
+                # 阶段产出为空（如模型未返回内容）时不重复执行
+                raise ValueError(f"{stage}阶段未产生结果")
+        
+        return {
+            "completed": completed,
+            "paused_before": paused_before,
+            "analysis_results": self.analysis_results,
+            "discussion_results": self.discussion_results,
+            "final_report": self.final_report
+        }
+    
     def get_analysis_results(self) -> List[Dict[str, Any]]:
         """获取分析阶段结果
         
@@ -1,14 +1,195 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
 import os
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Callable, Tuple
+import httpx
+import openai
+from openai import AsyncOpenAI
+from . import metrics
 from .config_manager import ConfigManager
+from .scheduler import ProviderLimiter
+from .rate_limiter import ProviderRateLimiter, RetryPolicy, estimate_tokens
+from .telemetry import ResponseTelemetry, current_telemetry
+from .response_cache import ResponseCache
+from .hedging import HedgePolicy
+from .transport import TransportRegistry
+from .usage import PriceTable, UsageLedger
+from .compat import to_thread
+
+# 所有专家、所有阶段共用的系统提示词。请求按"系统提示词、材料、阶段指令、专家指令"排列，
+# 同一片段在各专家和分析、讨论阶段的请求共享前两条消息构成的前缀，便于服务商缓存前缀
+REVIEW_SYSTEM_PROMPT = "你是文档审查小组的成员，请根据最后的指令，从指定的专业角度审查用户提供的材料。"
+
+
+def extract_usage(usage: Any) -> Optional[Dict[str, int]]:
+    """从响应的usage字段中提取token用量
+    
+    Args:
+        usage: 响应或流式数据块的usage字段，SDK未声明该字段时为字典
+        
+    Returns:
+        用量字典，包含prompt_tokens、completion_tokens和cached_tokens（命中服务商前缀缓存的输入token数）；
+        没有用量信息时返回None
+    """
+    def field(source: Any, name: str) -> Any:
+        return source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+    
+    prompt_tokens = field(usage, "prompt_tokens")
+    if not isinstance(prompt_tokens, int):
+        return None
+    completion_tokens = field(usage, "completion_tokens")
+    # OpenAI格式为prompt_tokens_details.cached_tokens，DeepSeek格式为prompt_cache_hit_tokens
+    cached_tokens = field(field(usage, "prompt_tokens_details"), "cached_tokens")
+    if cached_tokens is None:
+        cached_tokens = field(usage, "prompt_cache_hit_tokens")
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens if isinstance(completion_tokens, int) else 0,
+        "cached_tokens": cached_tokens if isinstance(cached_tokens, int) else 0
+    }
+
+
+def error_status(error: BaseException) -> str:
+    """把调用异常归类为监控指标中的状态
+    
+    Args:
+        error: 调用异常
+        
+    Returns:
+        服务商返回的HTTP状态码，超时为timeout，网络错误为connection，其他为other
+    """
+    if isinstance(error, openai.APIStatusError):
+        return str(error.status_code)
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError)):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    return "other"
+
+
+class ResponseCollector:
+    """包装流式响应，迭代时收集响应内容并推送增量"""
+    
+    def __init__(self, stream, role_name: str, model_name: str,
+                 on_delta: Optional[Callable[[str], None]] = None,
+                 on_complete: Optional[Callable[[str], None]] = None):
+        """初始化响应收集器
+        
+        Args:
+            stream: 原始流式响应
+            role_name: 角色名称
+            model_name: 模型名称
+            on_delta: 增量内容回调
+            on_complete: 流读取完毕时的回调，传入完整内容
+        """
+        self.stream = stream
+        self.role_name = role_name
+        self.model_name = model_name
+        self.on_delta = on_delta
+        self.on_complete = on_complete
+        self.collected_content = []
+        # 请求了流式用量时，最后一个数据块携带本次调用的token用量
+        self.usage: Optional[Dict[str, int]] = None
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        try:
+            chunk = await self.stream.__anext__()
+        except StopAsyncIteration:
+            if self.on_complete is not None:
+                on_complete, self.on_complete = self.on_complete, None
+                on_complete(self.get_content())
+            raise
+        usage = extract_usage(getattr(chunk, "usage", None))
+        if usage is not None:
+            self.usage = usage
+        content = chunk.choices[0].delta.content if chunk.choices and chunk.choices[0].delta.content else ''
+        # 只有当内容不为空时才收集和推送
+        if content:
+            self.collected_content.append(content)
+            if self.on_delta is not None:
+                self.on_delta(content)
+        return chunk
+    
+    def get_content(self) -> str:
+        """获取已收集的完整内容
+        
+        Returns:
+            拼接后的响应内容
+        """
+        return ''.join(self.collected_content)
+
+
+class PrefetchedStream:
+    """已读取首个数据块的流式响应，迭代时先返回该数据块"""
+    
+    def __init__(self, stream, first_chunk: Any = None):
+        """初始化预读的流式响应
+        
+        Args:
+            stream: 原始流式响应
+            first_chunk: 已读取的首个数据块，为None表示流中没有数据
+        """
+        self.stream = stream
+        self.response = getattr(stream, "response", None)
+        self._first_chunk = first_chunk
+        self._exhausted = first_chunk is None
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        if self._first_chunk is not None:
+            chunk, self._first_chunk = self._first_chunk, None
+            return chunk
+        if self._exhausted:
+            raise StopAsyncIteration
+        return await self.stream.__anext__()
+
+
+async def read_chunk(stream, timeout: Optional[float] = None) -> Any:
+    """读取流式响应的下一个数据块
+    
+    Args:
+        stream: 流式响应
+        timeout: 等待数据块的最长时间（秒），为None时不限制
+        
+    Returns:
+        数据块，流结束时抛出StopAsyncIteration
+    """
+    if not timeout:
+        return await stream.__anext__()
+    return await asyncio.wait_for(stream.__anext__(), timeout)
+
+
+async def close_stream(stream) -> None:
+    """关闭未读完的流式响应，释放底层连接"""
+    response = getattr(stream, "response", None)
+    try:
+        await response.aclose()
+    except Exception:
+        pass
+
 
 class AIModel:
     """AI模型基类，封装API调用逻辑"""
     
-    def __init__(self, api_base: str, model_name: str, api_key: str, role_name: str):
+    def __init__(self, api_base: str, model_name: str, api_key: str, role_name: str,
+                 limiter: Optional[ProviderLimiter] = None,
+                 rate_limiter: Optional[ProviderRateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 hedge_policy: Optional[HedgePolicy] = None,
+                 hedge_model: Optional["AIModel"] = None,
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 stream_usage: bool = False,
+                 usage_ledger: Optional[UsageLedger] = None):
         """初始化AI模型
         
         Args:
@@ -16,184 +197,444 @@ class AIModel:
             model_name: 模型名称
             api_key: API密钥
             role_name: 角色名称
+            limiter: 端点/模型并发限制器，为None时不限制
+            rate_limiter: 服务商限流器，为None时不限流
+            retry_policy: 重试策略，为None时使用默认策略
+            response_cache: 响应缓存，为None时不缓存
+            hedge_policy: 对冲请求策略，为None时不对冲
+            hedge_model: 接收对冲请求的备用模型，为None时向本模型再发一次请求
+            http_client: 同一端点共享的HTTP客户端，为None时使用客户端自带的连接池
+            stream_usage: 流式调用时是否请求服务商在最后一个数据块中返回token用量
+            usage_ledger: 服务级用量台账，为None时不估算费用
         """
         self.api_base = api_base
         self.model_name = model_name
         self.api_key = api_key
         self.role_name = role_name
-        self.client = OpenAI(
+        self.limiter = limiter
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.response_cache = response_cache
+        self.hedge_policy = hedge_policy
+        self.hedge_model = hedge_model
+        self.stream_usage = stream_usage
+        self.usage_ledger = usage_ledger
+        # 使用异步客户端，多个专家的请求可以在同一事件循环中并发执行；
+        # 重试由retry_policy统一处理，关闭客户端自带的重试；
+        # 传入共享的http_client时，指向同一端点的角色复用同一连接池
+        self.client = AsyncOpenAI(
             base_url=api_base,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0,
+            **({"http_client": http_client, "timeout": http_client.timeout} if http_client is not None else {})
+        )
+    
+    @asynccontextmanager
+    async def _call_slot(self):
+        """占用一次API调用的并发槽位，未配置限制器时直接放行"""
+        if self.limiter is None:
+            yield
+        else:
+            async with self.limiter.slot(self.api_base, self.model_name):
+                yield
+    
+    async def _create_completion(self, messages: List[Dict[str, str]], timeout: Optional[float] = None,
+                                 hedge: bool = True, prefetch: bool = False,
+                                 source: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """限流、占用并发槽位后调用API，临时错误按重试策略重试
+        
+        配置了对冲策略时，对冲计时从获得并发槽位开始，排队和重试退避的时间不计入。
+        
+        Args:
+            messages: 消息列表
+            timeout: 每次请求的最长时间（秒），从获得并发槽位开始计算，超时不重试
+            hedge: 是否按对冲策略调用，对冲请求本身不再对冲
+            prefetch: 流式调用时是否读到首个数据块才返回
+            source: 传入时在返回前写入model，为实际给出响应的模型（对冲请求胜出时为备用模型）
+            **kwargs: 传给chat.completions.create的其他参数
+            
+        Returns:
+            API原始响应对象，对冲或预读的流式调用为PrefetchedStream
+        """
+        estimated_tokens = estimate_tokens(messages)
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                # 没有拿到响应（失败、超时或被取消）时实际用量记为0，退还预留的token；
+                # 拿到响应但用量未知（如流式调用）时保留预留值
+                actual_tokens: Optional[int] = 0
+                try:
+                    if self.rate_limiter:
+                        await self.rate_limiter.acquire(self.api_base, estimated_tokens)
+                    async with self._call_slot():
+                        # 排队等待限流和并发槽位的时间不计入超时和对冲计时
+                        if hedge and self.hedge_policy is not None:
+                            response, answered_by = await self._hedged_send(messages, timeout, **kwargs)
+                        else:
+                            response, answered_by = await self._send(messages, timeout, prefetch, **kwargs), self
+                    if answered_by is self:
+                        total_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+                        actual_tokens = total_tokens if isinstance(total_tokens, int) else None
+                    else:
+                        # 对冲请求胜出时原请求已发出后被取消，保留预留值
+                        actual_tokens = None
+                finally:
+                    if self.rate_limiter:
+                        self.rate_limiter.record_usage(self.api_base, estimated_tokens, actual_tokens)
+                if source is not None:
+                    source["model"] = answered_by
+                return response
+            except Exception as e:
+                delay = self.retry_policy.next_delay(e, attempt, started_at)
+                if delay is None:
+                    raise
+                if self.rate_limiter and getattr(e, "status_code", None) == 429:
+                    # 服务端限流时让同一服务商的其他请求一起退让
+                    self.rate_limiter.penalize(self.api_base, delay)
+                logging.warning(f"{self.role_name}({self.model_name})第{attempt}次调用失败，{delay:.1f}秒后重试: {str(e)}")
+                await asyncio.sleep(delay)
+    
+    async def _send(self, messages: List[Dict[str, str]], timeout: Optional[float] = None,
+                    prefetch: bool = False, **kwargs) -> Any:
+        """发出一次API请求，调用方已占用并发槽位
+        
+        Args:
+            messages: 消息列表
+            timeout: 请求的最长时间（秒），预读时同时限制等待首个数据块的时间
+            prefetch: 流式调用时是否读到首个数据块才返回，用于判断对冲的请求哪个先响应
+            **kwargs: 传给chat.completions.create的其他参数
+            
+        Returns:
+            API原始响应对象，预读的流式调用为PrefetchedStream
+        """
+        request = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            **kwargs
         )
+        response = await (asyncio.wait_for(request, timeout) if timeout else request)
+        if not (prefetch and kwargs.get("stream")):
+            return response
+        try:
+            first_chunk = await read_chunk(response, timeout)
+        except StopAsyncIteration:
+            first_chunk = None
+        except BaseException:
+            await close_stream(response)
+            raise
+        return PrefetchedStream(response, first_chunk)
+    
+    async def _hedged_send(self, messages: List[Dict[str, str]], timeout: Optional[float] = None,
+                           **kwargs) -> Tuple[Any, "AIModel"]:
+        """按对冲策略发出请求，调用方已占用并发槽位
+        
+        原请求超过历史耗时分位数仍未响应时，向备用模型（未配置时为本模型）再发一次
+        相同的请求，先成功响应的结果胜出，另一请求被取消。向本模型对冲时若已没有
+        空闲的并发槽位则不对冲。两个请求都失败时抛出原请求的异常。
+        
+        Args:
+            messages: 消息列表
+            timeout: 每个请求的最长时间（秒）
+            **kwargs: 传给chat.completions.create的其他参数
+            
+        Returns:
+            (胜出请求的响应对象, 响应的模型)，流式调用时响应为PrefetchedStream
+        """
+        policy = self.hedge_policy
+        delay = policy.hedge_delay()
+        started_at = time.monotonic()
+        primary = asyncio.create_task(self._send(messages, timeout, True, **kwargs))
+        hedge = None
+        target = self.hedge_model or self
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and target is self and self.limiter is not None \
+                        and not self.limiter.has_free_slot(self.api_base, self.model_name):
+                    logging.info(f"{self.role_name}({self.model_name})超过{delay:.1f}秒未响应，"
+                                 f"但没有空闲的并发槽位，不发出对冲请求")
+                elif not done:
+                    policy.hedged += 1
+                    logging.info(f"{self.role_name}({self.model_name})超过{delay:.1f}秒未响应，"
+                                 f"向{target.model_name}发出对冲请求")
+                    hedge = asyncio.create_task(
+                        target._create_completion(messages, timeout, hedge=False, prefetch=True, **kwargs)
+                    )
+            
+            pending = {task for task in (primary, hedge) if task is not None}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 同时完成时优先取原请求的结果
+                finished = [task for task in (primary, hedge) if task in done]
+                for task in finished:
+                    if task.exception() is not None:
+                        if task is primary or error is None:
+                            error = task.exception()
+                        continue
+                    if task is primary:
+                        policy.record(time.monotonic() - started_at)
+                    else:
+                        policy.hedge_wins += 1
+                    for other in finished:
+                        if other is not task and other.exception() is None:
+                            await close_stream(other.result())
+                    return task.result(), (self if task is primary else target)
+            raise error
+        finally:
+            losers = [task for task in (primary, hedge) if task is not None and not task.done()]
+            if primary in losers:
+                # 原请求被取消时，以已等待的时间作为其耗时的下限计入历史
+                policy.record(time.monotonic() - started_at)
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
     
-    def chat_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7, stream: bool = False) -> Optional[Dict[str, Any]]:
+    async def chat_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7, stream: bool = False,
+                              on_delta: Optional[Callable[[str], None]] = None,
+                              bypass_cache: bool = False,
+                              timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """调用聊天补全API
         
         Args:
             messages: 消息列表
             temperature: 温度参数
             stream: 是否使用流式响应
+            on_delta: 增量内容回调，传入时以流式方式调用，每收到一段内容调用一次；
+                未同时指定stream时读完整个流后返回完整结果；命中缓存时以完整内容调用一次
+            bypass_cache: 是否跳过响应缓存，跳过时既不读取也不写入缓存
+            timeout: 单次调用的期限（秒），从获得并发槽位开始计算；流式调用时同时限制
+                相邻两个数据块之间的等待时间。为None时不限制
             
         Returns:
-            API响应结果，失败时返回None
+            API响应结果，失败时返回None；流式模式下返回异步迭代器
+            
+        Raises:
+            TimeoutError: 调用超过期限，进行中的请求已被中止
         """
-        # 导入全局变量active_review
-        import sys
-        import inspect
-        current_frame = inspect.currentframe()
-        caller_frame = inspect.getouterframes(current_frame, 2)
-        caller_globals = caller_frame[1][0].f_globals
-        active_review = caller_globals.get('active_review')
+        # 调用记录由审查阶段通过bind_telemetry绑定，未绑定时不记录
+        telemetry = current_telemetry.get()
+        started_at = time.monotonic()
         
+        # 返回迭代器的流式调用由调用方读取内容，不经过缓存
+        cache_key = None
+        if self.response_cache is not None and not stream and not bypass_cache:
+            cache_key = self.response_cache.make_key(self.api_base, self.model_name, messages, temperature)
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                if on_delta is not None:
+                    on_delta(cached)
+                self._record_call(telemetry, started_at, cached, cached=True)
+                return {"choices": [{"message": {"content": cached}}]}
+        
+        # 对冲请求胜出时响应来自备用模型，不能按本模型的缓存键保存
+        source: Dict[str, Any] = {}
         try:
-            if stream:
+            if stream or on_delta is not None:
                 # 流式响应模式
-                response_stream = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
+                response_stream = await self._create_completion(
+                    messages,
                     temperature=temperature,
-                    stream=True
+                    stream=True,
+                    timeout=timeout,
+                    source=source,
+                    **self._stream_options()
                 )
                 
-                # 存储API响应到active_review
-                if active_review is not None:
-                    # 初始化api_responses列表
-                    if 'api_responses' not in active_review:
-                        active_review['api_responses'] = []
-                    
-                    # 收集流式响应内容
-                    collected_chunks = []
-                    collected_content = []
-                    
-                    # 创建一个新的流对象，同时收集响应内容
-                    class ResponseCollector:
-                        def __init__(self, stream, role_name):
-                            self.stream = stream
-                            self.role_name = role_name
-                        
-                        def __iter__(self):
-                            return self
-                        
-                        def __next__(self):
-                            chunk = next(self.stream)
-                            # 存储chunk到active_review
-                            content = chunk.choices[0].delta.content if chunk.choices[0].delta.content else ''
-                            chunk_dict = {
-                                'chunk': {
-                                    'choices': [{
-                                        'delta': {
-                                            'content': content
-                                        }
-                                    }]
-                                },
-                                'model': self.stream.model,
-                                'role': self.role_name
-                            }
-                            # 只有当内容不为空时才添加到响应列表中
-                            if content:
-                                active_review['api_responses'].append(chunk_dict)
-                                # 限制存储的响应数量，避免内存溢出
-                                if len(active_review['api_responses']) > 100:
-                                    active_review['api_responses'] = active_review['api_responses'][-100:]
-                            return chunk
-                    
-                    # 返回包装后的流对象
-                    return ResponseCollector(response_stream, self.role_name)
+                if telemetry is None and on_delta is None:
+                    # 返回原始流对象
+                    return response_stream
+                
+                # 返回包装后的流对象，迭代时收集响应内容并推送增量，读完后记录本次调用
+                on_complete = lambda content: self._record_call(telemetry, started_at, content, stream=True,
+                                                                usage=collector.usage,
+                                                                answered_by=source.get("model"))
+                collector = ResponseCollector(response_stream, self.role_name, self.model_name, on_delta, on_complete)
+                if stream:
+                    return collector
                 
-                # 返回原始流对象
-                return response_stream
+                # 调用方只需要增量回调时，在此读完整个流，返回与普通模式相同的结果
+                try:
+                    while True:
+                        await read_chunk(collector, timeout)
+                except StopAsyncIteration:
+                    pass
+                except BaseException:
+                    # 超时、失败或被取消时关闭连接，不再占用服务商的并发额度
+                    await close_stream(response_stream)
+                    raise
+                content = collector.get_content()
             else:
                 # 普通响应模式
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    temperature=temperature
+                response = await self._create_completion(
+                    messages,
+                    temperature=temperature,
+                    timeout=timeout,
+                    source=source
                 )
-                
-                # 存储API响应到active_review
-                if active_review is not None:
-                    # 初始化api_responses列表
-                    if 'api_responses' not in active_review:
-                        active_review['api_responses'] = []
-                    
-                    # 存储响应内容
-                    response_dict = {
-                        'chunk': {
-                            'choices': [{
-                                'delta': {
-                                    'content': response.choices[0].message.content
-                                }
-                            }]
-                        },
-                        'model': self.model_name,
-                        'role': self.role_name
-                    }
-                    active_review['api_responses'].append(response_dict)
-                    # 限制存储的响应数量，避免内存溢出
-                    if len(active_review['api_responses']) > 100:
-                        active_review['api_responses'] = active_review['api_responses'][-100:]
-                
-                # 将响应对象转换为字典格式，保持与原代码兼容
-                return {
-                    "choices": [
-                        {
-                            "message": {
-                                "content": response.choices[0].message.content
-                            }
-                        }
-                    ]
-                }
+                content = response.choices[0].message.content
+                self._record_call(telemetry, started_at, content, usage=extract_usage(getattr(response, "usage", None)),
+                                  answered_by=source.get("model"))
+        except asyncio.TimeoutError as e:
+            message = f"{self.role_name}({self.model_name})调用超过{timeout}秒未完成"
+            logging.warning(message)
+            metrics.MODEL_API_ERRORS.inc(model=self.model_name, role=self.role_name, status=error_status(e))
+            self._record_call(telemetry, started_at, None, stream=stream or on_delta is not None, error=message)
+            raise TimeoutError(message)
         except Exception as e:
             logging.error(f"API调用失败: {str(e)}")
+            metrics.MODEL_API_ERRORS.inc(model=self.model_name, role=self.role_name, status=error_status(e))
+            self._record_call(telemetry, started_at, None, stream=stream or on_delta is not None, error=str(e))
             return None
+        
+        if cache_key is not None and content and source.get("model", self) is self:
+            await self._cache_set(cache_key, content)
+        
+        # 将响应对象转换为字典格式，保持与原代码兼容
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "content": content
+                    }
+                }
+            ]
+        }
+    
+    def _stream_options(self) -> Dict[str, Any]:
+        """流式调用的附加参数，开启stream_usage时请求返回token用量"""
+        if not self.stream_usage:
+            return {}
+        return {"extra_body": {"stream_options": {"include_usage": True}}}
+    
+    async def _cache_get(self, key: str) -> Optional[str]:
+        """在线程池中读取响应缓存，缓存故障时按未命中处理"""
+        try:
+            return await to_thread(self.response_cache.get, key)
+        except sqlite3.Error as e:
+            logging.warning(f"读取响应缓存失败: {str(e)}")
+            return None
+    
+    async def _cache_set(self, key: str, content: str) -> None:
+        """在线程池中写入响应缓存，缓存故障不影响调用结果"""
+        try:
+            await to_thread(self.response_cache.set, key, content)
+        except sqlite3.Error as e:
+            logging.warning(f"写入响应缓存失败: {str(e)}")
+    
+    def _record_call(self, telemetry: Optional[ResponseTelemetry], started_at: float, content: Optional[str],
+                     stream: bool = False, error: Optional[str] = None, cached: bool = False,
+                     usage: Optional[Dict[str, int]] = None, answered_by: Optional["AIModel"] = None) -> None:
+        """向监控指标、用量台账和调用记录追加本次调用的模型、角色、耗时、用量和输出内容
+        
+        Args:
+            telemetry: 调用记录，为None时只记入监控指标和用量台账
+            started_at: 调用开始时间（time.monotonic）
+            content: 模型输出内容
+            stream: 是否为流式调用
+            error: 调用失败时的错误信息
+            cached: 是否命中响应缓存
+            usage: 服务商返回的token用量，包含命中前缀缓存的输入token数
+            answered_by: 实际给出响应的模型，对冲请求胜出时为备用模型，为None时为本模型；
+                调用按该模型计价并归入该模型名下
+        """
+        model_name = (answered_by or self).model_name
+        latency = time.monotonic() - started_at
+        outcome = "error" if error is not None else "cached" if cached else "completed"
+        metrics.MODEL_CALL_DURATION.observe(latency, model=model_name, role=self.role_name, outcome=outcome)
+        cost = None
+        if self.usage_ledger is not None:
+            stage = telemetry.stage if telemetry is not None else None
+            cost = self.usage_ledger.record(model_name, self.role_name, latency, usage, stage, cached)
+        if telemetry is None:
+            return
+        telemetry.record_call(model_name, self.role_name, latency,
+                              content, stream=stream, error=error, cached=cached, usage=usage, cost=cost)
 
 
 class OrganizerModel(AIModel):
     """组织者模型，负责协调专家模型"""
     
-    def __init__(self, api_base: str, model_name: str, api_key: str):
+    def __init__(self, api_base: str, model_name: str, api_key: str, **options):
         """初始化组织者模型
         
         Args:
             api_base: API基础URL
             model_name: 模型名称
             api_key: API密钥
+            **options: 传给AIModel的调用控制参数（并发限制器、限流器、重试策略等）
         """
-        super().__init__(api_base, model_name, api_key, "organizer")
+        super().__init__(api_base, model_name, api_key, "organizer", **options)
     
-    def generate_analysis_prompt(self, file_content: str) -> str:
-        """生成分析阶段的提示词
+    def document_messages(self, file_content: str, section_title: str = "") -> List[Dict[str, str]]:
+        """生成材料消息，作为同一片段在所有专家和各阶段请求中相同的前缀
         
         Args:
-            file_content: 文件内容
+            file_content: 文件内容，长文档传入切分后的单个片段
+            section_title: 片段所属章节，用于提示专家标注位置
             
         Returns:
-            分析阶段提示词
+            系统提示词和材料内容两条消息
         """
-        # 截取文件内容摘要，避免超出token限制
-        content_summary = file_content[:3000] + "..." if len(file_content) > 3000 else file_content
+        section = f"（{section_title}）" if section_title else ""
+        return [
+            {"role": "system", "content": REVIEW_SYSTEM_PROMPT},
+            {"role": "user", "content": f"待审查材料{section}：\n\n{file_content}"}
+        ]
+    
+    def generate_analysis_prompt(self, file_content: str, section_title: str = "") -> List[Dict[str, str]]:
+        """生成分析阶段的提示词
         
-        prompt = f"你是一名专业审查专家，请从专业角度分析以下材料，列出需审查的关键要点：\n\n{content_summary}"
-        return prompt
+        Args:
+            file_content: 文件内容，长文档传入切分后的单个片段
+            section_title: 片段所属章节，用于提示专家标注位置
+            
+        Returns:
+            分析阶段的消息列表：材料在前，阶段指令在后，专家指令由专家追加在最后
+        """
+        section = f"（{section_title}）" if section_title else ""
+        return self.document_messages(file_content, section_title) + [
+            {"role": "user", "content": f"请从专业角度分析以上材料{section}，列出需审查的关键要点。"}
+        ]
     
-    def generate_discussion_prompt(self, file_content: str, review_points: str) -> str:
+    def generate_discussion_prompt(self, file_content: str, review_points: str,
+                                   section_title: str = "") -> List[Dict[str, str]]:
         """生成讨论阶段的提示词
         
         Args:
-            file_content: 文件内容
+            file_content: 文件内容，长文档传入切分后的单个片段
             review_points: 审查要点清单
+            section_title: 片段所属章节，用于提示专家标注位置
             
         Returns:
-            讨论阶段提示词
+            讨论阶段的消息列表：材料在前，审查要点和阶段指令在后，专家指令由专家追加在最后
         """
-        prompt = f"请基于以下审查要点，检查材料的错别字、语句逻辑问题，并给出修改建议。\n\n审查要点清单：\n{review_points}\n\n材料内容：\n{file_content}"
-        return prompt
+        section = f"（{section_title}）" if section_title else ""
+        instruction = f"""审查要点清单：
+{review_points}
+
+请基于以上审查要点，检查材料{section}的错别字、语句逻辑问题，并给出修改建议。
+请按以下格式输出：
+1. 问题类型：[语法/逻辑/事实性错误/其他]
+2. 问题位置：[章节或段落标识]
+3. 问题描述：[具体描述问题]
+4. 修改建议：[具体修改建议]"""
+        return self.document_messages(file_content, section_title) + [
+            {"role": "user", "content": instruction}
+        ]
     
-    def summarize_review_points(self, expert_outputs: List[Dict[str, Any]]) -> str:
+    async def summarize_review_points(self, expert_outputs: List[Dict[str, Any]],
+                                      on_delta: Optional[Callable[[str], None]] = None,
+                                      timeout: Optional[float] = None) -> str:
         """汇总专家提出的审查要点
         
         Args:
             expert_outputs: 专家输出列表
+            on_delta: 增量内容回调，传入时以流式方式调用API
+            timeout: 调用期限（秒），为None时不限制
             
         Returns:
             汇总后的审查要点清单
@@ -213,17 +654,21 @@ class OrganizerModel(AIModel):
         messages.append({"role": "user", "content": "请汇总以上专家提出的审查要点，去除重复项，并按重要性排序，生成《审查要点清单》。"})
         
         # 调用API
-        response = self.chat_completion(messages)
+        response = await self.chat_completion(messages, on_delta=on_delta, timeout=timeout)
         if response and "choices" in response:
             return response["choices"][0]["message"]["content"]
         return "无法汇总审查要点，请检查API连接。"
     
-    def generate_final_report(self, discussion_results: List[Dict[str, Any]], file_content: str) -> Dict[str, Any]:
+    async def generate_final_report(self, discussion_results: List[Dict[str, Any]], file_content: str,
+                                    on_delta: Optional[Callable[[str], None]] = None,
+                                    timeout: Optional[float] = None) -> Dict[str, Any]:
         """生成最终审查报告
         
         Args:
             discussion_results: 讨论阶段结果
             file_content: 文件内容
+            on_delta: 增量内容回调，传入时以流式方式调用API
+            timeout: 调用期限（秒），为None时不限制
             
         Returns:
             最终报告字典
@@ -254,7 +699,7 @@ class OrganizerModel(AIModel):
         messages.append({"role": "user", "content": report_instruction})
         
         # 调用API
-        response = self.chat_completion(messages)
+        response = await self.chat_completion(messages, on_delta=on_delta, timeout=timeout)
         if response and "choices" in response:
             report_text = response["choices"][0]["message"]["content"]
             try:
@@ -272,7 +717,7 @@ class OrganizerModel(AIModel):
 class ExpertModel(AIModel):
     """专家模型，负责特定领域的审查"""
     
-    def __init__(self, api_base: str, model_name: str, api_key: str, expertise: str):
+    def __init__(self, api_base: str, model_name: str, api_key: str, expertise: str, **options):
         """初始化专家模型
         
         Args:
@@ -280,82 +725,88 @@ class ExpertModel(AIModel):
             model_name: 模型名称
             api_key: API密钥
             expertise: 专业领域
+            **options: 传给AIModel的调用控制参数（并发限制器、限流器、重试策略等）
         """
-        super().__init__(api_base, model_name, api_key, "expert")
+        super().__init__(api_base, model_name, api_key, "expert", **options)
         self.expertise = expertise
     
-    def analyze_document(self, prompt: str) -> Dict[str, Any]:
+    def expert_messages(self, prompt: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """在阶段提示词之后追加专家指令，专家之间的差异只出现在请求末尾
+        
+        Args:
+            prompt: 组织者生成的阶段消息列表
+            
+        Returns:
+            完整的消息列表
+        """
+        return list(prompt) + [
+            {"role": "user", "content": f"你是一名{self.expertise}专家，请从{self.expertise}的角度完成以上任务。"}
+        ]
+    
+    async def analyze_document(self, prompt: List[Dict[str, str]], on_delta: Optional[Callable[[str], None]] = None,
+                               timeout: Optional[float] = None) -> Dict[str, Any]:
         """分析文档内容
         
         Args:
-            prompt: 分析提示词
+            prompt: 组织者生成的分析阶段消息列表
+            on_delta: 增量内容回调，传入时以流式方式调用API
+            timeout: 调用期限（秒），为None时不限制
             
         Returns:
             分析结果字典
         """
-        # 根据专业领域调整系统提示词
-        system_prompt = f"你是一名{self.expertise}专家，请从专业角度分析以下材料，列出需审查的关键要点。"
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
+        messages = self.expert_messages(prompt)
         
         # 调用API
-        response = self.chat_completion(messages)
+        started_at = time.monotonic()
+        response = await self.chat_completion(messages, on_delta=on_delta, timeout=timeout)
+        response_time = round(time.monotonic() - started_at, 3)
         if response and "choices" in response:
             return {
                 "model_name": self.model_name,
                 "expertise": self.expertise,
                 "content": response["choices"][0]["message"]["content"],
-                "response_time": 0
+                "response_time": response_time
             }
         
         return {
             "model_name": self.model_name,
             "expertise": self.expertise,
             "content": "API调用失败，无法获取分析结果。",
-            "response_time": 0
+            "response_time": response_time
         }
     
-    def discuss_document(self, prompt: str) -> Dict[str, Any]:
+    async def discuss_document(self, prompt: List[Dict[str, str]], on_delta: Optional[Callable[[str], None]] = None,
+                               timeout: Optional[float] = None) -> Dict[str, Any]:
         """讨论文档问题
         
         Args:
-            prompt: 讨论提示词
+            prompt: 组织者生成的讨论阶段消息列表
+            on_delta: 增量内容回调，传入时以流式方式调用API
+            timeout: 调用期限（秒），为None时不限制
             
         Returns:
             讨论结果字典
         """
-        # 根据专业领域调整系统提示词
-        system_prompt = f"""你是一名{self.expertise}专家，请基于审查要点，检查材料的问题，并给出修改建议。
-        请按以下格式输出：
-        1. 问题类型：[语法/逻辑/事实性错误/其他]
-        2. 问题位置：[章节或段落标识]
-        3. 问题描述：[具体描述问题]
-        4. 修改建议：[具体修改建议]
-        """
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
+        messages = self.expert_messages(prompt)
         
         # 调用API
-        response = self.chat_completion(messages)
+        started_at = time.monotonic()
+        response = await self.chat_completion(messages, on_delta=on_delta, timeout=timeout)
+        response_time = round(time.monotonic() - started_at, 3)
         if response and "choices" in response:
             return {
                 "model_name": self.model_name,
                 "expertise": self.expertise,
                 "content": response["choices"][0]["message"]["content"],
-                "response_time": 0
+                "response_time": response_time
             }
         
         return {
             "model_name": self.model_name,
             "expertise": self.expertise,
             "content": "API调用失败，无法获取讨论结果。",
-            "response_time": 0
+            "response_time": response_time
         }
 
 
@@ -371,17 +822,80 @@ class RoleManager:
         self.config_manager = config_manager
         self.organizer = None
         self.experts = []
+        # 所有角色共享同一个并发限制器和限流器，指向同一端点的角色共用端点额度
+        self.limiter = ProviderLimiter.from_config(config_manager.get_scheduler_config())
+        self.rate_limiter = ProviderRateLimiter.from_config(config_manager.get_rate_limit_config())
+        self.retry_policy = RetryPolicy.from_config(config_manager.get_retry_config())
+        self.response_cache = ResponseCache.from_config(config_manager.get_cache_config())
+        self.transports = TransportRegistry.from_config(config_manager.get_http_config())
+        self.usage_config = config_manager.get_usage_config()
+        self.usage_ledger = UsageLedger(PriceTable.from_config(self.usage_config))
         self._initialize_roles()
     
+    def _model_options(self, role_config: Dict[str, Any]) -> Dict[str, Any]:
+        """所有角色共享的调用控制参数
+        
+        Args:
+            role_config: 组织者、专家或备用端点的配置，同一api_base的角色共享HTTP连接池；
+                其中的stream_usage覆盖usage配置中的同名项
+            
+        Returns:
+            传给AIModel的参数字典
+        """
+        api_base = role_config["api_base"]
+        return {
+            "limiter": self.limiter,
+            "rate_limiter": self.rate_limiter,
+            "retry_policy": self.retry_policy,
+            "response_cache": self.response_cache,
+            "http_client": self.transports.client_for(api_base, role_config.get("api_key")),
+            "stream_usage": role_config.get("stream_usage", self.usage_config["stream_usage"]),
+            "usage_ledger": self.usage_ledger
+        }
+    
+    def _hedge_options(self, role_config: Dict[str, Any]) -> Dict[str, Any]:
+        """根据角色的对冲配置创建对冲策略和备用模型
+        
+        Args:
+            role_config: 组织者或专家配置
+            
+        Returns:
+            传给AIModel的对冲参数字典，未启用对冲时为空
+        """
+        hedge_config = self.config_manager.get_hedge_config(role_config)
+        policy = HedgePolicy.from_config(hedge_config)
+        if policy is None:
+            return {}
+        backup_model = None
+        backup = hedge_config.get("backup")
+        if backup:
+            # 备用端点未指定的项沿用角色自身的配置
+            backup = {**role_config, **backup}
+            self.limiter.register_model(backup["api_base"], backup["model_name"], backup.get("max_concurrency"))
+            backup_model = AIModel(
+                api_base=backup["api_base"],
+                model_name=backup["model_name"],
+                api_key=backup["api_key"],
+                role_name=role_config["role_name"],
+                **self._model_options(backup)
+            )
+        return {"hedge_policy": policy, "hedge_model": backup_model}
+    
     def _initialize_roles(self) -> None:
         """初始化组织者和专家角色"""
         # 初始化组织者
         organizer_config = self.config_manager.get_organizer_config()
         try:
+            self.limiter.register_model(
+                organizer_config["api_base"],
+                organizer_config["model_name"],
+                organizer_config.get("max_concurrency")
+            )
             self.organizer = OrganizerModel(
                 api_base=organizer_config["api_base"],
                 model_name=organizer_config["model_name"],
-                api_key=organizer_config["api_key"]
+                api_key=organizer_config["api_key"],
+                **self._model_options(organizer_config)
             )
             logging.info(f"组织者初始化成功: {organizer_config['model_name']}")
         except Exception as e:
@@ -392,11 +906,18 @@ class RoleManager:
         experts_config = self.config_manager.get_experts_config()
         for expert_config in experts_config:
             try:
+                self.limiter.register_model(
+                    expert_config["api_base"],
+                    expert_config["model_name"],
+                    expert_config.get("max_concurrency")
+                )
                 expert = ExpertModel(
                     api_base=expert_config["api_base"],
                     model_name=expert_config["model_name"],
                     api_key=expert_config["api_key"],
-                    expertise=expert_config["expertise"]
+                    expertise=expert_config["expertise"],
+                    **self._model_options(expert_config),
+                    **self._hedge_options(expert_config)
                 )
                 self.experts.append(expert)
                 logging.info(f"专家初始化成功: {expert_config['model_name']} ({expert_config['expertise']})")
@@ -420,6 +941,23 @@ class RoleManager:
         """
         return self.experts
     
+    def get_hedge_stats(self) -> List[Dict[str, Any]]:
+        """获取启用了对冲请求的专家的对冲统计
+        
+        Returns:
+            统计列表，每项包含模型名称、专业领域、备用模型和对冲统计
+        """
+        return [
+            {
+                "model_name": expert.model_name,
+                "expertise": expert.expertise,
+                "hedge_model": (expert.hedge_model or expert).model_name,
+                **expert.hedge_policy.get_stats()
+            }
+            for expert in self.experts
+            if expert.hedge_policy is not None
+        ]
+    
     def get_expert_by_name(self, model_name: str) -> Optional[ExpertModel]:
         """根据模型名称获取专家实例
         
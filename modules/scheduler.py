@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Deque, Tuple
+
+class SchedulerFullError(Exception):
+    """调度队列已满时抛出的异常"""
+
+
+class ProviderLimiter:
+    """按API端点和模型限制并发调用数
+
+    每个api_base共享一个端点信号量，每个(api_base, model_name)组合另有一个
+    模型信号量。一次调用需要同时占用两者，先占模型槽位再占端点槽位，
+    避免排队等待模型时白占端点的并发额度。
+    """
+
+    def __init__(self, endpoint_limits: Optional[Dict[str, int]] = None,
+                 default_endpoint_limit: int = 8, default_model_limit: int = 4):
+        """初始化并发限制器
+
+        Args:
+            endpoint_limits: 各api_base的最大并发数
+            default_endpoint_limit: 未单独配置的端点的最大并发数
+            default_model_limit: 未单独配置的模型的最大并发数
+        """
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.default_endpoint_limit = default_endpoint_limit
+        self.default_model_limit = default_model_limit
+        self.model_limits: Dict[Tuple[str, str], int] = {}
+        self._endpoint_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._model_semaphores: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+
+    def register_model(self, api_base: str, model_name: str, limit: Optional[int] = None) -> None:
+        """登记模型的并发上限，同一模型多次登记时取较小值
+
+        Args:
+            api_base: API基础URL
+            model_name: 模型名称
+            limit: 最大并发数，为None时使用默认值
+        """
+        key = (api_base, model_name)
+        limit = limit or self.default_model_limit
+        self.model_limits[key] = min(limit, self.model_limits.get(key, limit))
+
+    def _endpoint_semaphore(self, api_base: str) -> asyncio.Semaphore:
+        if api_base not in self._endpoint_semaphores:
+            limit = self.endpoint_limits.get(api_base, self.default_endpoint_limit)
+            self._endpoint_semaphores[api_base] = asyncio.Semaphore(limit)
+        return self._endpoint_semaphores[api_base]
+
+    def _model_semaphore(self, api_base: str, model_name: str) -> asyncio.Semaphore:
+        key = (api_base, model_name)
+        if key not in self._model_semaphores:
+            limit = self.model_limits.get(key, self.default_model_limit)
+            self._model_semaphores[key] = asyncio.Semaphore(limit)
+        return self._model_semaphores[key]
+
+    @asynccontextmanager
+    async def slot(self, api_base: str, model_name: str):
+        """占用一个模型调用槽位
+
+        Args:
+            api_base: API基础URL
+            model_name: 模型名称
+        """
+        async with self._model_semaphore(api_base, model_name):
+            async with self._endpoint_semaphore(api_base):
+                yield
+
+    def has_free_slot(self, api_base: str, model_name: str) -> bool:
+        """判断当前能否不排队地占用一个模型调用槽位
+
+        Args:
+            api_base: API基础URL
+            model_name: 模型名称
+
+        Returns:
+            模型和端点都还有空闲槽位时返回True
+        """
+        return not (self._model_semaphore(api_base, model_name).locked()
+                    or self._endpoint_semaphore(api_base).locked())
+
+    @classmethod
+    def from_config(cls, scheduler_config: Dict[str, Any]) -> "ProviderLimiter":
+        """根据调度配置创建并发限制器
+
+        Args:
+            scheduler_config: 调度配置字典
+
+        Returns:
+            并发限制器实例
+        """
+        return cls(
+            endpoint_limits=scheduler_config.get("endpoint_concurrency"),
+            default_endpoint_limit=scheduler_config["default_endpoint_concurrency"],
+            default_model_limit=scheduler_config["default_model_concurrency"]
+        )
+
+
+class ReviewJob:
+    """调度队列中的一个审查阶段任务"""
+
+    def __init__(self, review_id: str, stage: str, func: Callable[..., Awaitable[Any]], args: tuple):
+        """初始化审查任务
+
+        Args:
+            review_id: 审查ID
+            stage: 阶段名称
+            func: 执行阶段的协程函数
+            args: 协程函数参数
+        """
+        self.review_id = review_id
+        self.stage = stage
+        self.func = func
+        self.args = args
+        self.enqueued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+
+
+class ReviewScheduler:
+    """审查任务调度器，使用固定数量的工作协程按先进先出顺序执行审查阶段"""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 100, default_job_seconds: float = 60.0):
+        """初始化调度器
+
+        Args:
+            max_workers: 同时执行的审查阶段数
+            max_queue: 等待队列的最大长度，为0时不限制
+            default_job_seconds: 没有历史数据时估算的单个任务耗时（秒）
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_job_seconds = default_job_seconds
+        self._queue: Deque[ReviewJob] = deque()
+        self._running: Dict[str, ReviewJob] = {}
+        self._durations: Deque[float] = deque(maxlen=50)
+        self._available: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """启动工作协程"""
+        self._available = asyncio.Semaphore(0)
+        for _ in self._queue:
+            self._available.release()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_workers)]
+        logging.info(f"审查调度器已启动，工作协程数: {self.max_workers}")
+
+    async def shutdown(self) -> None:
+        """停止所有工作协程"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logging.info("审查调度器已停止")
+
+    def submit(self, review_id: str, stage: str, func: Callable[..., Awaitable[Any]], *args) -> ReviewJob:
+        """提交审查阶段任务
+
+        Args:
+            review_id: 审查ID
+            stage: 阶段名称
+            func: 执行阶段的协程函数
+            *args: 协程函数参数
+
+        Returns:
+            审查任务
+
+        Raises:
+            SchedulerFullError: 等待队列已满
+        """
+        if self.max_queue and len(self._queue) >= self.max_queue:
+            raise SchedulerFullError(f"审查队列已满（{self.max_queue}）")
+        job = ReviewJob(review_id, stage, func, args)
+        self._queue.append(job)
+        if self._available is not None:
+            self._available.release()
+        logging.info(f"审查任务已排队: {review_id} {stage}，队列位置 {len(self._queue)}")
+        return job
+
+    async def _worker(self, index: int) -> None:
+        """工作协程，循环从队列头部取出任务执行"""
+        while True:
+            await self._available.acquire()
+            if not self._queue:
+                # 排队任务已被取消
+                continue
+            job = self._queue.popleft()
+            job.started_at = time.time()
+            self._running[job.review_id] = job
+            # 阶段在独立的任务中执行，取消阶段不会影响工作协程本身
+            job.task = asyncio.create_task(job.func(*job.args))
+            try:
+                await asyncio.shield(job.task)
+            except asyncio.CancelledError:
+                if not job.task.cancelled():
+                    # 工作协程自身被取消（调度器停止），一并取消正在执行的阶段
+                    job.task.cancel()
+                    raise
+                logging.info(f"审查任务已取消: {job.review_id} {job.stage}")
+            except Exception as e:
+                logging.error(f"审查任务执行失败: {job.review_id} {job.stage}: {str(e)}")
+            finally:
+                job.finished_at = time.time()
+                if not job.cancelled:
+                    self._durations.append(job.finished_at - job.started_at)
+                self._running.pop(job.review_id, None)
+
+    def cancel(self, review_id: str) -> Optional[str]:
+        """取消审查任务，排队中的任务直接移出队列，执行中的任务被中断
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            被取消任务原来的状态（queued/running），没有可取消的任务时返回None
+        """
+        for job in list(self._queue):
+            if job.review_id == review_id:
+                job.cancelled = True
+                self._queue.remove(job)
+                logging.info(f"已移出排队中的审查任务: {review_id} {job.stage}")
+                return "queued"
+
+        job = self._running.get(review_id)
+        if job is not None and job.task is not None and not job.task.done():
+            job.cancelled = True
+            job.task.cancel()
+            return "running"
+        return None
+
+    def average_job_seconds(self) -> float:
+        """最近完成任务的平均耗时
+
+        Returns:
+            平均耗时（秒），没有历史数据时返回默认值
+        """
+        if not self._durations:
+            return self.default_job_seconds
+        return sum(self._durations) / len(self._durations)
+
+    def get_queue_info(self, review_id: str) -> Dict[str, Any]:
+        """获取审查任务的排队信息
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            排队信息字典，state为queued/running/idle
+        """
+        if review_id in self._running:
+            job = self._running[review_id]
+            return {"state": "running", "stage": job.stage, "started_at": job.started_at}
+
+        for position, job in enumerate(self._queue, start=1):
+            if job.review_id == review_id:
+                # 所有工作协程都忙时，前面每满一轮max_workers个任务就要多等一个平均任务耗时
+                free_workers = self.max_workers - len(self._running)
+                if position <= free_workers:
+                    estimated_wait = 0.0
+                else:
+                    rounds = (position - free_workers - 1) // self.max_workers + 1
+                    estimated_wait = rounds * self.average_job_seconds()
+                return {
+                    "state": "queued",
+                    "stage": job.stage,
+                    "position": position,
+                    "queue_length": len(self._queue),
+                    "estimated_start_seconds": round(estimated_wait, 1)
+                }
+
+        return {"state": "idle"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度器统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "max_workers": self.max_workers,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "average_job_seconds": round(self.average_job_seconds(), 1)
+        }
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from .review_process import ReviewProcess
+from .event_stream import ReviewEventStream
+
+class ReviewSession:
+    """单个审查会话，保存审查流程实例及其状态"""
+
+    def __init__(self, review_id: str, file_name: str, file_path: str, process: ReviewProcess,
+                 log_capacity: int = 500, file_hash: Optional[str] = None):
+        """初始化审查会话
+
+        Args:
+            review_id: 审查ID
+            file_name: 原始文件名
+            file_path: 上传文件的存储路径
+            process: 审查流程实例
+            log_capacity: 日志环形缓冲区容量
+            file_hash: 上传文件内容的SHA-256摘要
+        """
+        self.review_id = review_id
+        self.file_name = file_name
+        self.file_path = file_path
+        self.file_hash = file_hash
+        self.process = process
+        self.status = "已上传"
+        # 各阶段产出：analysis_results、discussion_results、final_report、report_path等
+        self.results: Dict[str, Any] = {}
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        # 是否有阶段任务正在执行，执行中的会话不会被淘汰
+        self.busy = False
+        # 一键审查是否在阶段之间暂停等待确认，以及暂停后等待确认的下一阶段
+        self.pause_between_stages = False
+        self.awaiting_stage: Optional[str] = None
+        # 审查日志，容量固定，按序号增量读取
+        self.logs = ReviewEventStream(capacity=log_capacity)
+
+    def set_status(self, status: str) -> None:
+        """更新会话状态并推送到审查事件流
+
+        Args:
+            status: 会话状态
+        """
+        self.status = status
+        self.process.events.publish("status", {"status": status})
+
+    def touch(self) -> None:
+        """刷新最近访问时间"""
+        self.last_access = time.time()
+
+    def close(self) -> None:
+        """关闭会话的事件流、调用记录和日志流，订阅者随之退出"""
+        self.process.events.close()
+        self.process.telemetry.close()
+        self.logs.close()
+
+    def is_evictable(self) -> bool:
+        """判断会话是否可以被淘汰
+
+        Returns:
+            没有正在执行的阶段任务时返回True
+        """
+        return not self.busy
+
+
+class ReviewSessionStore:
+    """审查会话仓库，按review_id保存多个并行的审查会话
+
+    空闲会话超过ttl_seconds未被访问即过期；会话数超过max_sessions时
+    按最近最少使用顺序淘汰空闲会话。正在执行阶段任务的会话不会被淘汰。
+    """
+
+    def __init__(self, max_sessions: int = 100, ttl_seconds: float = 3600):
+        """初始化会话仓库
+
+        Args:
+            max_sessions: 最多保留的会话数
+            ttl_seconds: 空闲会话的存活时间（秒）
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, ReviewSession]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def add(self, session: ReviewSession) -> ReviewSession:
+        """添加会话，同一review_id的旧会话会被替换
+
+        Args:
+            session: 审查会话
+
+        Returns:
+            添加的会话
+        """
+        with self._lock:
+            self._sessions[session.review_id] = session
+            self._sessions.move_to_end(session.review_id)
+            # 刚添加的会话即将返回给调用方，不参与本次淘汰
+            self._evict(keep=session.review_id)
+        return session
+
+    def get(self, review_id: str) -> Optional[ReviewSession]:
+        """获取会话并刷新其最近访问时间
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            审查会话，不存在或已过期时返回None
+        """
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(review_id)
+            if session is None:
+                return None
+            session.touch()
+            self._sessions.move_to_end(review_id)
+            return session
+
+    def remove(self, review_id: str) -> Optional[ReviewSession]:
+        """移除会话
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            被移除的会话，不存在时返回None
+        """
+        with self._lock:
+            session = self._sessions.pop(review_id, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def list_sessions(self) -> List[ReviewSession]:
+        """获取当前所有会话
+
+        Returns:
+            会话列表，按最近访问时间从旧到新排列
+        """
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, review_id: str) -> bool:
+        with self._lock:
+            return review_id in self._sessions
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """淘汰过期会话，并在超出容量时按LRU顺序淘汰空闲会话
+
+        Args:
+            keep: 不参与淘汰的会话ID
+        """
+        now = time.time()
+        expired = [
+            review_id for review_id, session in self._sessions.items()
+            if review_id != keep and session.is_evictable() and now - session.last_access > self.ttl_seconds
+        ]
+        for review_id in expired:
+            self._sessions.pop(review_id).close()
+            logging.info(f"审查会话已过期: {review_id}")
+
+        overflow = len(self._sessions) - self.max_sessions
+        if overflow <= 0:
+            return
+        for review_id in [rid for rid, s in self._sessions.items() if rid != keep and s.is_evictable()][:overflow]:
+            self._sessions.pop(review_id).close()
+            logging.info(f"审查会话已淘汰: {review_id}")
+        if len(self._sessions) > self.max_sessions:
+            logging.warning(f"进行中的审查会话数({len(self._sessions)})超过上限{self.max_sessions}")
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+from .event_stream import ReviewEventStream
+from .usage import UsageAggregator
+
+class ResponseTelemetry(ReviewEventStream):
+    """模型调用记录，每次chat_completion完成后追加一条call事件
+
+    记录保存在固定容量的环形缓冲区中，超出容量的旧记录自动丢弃；
+    订阅者通过subscribe按序号读取新记录。token用量和费用另行累计，
+    按模型、角色和stage标记的审查阶段分组。
+    """
+
+    def __init__(self, capacity: int = 100, currency: str = "USD"):
+        """初始化调用记录
+
+        Args:
+            capacity: 保留的调用记录数
+            currency: 费用的货币单位
+        """
+        super().__init__(capacity=capacity)
+        # 当前审查阶段，由审查流程在每个阶段开始时设置
+        self.stage: Optional[str] = None
+        # token用量和费用的累计值，不受环形缓冲区容量影响
+        self.usage = UsageAggregator(currency=currency)
+
+    def record_call(self, model_name: str, role_name: str, latency: float, content: Optional[str],
+                    stream: bool = False, error: Optional[str] = None, cached: bool = False,
+                    usage: Optional[Dict[str, int]] = None, cost: Optional[float] = None) -> Dict[str, Any]:
+        """记录一次模型调用
+
+        Args:
+            model_name: 模型名称
+            role_name: 角色名称
+            latency: 调用耗时（秒），流式调用为读完整个流的耗时
+            content: 模型输出内容，调用失败时为None
+            stream: 是否为流式调用
+            error: 调用失败时的错误信息
+            cached: 是否命中响应缓存
+            usage: 服务商返回的token用量（prompt_tokens、completion_tokens和cached_tokens）
+            cost: 按价格表估算的费用，无法计价时为None
+
+        Returns:
+            事件记录
+        """
+        self.usage.add(model_name, role_name, latency, usage, cost, self.stage, cached)
+        return self.publish("call", {
+            "model": model_name,
+            "role": role_name,
+            "latency": round(latency, 3),
+            "content": content,
+            "stream": stream,
+            "error": error,
+            "cached": cached,
+            "usage": usage,
+            "cost": cost,
+            "stage": self.stage
+        })
+
+    def get_usage(self) -> Dict[str, Any]:
+        """获取累计的token用量、耗时和费用
+
+        Returns:
+            用量字典，total为本次审查的总计，by_model、by_role和by_stage为分组小计
+        """
+        return self.usage.summary()
+
+    def api_responses(self, since: int = 0) -> List[Dict[str, Any]]:
+        """以/progress接口的api_responses格式返回since之后的调用记录
+
+        Args:
+            since: 已读取的最后一条记录序号
+
+        Returns:
+            调用记录列表，失败的调用不包含在内
+        """
+        return [
+            {
+                "seq": event["seq"],
+                "chunk": {"choices": [{"delta": {"content": event["data"]["content"]}}]},
+                "model": event["data"]["model"],
+                "role": event["data"]["role"],
+                "latency": event["data"]["latency"]
+            }
+            for event in self.events_since(since)
+            if event["data"]["content"]
+        ]
+
+
+# 当前执行上下文的调用记录，审查阶段内并发的模型调用会继承同一绑定
+current_telemetry: ContextVar[Optional[ResponseTelemetry]] = ContextVar("current_telemetry", default=None)
+
+@contextmanager
+def bind_telemetry(telemetry: Optional[ResponseTelemetry]):
+    """在当前上下文中绑定调用记录，退出时恢复原绑定
+
+    Args:
+        telemetry: 调用记录
+    """
+    token = current_telemetry.set(telemetry)
+    try:
+        yield
+    finally:
+        current_telemetry.reset(token)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from .chunker import DocumentChunker
+
+
+def test_split_docx_by_headings_and_merge_short_sections():
+    """测试按标题切分章节，相邻的短章节合并，超长章节在段落边界处拆分"""
+    paragraphs = ["前言", "第一章", "短内容", "第二章", "甲" * 30, "乙" * 30, "第三章", "丙" * 5]
+    headings = [{"level": 1, "text": "第一章"}, {"level": 1, "text": "第二章"}, {"level": 1, "text": "第三章"}]
+    chunker = DocumentChunker(max_tokens=40)
+
+    chunks = chunker.split({"content": "", "paragraphs": paragraphs, "headings": headings})
+
+    assert [chunk["title"] for chunk in chunks] == ["开头部分 ~ 第一章", "第二章", "第二章（续1） ~ 第三章"]
+    assert chunks[0]["content"] == "前言\n\n第一章\n\n短内容"
+    assert all(chunk["tokens"] <= 40 for chunk in chunks)
+    assert [chunk["index"] for chunk in chunks] == [0, 1, 2]
+
+
+def test_split_pdf_by_pages_and_long_paragraph():
+    """测试PDF按页切分并记录页码，超长段落按字符截断"""
+    pages = ["第一页内容", "", "第三页内容", "长" * 25]
+    chunker = DocumentChunker(max_tokens=10)
+
+    chunks = chunker.split({"content": "", "paragraphs": [], "pages": pages})
+
+    assert [chunk["title"] for chunk in chunks] == ["第1-3页", "第4页", "第4页", "第4页"]
+    assert chunks[0]["pages"] == [1, 3]
+    assert [len(chunk["content"]) for chunk in chunks[1:]] == [10, 10, 5]
+
+
+def test_packer_emits_page_chunks_incrementally():
+    """测试逐页加入时前面的片段提前产出，结果与整体切分一致"""
+    pages = ["第一页内容", "", "第三页内容", "长" * 25, "第五页"]
+    chunker = DocumentChunker(max_tokens=10)
+    packer = chunker.packer()
+
+    emitted_after = []
+    streamed = []
+    for number, page_text in enumerate(pages, start=1):
+        chunks = packer.add_page(number, page_text)
+        emitted_after.extend([number] * len(chunks))
+        streamed.extend(chunks)
+    streamed.extend(packer.finish())
+
+    assert streamed == chunker.split({"content": "", "paragraphs": [], "pages": pages})
+    assert emitted_after[0] == 4
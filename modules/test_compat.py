@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import contextvars
+from .compat import to_thread
+
+current_value = contextvars.ContextVar("current_value", default=None)
+
+
+def test_to_thread_without_asyncio_to_thread(monkeypatch):
+    """测试Python 3.8没有asyncio.to_thread时在线程池中执行，并复制上下文变量"""
+    monkeypatch.delattr(asyncio, "to_thread", raising=False)
+
+    async def run():
+        current_value.set("review-1")
+        return await to_thread(lambda suffix: current_value.get() + suffix, "-done")
+
+    assert asyncio.run(run()) == "review-1-done"
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import zipfile
+from .docx_reader import DocxStreamReader, read_docx
+from .file_parser import FileParser
+
+FOOTNOTES = (
+    '<w:footnotes xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>'
+    '<w:footnote w:id="1"><w:p><w:r><w:t>数据来源于2023年统计</w:t></w:r></w:p></w:footnote>'
+    '</w:footnotes>'
+)
+
+
+def make_docx(path):
+    """生成包含标题、表格、页眉页脚和脚注的Word文档"""
+    import docx
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "内部资料"
+    document.sections[0].footer.paragraphs[0].text = "第1页"
+    document.add_heading("第一章", level=1)
+    document.add_paragraph("正文内容")
+    document.add_heading("1.1 数据", level=2)
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "指标"
+    table.cell(0, 1).text = "数值"
+    table.cell(1, 0).text = "收入"
+    table.cell(1, 1).text = "100"
+    document.add_paragraph("结语")
+    document.save(path)
+    # python-docx不支持脚注，直接写入脚注部件
+    with zipfile.ZipFile(path, "a") as archive:
+        archive.writestr("word/footnotes.xml", FOOTNOTES)
+
+
+def test_read_docx_in_document_order(tmp_path):
+    """测试单次遍历按文档顺序读取段落、标题、表格、页眉页脚和脚注"""
+    path = str(tmp_path / "doc.docx")
+    make_docx(path)
+
+    result = read_docx(path)
+
+    assert result["paragraphs"] == ["第一章", "正文内容", "1.1 数据", "指标 | 数值", "收入 | 100", "结语"]
+    assert result["headings"] == [{"level": 1, "text": "第一章"}, {"level": 2, "text": "1.1 数据"}]
+    assert result["tables"] == [[["指标", "数值"], ["收入", "100"]]]
+    assert result["headers"] == ["内部资料"]
+    assert result["footers"] == ["第1页"]
+    assert result["notes"] == [{"type": "footnote", "id": "1", "text": "数据来源于2023年统计"}]
+    assert [kind for kind, _ in DocxStreamReader(path).iter_body()] == ["paragraph"] * 3 + ["table", "paragraph"]
+
+
+def test_parse_docx_appends_notes_to_content(tmp_path):
+    """测试解析结果包含表格内容，脚注附在正文之后"""
+    path = str(tmp_path / "doc.docx")
+    make_docx(path)
+
+    result = FileParser(str(tmp_path / "temp")).parse_uncached(path)
+
+    assert "收入 | 100" in result["content"]
+    assert result["content"].endswith("[脚注1] 数据来源于2023年统计")
+    assert result["tables"][0][1] == ["收入", "100"]
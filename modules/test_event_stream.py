@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from .event_stream import ReviewEventStream
+from .role_manager import AIModel
+
+
+def test_events_since_returns_only_new_events():
+    """测试按序号增量读取事件，超出容量的旧事件被丢弃"""
+    stream = ReviewEventStream(capacity=3)
+    for i in range(5):
+        stream.publish("stage", {"index": i})
+
+    assert [event["seq"] for event in stream.events_since(0)] == [3, 4, 5]
+    assert [event["seq"] for event in stream.events_since(4)] == [5]
+    assert stream.events_since(5) == []
+    assert stream.last_seq == 5
+
+
+def test_subscribe_receives_live_events_until_closed():
+    """测试订阅者先收到历史事件，再收到新发布的事件"""
+    stream = ReviewEventStream()
+    stream.publish("stage", {"status": "开始"})
+
+    async def run():
+        received = []
+
+        async def consume():
+            async for event in stream.subscribe(0):
+                received.append(event["data"])
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        stream.publish("token", {"content": "你"})
+        stream.publish("token", {"content": "好"})
+        await asyncio.sleep(0.01)
+        stream.close()
+        await asyncio.wait_for(consumer, timeout=1)
+        return received
+
+    assert asyncio.run(run()) == [{"status": "开始"}, {"content": "你"}, {"content": "好"}]
+
+
+class FakeStream:
+    """模拟异步流式响应"""
+
+    def __init__(self, pieces):
+        self.pieces = iter(pieces)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            piece = next(self.pieces)
+        except StopIteration:
+            raise StopAsyncIteration
+        chunk = Mock()
+        chunk.choices = [Mock()]
+        chunk.choices[0].delta.content = piece
+        return chunk
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_chat_completion_pushes_deltas(mock_openai):
+    """测试传入增量回调时以流式调用，并返回完整内容"""
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(return_value=FakeStream(["审查", None, "要点"]))
+    mock_openai.return_value = mock_client
+    model = AIModel("https://api.example.com", "test-model", "test-key", "expert")
+    deltas = []
+
+    response = asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}], on_delta=deltas.append))
+
+    assert deltas == ["审查", "要点"]
+    assert response["choices"][0]["message"]["content"] == "审查要点"
+    assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+
+
+def test_bind_review_propagates_to_child_tasks():
+    """测试审查绑定对并发子任务可见，退出后恢复"""
+    from .review_context import bind_review, current_review_id, current_log_buffer
+    logs = ReviewEventStream()
+
+    async def child():
+        await asyncio.sleep(0)
+        return current_review_id.get(), current_log_buffer.get()
+
+    async def run():
+        with bind_review("r1", logs):
+            inside = await asyncio.gather(child(), child())
+        return inside, current_review_id.get()
+
+    inside, after = asyncio.run(run())
+    assert inside == [("r1", logs), ("r1", logs)]
+    assert after is None
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_chat_completion_records_calls_to_bound_telemetry(mock_openai):
+    """测试绑定调用记录后，每次调用记录模型、角色、耗时和完整内容"""
+    from .telemetry import ResponseTelemetry, bind_telemetry
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message.content = "普通响应"
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=[response, FakeStream(["流式", "响应"]), response])
+    mock_openai.return_value = mock_client
+    model = AIModel("https://api.example.com", "test-model", "test-key", "expert")
+    telemetry = ResponseTelemetry(capacity=10)
+
+    async def run():
+        with bind_telemetry(telemetry):
+            await model.chat_completion([{"role": "user", "content": "测试"}])
+            await model.chat_completion([{"role": "user", "content": "测试"}], on_delta=lambda content: None)
+        # 未绑定时不记录
+        await model.chat_completion([{"role": "user", "content": "测试"}])
+
+    asyncio.run(run())
+
+    records = [event["data"] for event in telemetry.events_since(0)]
+    assert [(r["model"], r["role"], r["content"], r["stream"]) for r in records] == [
+        ("test-model", "expert", "普通响应", False),
+        ("test-model", "expert", "流式响应", True)
+    ]
+    assert all(r["latency"] >= 0 for r in records)
+    assert [r["chunk"]["choices"][0]["delta"]["content"] for r in telemetry.api_responses(1)] == ["流式响应"]
+
+
+class ChunkStream(FakeStream):
+    """按给定的数据块依次返回的流式响应"""
+
+    async def __anext__(self):
+        try:
+            return next(self.pieces)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_stream_usage_records_cached_tokens(mock_openai):
+    """测试流式调用请求返回用量，最后一个数据块中的缓存命中token数计入调用记录"""
+    from .telemetry import ResponseTelemetry, bind_telemetry
+    content_chunk = Mock()
+    content_chunk.choices = [Mock()]
+    content_chunk.choices[0].delta.content = "要点"
+    content_chunk.usage = None
+    usage_chunk = Mock()
+    usage_chunk.choices = []
+    usage_chunk.usage = Mock(spec=["prompt_tokens", "completion_tokens", "prompt_tokens_details"])
+    usage_chunk.usage.prompt_tokens = 2000
+    usage_chunk.usage.completion_tokens = 100
+    usage_chunk.usage.prompt_tokens_details = {"cached_tokens": 1536}
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(return_value=ChunkStream([content_chunk, usage_chunk]))
+    mock_openai.return_value = mock_client
+    model = AIModel("https://api.example.com", "test-model", "test-key", "expert", stream_usage=True)
+    telemetry = ResponseTelemetry(capacity=10)
+
+    async def run():
+        with bind_telemetry(telemetry):
+            return await model.chat_completion([{"role": "user", "content": "测试"}], on_delta=lambda content: None)
+
+    response = asyncio.run(run())
+
+    assert response["choices"][0]["message"]["content"] == "要点"
+    assert mock_client.chat.completions.create.call_args.kwargs["extra_body"] == {"stream_options": {"include_usage": True}}
+    assert telemetry.events_since(0)[0]["data"]["usage"]["cached_tokens"] == 1536
+    assert telemetry.get_usage()["total"]["cache_hit_ratio"] == 0.768
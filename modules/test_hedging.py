@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest.mock import Mock
+from .hedging import HedgePolicy
+from .role_manager import AIModel
+from .response_cache import ResponseCache
+from .scheduler import ProviderLimiter
+from .usage import PriceTable, UsageLedger
+
+def make_model(model_name, delays, **options):
+    """创建按顺序以指定延迟返回的模型，返回(模型, 调用记录)"""
+    calls = []
+
+    async def create(**kwargs):
+        delay = delays[min(len(calls), len(delays) - 1)]
+        calls.append({"cancelled": False})
+        record = calls[-1]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            record["cancelled"] = True
+            raise
+        response = Mock()
+        response.choices = [Mock()]
+        response.choices[0].message.content = f"{model_name}响应"
+        response.usage = {"prompt_tokens": 1000, "completion_tokens": 0}
+        return response
+
+    model = AIModel("https://api.example.com", model_name, "test-key", "expert", **options)
+    model.client = Mock()
+    model.client.chat.completions.create = create
+    return model, calls
+
+def test_policy_threshold():
+    """测试分位数阈值、样本下限和对冲比例上限"""
+    policy = HedgePolicy(percentile=90, min_samples=5, window=10, min_delay=0.1, max_rate=0.5)
+    for latency in (1, 2, 3, 4):
+        policy.record(latency)
+    assert policy.hedge_delay() is None
+
+    for latency in range(5, 21):
+        policy.record(latency)
+    # 窗口只保留最近10个样本：11..20
+    assert policy.threshold() == 19
+    assert policy.hedge_delay() == 19
+
+    policy.hedged = 2
+    assert policy.hedge_delay() is None
+    stats = policy.get_stats()
+    assert stats["calls"] == 3
+    assert stats["hedge_rate"] == round(2 / 3, 4)
+
+def test_hedge_to_backup_wins():
+    """测试原请求过慢时对冲请求先返回，原请求被取消"""
+    backup, backup_calls = make_model("backup-model", [0.01])
+    policy = HedgePolicy(min_samples=1, min_delay=0.05, max_rate=0)
+    policy.record(0.05)
+    model, calls = make_model("slow-model", [5], hedge_policy=policy, hedge_model=backup)
+
+    response = asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}]))
+
+    assert response["choices"][0]["message"]["content"] == "backup-model响应"
+    assert calls[0]["cancelled"] is True
+    assert len(backup_calls) == 1
+    stats = policy.get_stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+
+def test_fast_primary_not_hedged():
+    """测试原请求在阈值内返回时不发出对冲请求"""
+    policy = HedgePolicy(min_samples=1, min_delay=0.2, max_rate=0)
+    policy.record(0.2)
+    model, calls = make_model("fast-model", [0.01], hedge_policy=policy)
+
+    response = asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}]))
+
+    assert response["choices"][0]["message"]["content"] == "fast-model响应"
+    assert len(calls) == 1
+    assert policy.get_stats()["hedged"] == 0
+    assert policy.get_stats()["samples"] == 2
+
+def test_hedge_clock_starts_after_slot_acquired():
+    """测试排队等待并发槽位的时间不触发对冲，也不计入历史耗时"""
+    limiter = ProviderLimiter(default_model_limit=1)
+    policy = HedgePolicy(min_samples=1, min_delay=0.1, max_rate=0)
+    policy.record(0.1)
+    model, calls = make_model("queued-model", [0.02], hedge_policy=policy, limiter=limiter)
+
+    async def run():
+        async def occupy():
+            async with limiter.slot(model.api_base, model.model_name):
+                await asyncio.sleep(0.3)
+        holder = asyncio.create_task(occupy())
+        await asyncio.sleep(0)
+        response = await model.chat_completion([{"role": "user", "content": "测试"}])
+        await holder
+        return response
+
+    response = asyncio.run(run())
+
+    assert response["choices"][0]["message"]["content"] == "queued-model响应"
+    assert len(calls) == 1
+    assert policy.get_stats()["hedged"] == 0
+    assert max(policy.samples) < 0.2
+
+def test_no_hedge_to_self_without_free_slot():
+    """测试向本模型对冲时没有空闲的并发槽位则不对冲"""
+    limiter = ProviderLimiter(default_model_limit=1)
+    policy = HedgePolicy(min_samples=1, min_delay=0.05, max_rate=0)
+    policy.record(0.05)
+    model, calls = make_model("busy-model", [0.2], hedge_policy=policy, limiter=limiter)
+
+    response = asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}]))
+
+    assert response["choices"][0]["message"]["content"] == "busy-model响应"
+    assert len(calls) == 1
+    assert policy.get_stats()["hedged"] == 0
+
+def test_backup_response_not_cached_under_primary_key():
+    """测试对冲请求胜出时，备用模型的响应不按原模型的缓存键保存"""
+    backup, _ = make_model("backup-model", [0.01])
+    policy = HedgePolicy(min_samples=1, min_delay=0.05, max_rate=0)
+    policy.record(0.05)
+    cache = ResponseCache(path=":memory:")
+    model, _ = make_model("slow-model", [5], hedge_policy=policy, hedge_model=backup, response_cache=cache)
+    messages = [{"role": "user", "content": "测试"}]
+
+    response = asyncio.run(model.chat_completion(messages))
+
+    assert response["choices"][0]["message"]["content"] == "backup-model响应"
+    assert cache.get(ResponseCache.make_key(model.api_base, model.model_name, messages, 0.7)) is None
+
+def test_backup_response_billed_to_backup_model():
+    """测试对冲请求胜出时，调用按备用模型计价并记入备用模型名下"""
+    ledger = UsageLedger(PriceTable({"slow-model": {"input": 1000}, "backup-model": {"input": 1}}))
+    backup, _ = make_model("backup-model", [0.01])
+    policy = HedgePolicy(min_samples=1, min_delay=0.05, max_rate=0)
+    policy.record(0.05)
+    model, _ = make_model("slow-model", [5], hedge_policy=policy, hedge_model=backup, usage_ledger=ledger)
+
+    asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}]))
+
+    summary = ledger.summary()
+    assert list(summary["by_model"]) == ["backup-model"]
+    assert summary["total"]["cost"] == 0.001
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+import httpx
+import openai
+import pytest
+from . import metrics
+from .metrics import MetricsRegistry, Counter, Histogram, Gauge
+from .role_manager import AIModel
+
+
+def test_render_prometheus_text_format():
+    """测试计数器、直方图和取值函数按Prometheus文本格式输出，直方图分桶为累计值"""
+    registry = MetricsRegistry()
+    errors = Counter("test_errors_total", "错误次数", ("status",), registry=registry)
+    latency = Histogram("test_latency_seconds", "耗时", ("model",), buckets=(0.1, 1), registry=registry)
+    active = Gauge("test_active", "执行中", registry=registry)
+    errors.inc(status=404)
+    errors.inc(2, status=404)
+    latency.observe(0.05, model='a"b')
+    latency.observe(0.5, model='a"b')
+    latency.observe(5, model='a"b')
+    active.set_function(lambda: 3)
+
+    text = registry.render()
+
+    assert "# TYPE test_errors_total counter\ntest_errors_total{status=\"404\"} 3\n" in text
+    assert 'test_latency_seconds_bucket{model="a\\"b",le="0.1"} 1\n' in text
+    assert 'test_latency_seconds_bucket{model="a\\"b",le="1"} 2\n' in text
+    assert 'test_latency_seconds_bucket{model="a\\"b",le="+Inf"} 3\n' in text
+    assert 'test_latency_seconds_sum{model="a\\"b"} 5.55\n' in text
+    assert 'test_latency_seconds_count{model="a\\"b"} 3\n' in text
+    assert "test_active 3\n" in text
+
+    with pytest.raises(ValueError):
+        errors.inc(code=404)
+    # 关闭后不再记录
+    registry.enabled = False
+    errors.inc(status=404)
+    assert errors.value(status=404) == 3
+
+
+def test_time_fills_outcome():
+    """测试计时时按代码块是否抛出异常填入outcome标签"""
+    registry = MetricsRegistry()
+    duration = Histogram("test_stage_seconds", "阶段耗时", ("stage", "outcome"), registry=registry)
+
+    with duration.time(stage="analysis"):
+        pass
+    with pytest.raises(RuntimeError):
+        with duration.time(stage="analysis"):
+            raise RuntimeError("失败")
+
+    assert duration.count(stage="analysis", outcome="completed") == 1
+    assert duration.count(stage="analysis", outcome="error") == 1
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_failed_call_counts_status(mock_openai):
+    """测试模型调用失败时按服务商返回的HTTP状态码计数，并记录失败调用的耗时"""
+    response = httpx.Response(401, request=httpx.Request("POST", "https://api.example.com/chat/completions"))
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(
+        side_effect=openai.AuthenticationError("鉴权失败", response=response, body=None)
+    )
+    mock_openai.return_value = mock_client
+    model = AIModel("https://api.example.com", "metrics-model", "test-key", "expert")
+
+    result = asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}]))
+
+    assert result is None
+    assert metrics.MODEL_API_ERRORS.value(model="metrics-model", role="expert", status="401") == 1
+    assert metrics.MODEL_CALL_DURATION.count(model="metrics-model", role="expert", outcome="error") == 1
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+from unittest.mock import patch
+from .file_parser import FileParser
+from .parse_cache import ParseCache
+
+
+def make_docx(path):
+    """生成包含标题和正文的Word文档"""
+    import docx
+    document = docx.Document()
+    document.add_heading("第一章", level=1)
+    document.add_paragraph("正文内容")
+    document.save(path)
+
+
+def test_identical_upload_skips_parsing(tmp_path):
+    """测试内容相同、文件名不同的文件第二次解析直接命中缓存"""
+    first = str(tmp_path / "a.docx")
+    make_docx(first)
+    second = str(tmp_path / "b.docx")
+    shutil.copy(first, second)
+    parser = FileParser(str(tmp_path / "temp"), ParseCache(str(tmp_path / "cache")))
+    file_hash = ParseCache.hash_file(second)
+
+    result = parser.parse_file(first)
+    assert result["cache_hit"] is False
+    assert parser.is_cached(file_hash)
+
+    # 新的解析器实例（模拟重启）从磁盘层读取
+    parser = FileParser(str(tmp_path / "temp"), ParseCache(str(tmp_path / "cache")))
+    with patch.object(FileParser, "_parse_docx") as parse_docx:
+        cached = parser.parse_file(second, file_hash)
+
+    parse_docx.assert_not_called()
+    assert cached["cache_hit"] is True
+    assert cached["file_name"] == "b.docx"
+    assert cached["headings"] == [{"level": 1, "text": "第一章"}]
+    assert cached["content"] == result["content"]
+
+
+def test_cache_evicts_memory_and_disk_entries(tmp_path):
+    """测试内存层和磁盘层分别按容量淘汰最久未使用的结果"""
+    cache = ParseCache(str(tmp_path), memory_entries=1, max_disk_entries=2)
+    for key in ["a", "b", "c"]:
+        cache.put(key, {"content": key})
+        # 保证磁盘文件的访问时间有先后
+        os.utime(os.path.join(str(tmp_path), f"{key}.json"), (ord(key), ord(key)))
+
+    assert cache.get_stats()["memory_entries"] == 1
+    assert sorted(os.listdir(str(tmp_path))) == ["b.json", "c.json"]
+    assert cache.get("a") is None
+    assert cache.get("b") == {"content": "b"}
+
+
+def test_results_carry_original_file_name(tmp_path):
+    """测试按内容摘要存储的文件解析后使用上传时的原始文件名，缓存命中时同样替换"""
+    stored = str(tmp_path / "0123abcd.docx")
+    make_docx(stored)
+    parser = FileParser(str(tmp_path / "temp"), ParseCache(str(tmp_path / "cache")), keep_temp_text=True)
+
+    result = parser.parse_file(stored, file_name="合同.docx")
+    assert result["file_name"] == "合同.docx"
+    assert os.path.basename(result["temp_file"]) == "合同.txt"
+
+    cached = parser.parse_file(stored, file_name="协议.docx")
+    assert cached["cache_hit"] is True
+    assert cached["file_name"] == "协议.docx"
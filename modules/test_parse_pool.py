@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import pytest
+from .file_parser import FileParser
+from .parse_pool import ParsePool, ParseError, ParseTimeoutError
+from .test_pdf_engine import make_pdf
+
+
+def test_parse_in_subprocess_reports_progress(tmp_path):
+    """测试在子进程中解析文件并回传进度"""
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, [[f"Page {i}"] for i in range(3)])
+    parser = FileParser(str(tmp_path / "temp"), parse_pool=ParsePool(max_workers=1, timeout_seconds=60))
+    messages = []
+
+    result = asyncio.run(parser.parse_file_async(path, progress=messages.append))
+
+    assert result["paragraphs"] == ["Page 0", "Page 1", "Page 2"]
+    assert result["cache_hit"] is False
+    assert messages and messages[0].startswith("PDF共3页")
+    assert parser.parse_pool.get_stats()["completed"] == 1
+
+
+def test_timeout_and_failures_are_isolated(tmp_path):
+    """测试解析超时、文件损坏和超出内存上限都只导致该文件解析失败"""
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, [["Page"]])
+    broken = str(tmp_path / "broken.pdf")
+    with open(broken, "wb") as f:
+        f.write(b"%PDF-1.4 not really a pdf")
+    temp_dir = str(tmp_path / "temp")
+
+    pool = ParsePool(timeout_seconds=0.001)
+
+    async def run():
+        with pytest.raises(ParseTimeoutError):
+            await pool.parse(path, temp_dir)
+        pool.timeout_seconds = 60
+        with pytest.raises(ParseError):
+            await pool.parse(broken, temp_dir)
+        pool.memory_limit_mb = 1
+        with pytest.raises(ParseError):
+            await pool.parse(path, temp_dir)
+        # 进程池在失败后仍可继续使用
+        pool.memory_limit_mb = 2048
+        return await pool.parse(path, temp_dir)
+
+    assert asyncio.run(run())["paragraphs"] == ["Page"]
+    assert pool.get_stats() == {"max_workers": 2, "active": 0, "completed": 1, "failed": 2, "timed_out": 1}
+
+
+def test_cancel_does_not_wait_for_child_on_event_loop(tmp_path):
+    """测试取消解析时只在事件循环中发送终止信号，子进程由监视线程回收"""
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, [["Page"]])
+    pool = ParsePool(timeout_seconds=60)
+    pool._kill = lambda process: pytest.fail("取消时不应在事件循环中等待子进程退出")
+    processes = []
+
+    async def run():
+        task = asyncio.create_task(pool.parse(path, None))
+        await asyncio.sleep(0.05)
+        processes.extend(pool._active)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert processes and pool.get_stats()["active"] == 0
+    for process in processes:
+        process.join(5)
+        assert not process.is_alive()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from .pdf_engine import PdfExtractionEngine
+
+
+def make_pdf(path, page_lines):
+    """生成每页包含若干行英文文本的PDF"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in page_lines:
+        text = b"BT /F1 12 Tf 72 720 Td 14 TL " + b" ".join(b"(" + line.encode() + b") '" for line in lines) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(text) + text + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_extract_samples_backend_and_times_each_page(tmp_path):
+    """测试采样选定后端后提取全部页，并记录每页耗时"""
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, [[f"Page {i} line {j}" for j in range(3)] for i in range(5)])
+    engine = PdfExtractionEngine(sample_pages=2, max_workers=1)
+
+    result = engine.extract(path)
+
+    assert result["backend"] in ("pypdf2", "pdfplumber")
+    assert len(result["pages"]) == 5
+    assert "Page 4 line 2" in result["pages"][4]
+    assert len(result["page_timings"]) == 5
+    assert all(seconds >= 0 for seconds in result["page_timings"])
+
+
+def test_parallel_extraction_matches_sequential(tmp_path):
+    """测试多进程并行提取与单进程提取的结果一致"""
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, [[f"Page {i}"] for i in range(8)])
+    sequential = PdfExtractionEngine(backends=["pypdf2"], sample_pages=1, max_workers=1).extract(path)
+    engine = PdfExtractionEngine(backends=["pypdf2"], sample_pages=1, max_workers=2, parallel_threshold=2)
+    try:
+        parallel = engine.extract(path)
+    finally:
+        engine.shutdown()
+
+    assert parallel["pages"] == sequential["pages"]
+
+
+def test_iter_parse_yields_pages_in_order_before_result(tmp_path):
+    """测试流式解析按页序逐页产出，最后产出完整的解析结果"""
+    import asyncio
+    from .file_parser import FileParser
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, [[f"Page {i}"] for i in range(12)])
+    engine = PdfExtractionEngine(backends=["pypdf2"], sample_pages=1, max_workers=2, parallel_threshold=2)
+    engine.PROGRESS_PAGES = 3
+    parser = FileParser(str(tmp_path / "temp"), pdf_engine=engine)
+
+    async def collect():
+        return [event async for event in parser.iter_parse(path)]
+
+    try:
+        events = asyncio.run(collect())
+    finally:
+        engine.shutdown()
+
+    assert [kind for kind, _ in events] == ["page"] * 12 + ["result"]
+    assert [payload[0] for _, payload in events[:-1]] == list(range(1, 13))
+    assert "Page 11" in events[11][1][1]
+    assert events[-1][1]["pages"] == [payload[1] for _, payload in events[:-1]]
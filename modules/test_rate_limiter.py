@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import httpx
+import openai
+from unittest.mock import Mock, AsyncMock, patch
+from .rate_limiter import TokenBucket, ProviderRateLimiter, RetryPolicy
+from .role_manager import AIModel
+
+
+def make_status_error(status_code: int, headers=None) -> openai.APIStatusError:
+    """构造带响应头的API状态错误"""
+    request = httpx.Request("POST", "https://api.example.com/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    error_class = openai.RateLimitError if status_code == 429 else openai.APIStatusError
+    return error_class("error", response=response, body=None)
+
+
+def test_token_bucket_reserve_waits_when_empty():
+    """测试令牌耗尽后按速率计算等待时间"""
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    assert 0.9 < bucket.reserve(1) <= 1.0
+
+
+def test_provider_rate_limiter_limits_tokens_per_minute():
+    """测试token数超过每分钟额度时需要等待"""
+    limiter = ProviderRateLimiter(providers={"https://a": {"tokens_per_minute": 6000}})
+
+    async def run():
+        first = await limiter.acquire("https://a", 6000)
+        second = await limiter.acquire("https://a", 10)
+        unlimited = await limiter.acquire("https://b", 100000)
+        return first, second, unlimited
+
+    first, second, unlimited = asyncio.run(run())
+    assert first == 0
+    assert 0.05 < second <= 0.1
+    assert unlimited == 0
+
+
+def test_retry_policy_honours_retry_after():
+    """测试重试等待时间不短于Retry-After"""
+    policy = RetryPolicy(base_delay=0.01, max_delay=0.02)
+    delay = policy.next_delay(make_status_error(429, {"retry-after": "3"}), 1, time.monotonic())
+
+    assert delay == 3.0
+    assert policy.next_delay(make_status_error(400), 1, time.monotonic()) is None
+    assert policy.next_delay(make_status_error(503), 4, time.monotonic()) is None
+
+
+def test_retry_policy_respects_budget():
+    """测试超出单次调用的重试预算后不再重试"""
+    policy = RetryPolicy(budget_seconds=1.0)
+
+    assert policy.next_delay(make_status_error(429, {"retry-after": "5"}), 1, time.monotonic()) is None
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_chat_completion_retries_transient_errors(mock_openai):
+    """测试临时错误重试成功后返回正常结果"""
+    mock_response = Mock()
+    mock_response.choices = [Mock()]
+    mock_response.choices[0].message.content = "重试成功"
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=[
+        make_status_error(429, {"retry-after-ms": "10"}),
+        make_status_error(502),
+        mock_response
+    ])
+    mock_openai.return_value = mock_client
+
+    model = AIModel(
+        api_base="https://api.example.com",
+        model_name="test-model",
+        api_key="test-key",
+        role_name="test-role",
+        retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.02)
+    )
+    response = asyncio.run(model.chat_completion([{"role": "user", "content": "测试"}]))
+
+    assert response["choices"][0]["message"]["content"] == "重试成功"
+    assert mock_client.chat.completions.create.call_count == 3
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_failed_and_timed_out_calls_refund_reserved_tokens(mock_openai):
+    """测试调用失败或超时后退还预留的token，成功的调用按实际用量修正"""
+    mock_response = Mock()
+    mock_response.choices = [Mock()]
+    mock_response.choices[0].message.content = "完成"
+    mock_response.usage.total_tokens = 500
+    outcomes = [make_status_error(400), None, mock_response]
+
+    async def create(**kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome is None:
+            await asyncio.sleep(1)
+        return outcome
+
+    mock_client = Mock()
+    mock_client.chat.completions.create = create
+    mock_openai.return_value = mock_client
+    limiter = ProviderRateLimiter(providers={"https://api.example.com": {"tokens_per_minute": 6000}})
+    model = AIModel("https://api.example.com", "test-model", "test-key", "expert", rate_limiter=limiter)
+    _, bucket = limiter._get_buckets("https://api.example.com")
+    messages = [{"role": "user", "content": "测试" * 1000}]
+
+    async def run():
+        assert await model.chat_completion(messages) is None
+        assert bucket.tokens > 5990
+        try:
+            await model.chat_completion(messages, timeout=0.05)
+        except TimeoutError:
+            pass
+        assert bucket.tokens > 5990
+        await model.chat_completion(messages)
+
+    asyncio.run(run())
+    assert 5490 < bucket.tokens < 5510
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from .response_cache import ResponseCache
+from .role_manager import AIModel
+
+
+def test_cache_hit_miss_and_ttl(tmp_path):
+    """测试缓存命中、未命中计数和过期淘汰，重新打开后数据仍在"""
+    path = str(tmp_path / "responses.db")
+    cache = ResponseCache(path=path, ttl_seconds=3600)
+    key = ResponseCache.make_key("https://a", "m", [{"role": "user", "content": "你好"}], 0.7)
+
+    assert cache.get(key) is None
+    cache.set(key, "回答")
+    assert cache.get(key) == "回答"
+    assert key != ResponseCache.make_key("https://a", "m", [{"role": "user", "content": "你好"}], 0.2)
+    cache.close()
+
+    reopened = ResponseCache(path=path, ttl_seconds=3600)
+    assert reopened.get(key) == "回答"
+    reopened.ttl_seconds = 0.001
+    reopened._conn.execute("UPDATE responses SET created_at = created_at - 1")
+    assert reopened.get(key) is None
+    assert reopened.get_stats()["entries"] == 0
+    stats = reopened.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    """测试总大小超出上限时淘汰最久未访问的条目"""
+    cache = ResponseCache(path=":memory:", max_bytes=10)
+    cache.set("a", "1234")
+    cache.set("b", "5678")
+    cache.get("a")
+    cache.set("c", "9012")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1234"
+    assert cache.get("c") == "9012"
+    assert cache.get_stats()["evictions"] == 1
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_chat_completion_uses_cache_unless_bypassed(mock_openai):
+    """测试相同提示词第二次调用直接返回缓存，bypass_cache时重新调用API"""
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message.content = "审查要点"
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(return_value=response)
+    mock_openai.return_value = mock_client
+    model = AIModel("https://api.example.com", "test-model", "test-key", "expert",
+                    response_cache=ResponseCache(path=":memory:"))
+    messages = [{"role": "user", "content": "测试"}]
+    deltas = []
+
+    async def run():
+        first = await model.chat_completion(messages)
+        second = await model.chat_completion(messages, on_delta=deltas.append)
+        await model.chat_completion(messages, bypass_cache=True)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert deltas == ["审查要点"]
+    assert mock_client.chat.completions.create.call_count == 2
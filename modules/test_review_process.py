@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, AsyncMock
+from .review_process import ReviewProcess
+
+
+class SlowExpert:
+    """模拟耗时的专家模型"""
+
+    def __init__(self, model_name: str, delay: float):
+        self.model_name = model_name
+        self.expertise = "测试"
+        self.delay = delay
+
+    async def analyze_document(self, prompt, on_delta=None, timeout=None):
+        await asyncio.sleep(self.delay)
+        return {"model_name": self.model_name, "expertise": self.expertise, "content": "要点", "response_time": 0}
+
+    async def discuss_document(self, prompt, on_delta=None, timeout=None):
+        await asyncio.sleep(self.delay)
+        return {"model_name": self.model_name, "expertise": self.expertise, "content": "建议", "response_time": 0}
+
+
+def make_process(experts):
+    """构建使用模拟角色和解析器的审查流程"""
+    organizer = Mock()
+    organizer.generate_analysis_prompt.return_value = "分析提示词"
+    organizer.generate_discussion_prompt.return_value = "讨论提示词"
+    organizer.summarize_review_points = AsyncMock(return_value="审查要点")
+    organizer.generate_final_report = AsyncMock(return_value={"summary": "总览"})
+
+    role_manager = Mock()
+    role_manager.get_organizer.return_value = organizer
+    role_manager.get_experts.return_value = experts
+    role_manager.usage_ledger.currency = "USD"
+
+    file_parser = Mock()
+    file_parser.parse_file_async = AsyncMock(return_value={"content": "文档内容", "file_name": "test.docx"})
+
+    async def iter_parse(file_path, file_hash=None, progress=None, temp_dir=None, file_name=None):
+        yield "result", await file_parser.parse_file_async(file_path, file_hash)
+
+    file_parser.iter_parse = iter_parse
+    return ReviewProcess(role_manager, file_parser)
+
+
+def test_experts_run_concurrently():
+    """测试多个专家的调用并发执行，总耗时接近最慢的专家"""
+    experts = [SlowExpert(f"model-{i}", 0.2) for i in range(5)]
+    process = make_process(experts)
+
+    async def run():
+        start = time.perf_counter()
+        await process.analyze_document("test.docx")
+        analysis_time = time.perf_counter() - start
+        start = time.perf_counter()
+        await process.discuss_document()
+        return analysis_time, time.perf_counter() - start
+
+    analysis_time, discussion_time = asyncio.run(run())
+
+    assert analysis_time < 0.6
+    assert discussion_time < 0.6
+    assert len(process.analysis_results) == 5
+    assert all(status == "完成" for status in process.progress["expert_progress"].values())
+
+
+def test_select_experts_limits_later_stages():
+    """测试选择专家子集后只有选中的专家参与审查"""
+    experts = [SlowExpert(f"model-{i}", 0) for i in range(3)]
+    experts[2].expertise = "逻辑分析"
+    process = make_process(experts)
+
+    assert process.select_experts(["model-0", "逻辑分析"]) == ["model-0", "model-2"]
+    asyncio.run(process.analyze_document("test.docx"))
+
+    assert [result["model_name"] for result in process.analysis_results] == ["model-0", "model-2"]
+    assert process.select_experts([]) == ["model-0", "model-1", "model-2"]
+
+
+def test_experts_sharing_a_model_keep_their_own_results():
+    """测试多位专家使用同一模型时，各自的片段任务和分析结果互不混淆"""
+    from .chunker import DocumentChunker
+    experts = [SlowExpert("deepseek-chat", 0), SlowExpert("deepseek-chat", 0)]
+    for expert, expertise in zip(experts, ("语法审查", "逻辑分析")):
+        expert.expertise = expertise
+
+        async def analyze(prompt, on_delta=None, timeout=None, expert=expert):
+            return {"model_name": expert.model_name, "expertise": expert.expertise,
+                    "content": f"{expert.expertise}要点", "response_time": 0}
+
+        expert.analyze_document = analyze
+    process = make_process(experts)
+    process.chunker = DocumentChunker(max_tokens=6)
+    process.file_parser.parse_file_async.return_value = {
+        "content": "全文",
+        "paragraphs": ["第一章", "内容一", "第二章", "内容二"],
+        "headings": [{"level": 1, "text": "第一章"}, {"level": 1, "text": "第二章"}],
+        "file_name": "test.docx"
+    }
+
+    asyncio.run(process.analyze_document("test.docx"))
+
+    assert len(process.chunks) == 2
+    assert process.analysis_results[0]["content"] == "【第一章】\n语法审查要点\n\n【第二章】\n语法审查要点"
+    assert process.analysis_results[1]["content"] == "【第一章】\n逻辑分析要点\n\n【第二章】\n逻辑分析要点"
+
+
+def test_chunks_reviewed_concurrently_and_reduced_by_section():
+    """测试每位专家并发审查所有片段，讨论结果按章节归并"""
+    from .chunker import DocumentChunker
+    experts = [SlowExpert(f"model-{i}", 0.2) for i in range(2)]
+    process = make_process(experts)
+    process.chunker = DocumentChunker(max_tokens=6)
+    process.file_parser.parse_file_async.return_value = {
+        "content": "全文",
+        "paragraphs": ["第一章", "内容一", "第二章", "内容二", "第三章", "内容三"],
+        "headings": [{"level": 1, "text": "第一章"}, {"level": 1, "text": "第二章"}, {"level": 1, "text": "第三章"}],
+        "file_name": "test.docx"
+    }
+
+    async def run():
+        await process.analyze_document("test.docx")
+        start = time.perf_counter()
+        result = await process.discuss_document()
+        return result, time.perf_counter() - start
+
+    result, discussion_time = asyncio.run(run())
+
+    assert discussion_time < 0.5
+    assert process.organizer.generate_discussion_prompt.call_count == 3
+    assert [section["title"] for section in result["sections"]] == ["第一章", "第二章", "第三章"]
+    assert [r["model_name"] for r in result["sections"][1]["expert_results"]] == ["model-0", "model-1"]
+    assert result["expert_results"][0]["content"].startswith("【第一章】\n建议")
+
+
+def test_experts_start_before_parsing_finishes():
+    """测试流式解析时前面的页面切分出片段后立即派发专家任务"""
+    from .chunker import DocumentChunker
+    experts = [SlowExpert("model-0", 0)]
+    process = make_process(experts)
+    process.chunker = DocumentChunker(max_tokens=6)
+    pages = ["第一页内容", "第二页内容", "第三页内容"]
+    timeline = []
+
+    async def iter_parse(file_path, file_hash=None, progress=None, temp_dir=None, file_name=None):
+        for number, page_text in enumerate(pages, start=1):
+            await asyncio.sleep(0.05)
+            yield "page", (number, page_text)
+        timeline.append("parsed")
+        yield "result", {"content": "\n\n".join(pages), "pages": pages, "file_name": "test.pdf"}
+
+    async def analyze(prompt, on_delta=None, timeout=None):
+        timeline.append("expert")
+        return {"model_name": "model-0", "expertise": "测试", "content": "要点", "response_time": 0}
+
+    process.file_parser.iter_parse = iter_parse
+    experts[0].analyze_document = analyze
+    asyncio.run(process.analyze_document("test.pdf"))
+
+    assert timeline.index("expert") < timeline.index("parsed")
+    assert [chunk["title"] for chunk in process.chunks] == ["第1页", "第2页", "第3页"]
+    assert process.analysis_results[0]["content"].startswith("【第1页】\n要点")
+
+
+def test_run_all_pipelines_stages_and_pauses_for_approval():
+    """测试一键执行所有阶段，确认被拒绝时暂停，再次调用从暂停的阶段继续"""
+    process = make_process([SlowExpert("model-0", 0)])
+    completed = []
+    requested = []
+
+    async def record(stage, result):
+        completed.append(stage)
+
+    async def deny(stage):
+        requested.append(stage)
+        return False
+
+    first = asyncio.run(process.run_all("test.docx", approve=deny, on_stage_complete=record))
+
+    assert first["completed"] == ["analysis"] and first["paused_before"] == "discussion"
+    assert requested == ["discussion"]
+
+    second = asyncio.run(process.run_all("test.docx", on_stage_complete=record))
+
+    assert second["completed"] == ["discussion", "summary"] and second["paused_before"] is None
+    assert completed == ["analysis", "discussion", "summary"]
+    assert second["final_report"]["summary"] == "总览"
+    assert "token_usage" in second["final_report"]
+    assert process.next_stage() is None
+    process.file_parser.parse_file_async.assert_awaited_once()
+
+
+def test_stage_deadline_proceeds_with_finished_experts():
+    """测试阶段到期时取消未完成的专家，组织者只汇总已完成的专家，报告标注缺失的专家"""
+    experts = [SlowExpert("fast", 0), SlowExpert("hung", 10)]
+    process = make_process(experts)
+    process.stage_timeout = 0.2
+
+    async def run():
+        start = time.perf_counter()
+        await process.analyze_document("test.docx")
+        elapsed = time.perf_counter() - start
+        await process.discuss_document()
+        return elapsed, await process.generate_summary()
+
+    elapsed, report = asyncio.run(run())
+
+    assert elapsed < 1
+    assert [r["status"] for r in process.analysis_results] == ["completed", "timeout"]
+    summarized = process.organizer.summarize_review_points.call_args.args[0]
+    assert [r["model_name"] for r in summarized] == ["fast"]
+    assert process.progress["expert_progress"]["hung"] == "超时"
+    assert [(m["stage"], m["model_name"]) for m in report["missing_experts"]] == [("analysis", "hung"), ("discussion", "hung")]
+
+
+def test_call_timeout_marks_chunk_missing():
+    """测试单次调用超时只记该片段缺失"""
+    class TimeoutExpert(SlowExpert):
+        async def analyze_document(self, prompt, on_delta=None, timeout=None):
+            assert timeout == 5
+            raise TimeoutError("调用超时")
+
+    process = make_process([SlowExpert("ok", 0), TimeoutExpert("late", 0)])
+    process.call_timeout = 5
+    asyncio.run(process.analyze_document("test.docx"))
+
+    assert process.analysis_results[1]["missing_sections"] == [process.chunks[0]["title"]]
+    assert process.missing_experts["analysis"][0]["model_name"] == "late"
+
+
+def test_stages_without_experts_fail_fast():
+    """测试没有参与审查的专家时，分析和讨论阶段直接报错而不是等待期限后超时"""
+    process = make_process([])
+    process.stage_timeout = 60
+
+    with pytest.raises(ValueError, match="没有参与审查的专家"):
+        asyncio.run(process.analyze_document("test.docx"))
+    process.file_content, process.review_points = "文档内容", "审查要点"
+    with pytest.raises(ValueError, match="没有参与审查的专家"):
+        asyncio.run(process.discuss_document())
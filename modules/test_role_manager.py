@@ -1,11 +1,13 @@
+# -*- coding: utf-8 -*-
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
-from .role_manager import AIModel
-from openai import OpenAI
+from unittest.mock import Mock, AsyncMock, patch
+from .role_manager import AIModel, OrganizerModel, ExpertModel, extract_usage
+from openai import AsyncOpenAI
 
 @pytest.fixture
 def ai_model():
-    """AIModelʵfixture"""
+    """创建AIModel实例的fixture"""
     return AIModel(
         api_base="https://api.example.com",
         model_name="test-model",
@@ -14,61 +16,61 @@ def ai_model():
     )
 
 def test_init(ai_model):
-    """AIModelʼ"""
+    """测试AIModel初始化"""
     assert ai_model.api_base == "https://api.example.com"
     assert ai_model.model_name == "test-model"
     assert ai_model.api_key == "test-key"
     assert ai_model.role_name == "test-role"
-    assert isinstance(ai_model.client, OpenAI)
+    assert isinstance(ai_model.client, AsyncOpenAI)
 
-@patch('openai.OpenAI')
+@patch('modules.role_manager.AsyncOpenAI')
 def test_chat_completion_success(mock_openai):
-    """chat completion"""
-    # mockӦ
+    """测试正常的chat completion调用"""
+    # 设置mock响应
     mock_response = Mock()
     mock_response.choices = [Mock()]
-    mock_response.choices[0].message.content = "Ӧ"
-    
+    mock_response.choices[0].message.content = "测试响应"
+
     mock_client = Mock()
-    mock_client.chat.completions.create.return_value = mock_response
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
     mock_openai.return_value = mock_client
-    
+
     model = AIModel(
         api_base="https://api.example.com",
         model_name="test-model",
         api_key="test-key",
         role_name="test-role"
     )
-    
-    messages = [{"role": "user", "content": "Ϣ"}]
-    response = model.chat_completion(messages)
-    
+
+    messages = [{"role": "user", "content": "测试消息"}]
+    response = asyncio.run(model.chat_completion(messages))
+
     assert response is not None
-    assert response["choices"][0]["message"]["content"] == "Ӧ"
+    assert response["choices"][0]["message"]["content"] == "测试响应"
     mock_client.chat.completions.create.assert_called_once_with(
         model="test-model",
         messages=messages,
         temperature=0.7
     )
 
-@patch('openai.OpenAI')
+@patch('modules.role_manager.AsyncOpenAI')
 def test_chat_completion_stream(mock_openai):
-    """ʽӦģʽ"""
+    """测试流式响应模式"""
     mock_stream = Mock()
     mock_client = Mock()
-    mock_client.chat.completions.create.return_value = mock_stream
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_stream)
     mock_openai.return_value = mock_client
-    
+
     model = AIModel(
         api_base="https://api.example.com",
         model_name="test-model",
         api_key="test-key",
         role_name="test-role"
     )
-    
-    messages = [{"role": "user", "content": "Ϣ"}]
-    response = model.chat_completion(messages, stream=True)
-    
+
+    messages = [{"role": "user", "content": "测试消息"}]
+    response = asyncio.run(model.chat_completion(messages, stream=True))
+
     assert response == mock_stream
     mock_client.chat.completions.create.assert_called_once_with(
         model="test-model",
@@ -77,21 +79,106 @@ def test_chat_completion_stream(mock_openai):
         stream=True
     )
 
-@patch('openai.OpenAI')
+@patch('modules.role_manager.AsyncOpenAI')
 def test_chat_completion_error(mock_openai):
-    """Դ"""
+    """测试错误处理"""
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=Exception("API错误"))
+    mock_openai.return_value = mock_client
+
+    model = AIModel(
+        api_base="https://api.example.com",
+        model_name="test-model",
+        api_key="test-key",
+        role_name="test-role"
+    )
+
+    messages = [{"role": "user", "content": "测试消息"}]
+    response = asyncio.run(model.chat_completion(messages))
+
+    assert response is None
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_chat_completion_timeout(mock_openai):
+    """测试调用超过期限时中止请求并抛出TimeoutError"""
+    cancelled = []
+
+    async def hang(**kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
     mock_client = Mock()
-    mock_client.chat.completions.create.side_effect = Exception("API")
+    mock_client.chat.completions.create = hang
     mock_openai.return_value = mock_client
-    
+
     model = AIModel(
         api_base="https://api.example.com",
         model_name="test-model",
         api_key="test-key",
         role_name="test-role"
     )
-    
-    messages = [{"role": "user", "content": "Ϣ"}]
-    response = model.chat_completion(messages)
-    
-    assert response is None
\ No newline at end of file
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(model.chat_completion([{"role": "user", "content": "测试消息"}], timeout=0.05))
+    assert cancelled == [True]
+
+def test_prompts_share_document_prefix():
+    """测试同一片段在各专家和分析、讨论阶段的请求共享材料前缀，差异只在末尾"""
+    organizer = OrganizerModel("https://api.example.com", "organizer-model", "test-key")
+    experts = [ExpertModel("https://api.example.com", f"model-{i}", "test-key", expertise)
+               for i, expertise in enumerate(["语法审查", "逻辑分析"])]
+    analysis = organizer.generate_analysis_prompt("材料正文", "第一章")
+    discussion = organizer.generate_discussion_prompt("材料正文", "要点清单", "第一章")
+
+    requests = [expert.expert_messages(prompt) for prompt in (analysis, discussion) for expert in experts]
+    prefix = organizer.document_messages("材料正文", "第一章")
+    for messages in requests:
+        assert messages[:2] == prefix
+    assert "材料正文" in prefix[1]["content"]
+    assert "语法审查" in requests[0][-1]["content"]
+    assert "要点清单" in requests[2][2]["content"]
+
+def test_extract_usage_cached_tokens():
+    """测试从OpenAI和DeepSeek格式的usage中提取命中前缀缓存的token数"""
+    openai_usage = Mock(spec=["prompt_tokens", "completion_tokens", "prompt_tokens_details"])
+    openai_usage.prompt_tokens = 1200
+    openai_usage.completion_tokens = 80
+    openai_usage.prompt_tokens_details = {"cached_tokens": 1024}
+    assert extract_usage(openai_usage) == {"prompt_tokens": 1200, "completion_tokens": 80, "cached_tokens": 1024}
+
+    deepseek_usage = Mock(spec=["prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens"])
+    deepseek_usage.prompt_tokens = 900
+    deepseek_usage.completion_tokens = 50
+    deepseek_usage.prompt_cache_hit_tokens = 640
+    assert extract_usage(deepseek_usage)["cached_tokens"] == 640
+    # 流式数据块中SDK未声明的usage字段为字典
+    assert extract_usage({"prompt_tokens": 10, "prompt_tokens_details": {"cached_tokens": 4}})["cached_tokens"] == 4
+    assert extract_usage(None) is None
+
+def test_stream_usage_is_opt_in_per_role(tmp_path):
+    """测试stream_usage默认关闭，可在单个角色的配置中开启"""
+    import json
+    from .config_manager import ConfigManager
+    from .role_manager import RoleManager
+    role = {"api_base": "https://api.example.com", "api_key": "test-key"}
+    config = {
+        "organizer": {**role, "model_name": "organizer-model", "role_name": "organizer"},
+        "experts": [
+            {**role, "model_name": "expert-a", "role_name": "expert", "expertise": "法律"},
+            {**role, "model_name": "expert-b", "role_name": "expert", "expertise": "财务", "stream_usage": True}
+        ],
+        "cache": {"enabled": False}
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    role_manager = RoleManager(ConfigManager(str(config_path)))
+
+    assert role_manager.get_organizer()._stream_options() == {}
+    assert role_manager.get_expert_by_name("expert-a")._stream_options() == {}
+    assert role_manager.get_expert_by_name("expert-b")._stream_options() == {
+        "extra_body": {"stream_options": {"include_usage": True}}
+    }
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import pytest
+from .scheduler import ProviderLimiter, ReviewScheduler, SchedulerFullError
+
+
+def test_scheduler_bounds_workers_and_reports_position():
+    """测试调度器限制并发任务数，并按先进先出顺序报告排队位置"""
+    async def run():
+        scheduler = ReviewScheduler(max_workers=2, max_queue=10, default_job_seconds=30)
+        await scheduler.start()
+        release = asyncio.Event()
+        running = []
+        peak = 0
+
+        async def job(name):
+            nonlocal peak
+            running.append(name)
+            peak = max(peak, len(running))
+            await release.wait()
+            running.remove(name)
+
+        for i in range(4):
+            scheduler.submit(f"r{i}", "analysis", job, f"r{i}")
+        await asyncio.sleep(0.05)
+
+        infos = [scheduler.get_queue_info(f"r{i}") for i in range(4)]
+        release.set()
+        await asyncio.sleep(0.05)
+        await scheduler.shutdown()
+        return peak, infos
+
+    peak, infos = asyncio.run(run())
+
+    assert peak == 2
+    assert infos[0]["state"] == "running"
+    assert infos[1]["state"] == "running"
+    assert infos[2] == {"state": "queued", "stage": "analysis", "position": 1,
+                        "queue_length": 2, "estimated_start_seconds": 30.0}
+    assert infos[3]["position"] == 2
+
+
+def test_scheduler_rejects_when_queue_full():
+    """测试等待队列已满时拒绝提交"""
+    scheduler = ReviewScheduler(max_workers=1, max_queue=1)
+
+    async def job():
+        pass
+
+    scheduler.submit("a", "analysis", job)
+    with pytest.raises(SchedulerFullError):
+        scheduler.submit("b", "analysis", job)
+
+
+def test_provider_limiter_caps_endpoint_concurrency():
+    """测试同一端点上的调用并发数不超过配置值"""
+    limiter = ProviderLimiter(endpoint_limits={"https://a": 2}, default_model_limit=10)
+    limiter.register_model("https://a", "m1")
+    limiter.register_model("https://a", "m2")
+    active = 0
+    peak = 0
+
+    async def call(model_name):
+        nonlocal active, peak
+        async with limiter.slot("https://a", model_name):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*[call(f"m{i % 2 + 1}") for i in range(6)])
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_scheduler_cancels_queued_and_running_jobs():
+    """测试取消排队中和执行中的任务，工作协程继续处理后续任务"""
+    async def run():
+        scheduler = ReviewScheduler(max_workers=1)
+        await scheduler.start()
+        finished = []
+
+        async def job(name, delay):
+            await asyncio.sleep(delay)
+            finished.append(name)
+
+        scheduler.submit("slow", "analysis", job, "slow", 10)
+        scheduler.submit("queued", "analysis", job, "queued", 0)
+        scheduler.submit("next", "analysis", job, "next", 0)
+        await asyncio.sleep(0.01)
+
+        states = (scheduler.cancel("queued"), scheduler.cancel("slow"), scheduler.cancel("missing"))
+        await asyncio.sleep(0.05)
+        await scheduler.shutdown()
+        return states, finished
+
+    states, finished = asyncio.run(run())
+
+    assert states == ("queued", "running", None)
+    assert finished == ["next"]
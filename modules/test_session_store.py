@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import Mock
+from .session_store import ReviewSession, ReviewSessionStore
+
+
+def make_session(review_id: str) -> ReviewSession:
+    """创建使用模拟审查流程的会话"""
+    return ReviewSession(review_id, f"{review_id}.docx", f"uploads/{review_id}.docx", Mock())
+
+
+def test_sessions_are_isolated():
+    """测试多个会话可以同时存在"""
+    store = ReviewSessionStore()
+    store.add(make_session("a"))
+    store.add(make_session("b"))
+
+    assert store.get("a").file_name == "a.docx"
+    assert store.get("b").file_name == "b.docx"
+    assert store.get("c") is None
+
+
+def test_lru_eviction_skips_busy_sessions():
+    """测试超出容量时按LRU淘汰空闲会话，执行中的会话保留"""
+    store = ReviewSessionStore(max_sessions=2)
+    busy = store.add(make_session("busy"))
+    busy.busy = True
+    store.add(make_session("idle"))
+    store.get("busy")
+    store.add(make_session("new"))
+
+    assert "busy" in store
+    assert "idle" not in store
+    assert "new" in store
+
+
+def test_ttl_expires_idle_sessions():
+    """测试空闲会话超过TTL后过期"""
+    store = ReviewSessionStore(ttl_seconds=10)
+    session = store.add(make_session("old"))
+    session.last_access -= 20
+
+    assert store.get("old") is None
+    assert len(store) == 0
+
+
+def test_added_session_survives_when_others_are_busy():
+    """测试容量已满且其他会话都在执行时，刚添加的会话不会被立即淘汰"""
+    store = ReviewSessionStore(max_sessions=2)
+    for review_id in ("a", "b"):
+        store.add(make_session(review_id)).busy = True
+
+    store.add(make_session("new"))
+
+    assert "new" in store
+    assert "a" in store and "b" in store
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import httpx
+from .transport import TransportRegistry
+from .role_manager import AIModel
+
+def test_client_shared_per_endpoint():
+    """测试同一端点（无论末尾是否带斜杠）共享HTTP客户端，不同端点各自独立"""
+    registry = TransportRegistry(max_connections=8, connect_timeout=3, read_timeout=30)
+    first = registry.client_for("https://api.example.com/v1")
+    assert registry.client_for("https://api.example.com/v1/") is first
+    assert registry.client_for("https://other.example.com/v1") is not first
+
+    model_a = AIModel("https://api.example.com/v1", "model-a", "key", "expert", http_client=first)
+    model_b = AIModel("https://api.example.com/v1", "model-b", "key", "expert", http_client=first)
+    assert model_a.client._client is model_b.client._client is first
+
+    stats = registry.get_stats()
+    assert stats["max_connections"] == 8
+    assert stats["connect_timeout"] == 3
+    assert set(stats["endpoints"]) == {"https://api.example.com/v1", "https://other.example.com/v1"}
+    asyncio.run(registry.aclose())
+
+def test_prewarm_opens_connections():
+    """测试预热为每个端点发出指定数量的请求：有密钥时带鉴权请求模型列表，否则只发HEAD请求"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, str(request.url), request.headers.get("authorization")))
+        return httpx.Response(200)
+
+    registry = TransportRegistry(prewarm_connections=2)
+    registry._clients["https://api.example.com/v1"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry._clients["https://other.example.com/v1"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry.client_for("https://api.example.com/v1/", "test-key")
+    registry.client_for("")
+
+    warmed = asyncio.run(registry.prewarm())
+
+    assert warmed == {"https://api.example.com/v1": 2, "https://other.example.com/v1": 2}
+    assert sorted(requests) == (
+        [("GET", "https://api.example.com/v1/models", "Bearer test-key")] * 2
+        + [("HEAD", "https://other.example.com/v1", None)] * 2
+    )
+    asyncio.run(registry.aclose())
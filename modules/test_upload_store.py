@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+import io
+import os
+import pytest
+from .upload_store import UploadStore, UploadTooLargeError
+
+
+class FakeUpload:
+    """模拟提供异步read的上传文件"""
+
+    def __init__(self, data: bytes):
+        self.buffer = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.buffer.read(size)
+
+
+def test_save_is_content_addressed_and_deduplicated(tmp_path):
+    """测试按内容摘要存储，相同内容只保存一份"""
+    store = UploadStore(str(tmp_path), chunk_size=4)
+    data = b"same document bytes"
+    file_hash = hashlib.sha256(data).hexdigest()
+
+    async def run():
+        return await asyncio.gather(store.save(FakeUpload(data), ".DOCX"), store.save(FakeUpload(data), ".docx"))
+
+    first, second = asyncio.run(run())
+
+    assert first.path == second.path == os.path.join(str(tmp_path), file_hash[:2], f"{file_hash}.docx")
+    assert first.file_hash == file_hash and first.size == len(data)
+    with open(first.path, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(os.path.join(str(tmp_path), "partial")) == []
+
+
+def test_oversized_upload_rejected_and_cleaned(tmp_path):
+    """测试超出大小限制时拒绝并删除未写完的文件"""
+    store = UploadStore(str(tmp_path), max_bytes=8, chunk_size=4)
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(store.save(FakeUpload(b"0123456789"), ".pdf"))
+    assert os.listdir(os.path.join(str(tmp_path), "partial")) == []
+
+
+def test_review_id_is_unique_per_upload():
+    """测试每次上传的审查ID互不相同，不指定随机数时只由文件内容摘要和文件名决定"""
+    assert UploadStore.review_id_for("abc", "a.docx", "n1") != UploadStore.review_id_for("abc", "a.docx", "n2")
+    assert UploadStore.review_id_for("abc", "a.docx") == UploadStore.review_id_for("abc", "a.docx")
+    assert UploadStore.review_id_for("abc", "a.docx") != UploadStore.review_id_for("abc", "b.docx")
+    assert len(UploadStore.review_id_for("abc", "a.docx", "n1")) == 16
+
+
+def test_collect_garbage_keeps_referenced_files(tmp_path):
+    """测试回收过期且未被引用的文件，并按总大小上限淘汰最久未上传的文件"""
+    store = UploadStore(str(tmp_path), ttl_seconds=60, max_total_bytes=13)
+
+    async def save_all():
+        return [await store.save(FakeUpload(data), ".pdf") for data in (b"old-ref", b"old", b"newer", b"newest")]
+
+    old_ref, old, newer, newest = asyncio.run(save_all())
+    for stored, age in ((old_ref, 120), (old, 120), (newer, 30), (newest, 10)):
+        mtime = os.path.getmtime(stored.path) - age
+        os.utime(stored.path, (mtime, mtime))
+        store.unpin(stored.path)
+
+    result = store.collect_garbage({old_ref.path})
+
+    # old过期；剩余7+5+6字节超过上限，淘汰未被引用中最旧的newer
+    assert [os.path.exists(s.path) for s in (old_ref, old, newer, newest)] == [True, False, False, True]
+    assert result["removed"] == 2 and result["total_bytes"] == 13
+
+
+def test_collect_garbage_skips_pinned_uploads(tmp_path):
+    """测试已保存但尚未登记审查会话的文件在解除固定前不会被回收"""
+    store = UploadStore(str(tmp_path), ttl_seconds=60)
+    stored = asyncio.run(store.save(FakeUpload(b"data"), ".pdf"))
+    # 重复上传相同内容，固定次数累加
+    duplicate = asyncio.run(store.save(FakeUpload(b"data"), ".pdf"))
+    assert duplicate.existed and duplicate.path == stored.path
+    mtime = os.path.getmtime(stored.path) - 120
+    os.utime(stored.path, (mtime, mtime))
+
+    assert store.collect_garbage(set())["removed"] == 0
+    store.unpin(stored.path)
+    assert store.collect_garbage(set())["removed"] == 0
+    store.unpin(duplicate.path)
+    assert store.collect_garbage(set())["removed"] == 1
+    assert not os.path.exists(stored.path)
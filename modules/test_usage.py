@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from .usage import PriceTable, UsageLedger
+from .role_manager import AIModel
+from .telemetry import ResponseTelemetry, bind_telemetry
+
+
+def test_price_table_bills_cached_input_separately():
+    """测试命中前缀缓存的输入按cached_input计价，未配置的模型使用default价格"""
+    prices = PriceTable({
+        "gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10},
+        "default": {"input": 1, "output": 2}
+    })
+    usage = {"prompt_tokens": 1_000_000, "completion_tokens": 100_000, "cached_tokens": 400_000}
+
+    assert prices.cost("gpt-4o", usage) == 0.6 * 2.5 + 0.4 * 1.25 + 0.1 * 10
+    # 未配置cached_input时缓存命中按input计价
+    assert prices.cost("other-model", usage) == 1 + 0.2
+    assert prices.cost("gpt-4o", None) is None
+    assert PriceTable({}).cost("gpt-4o", usage) is None
+
+
+@patch('modules.role_manager.AsyncOpenAI')
+def test_calls_record_cost_by_model_role_and_stage(mock_openai):
+    """测试每次调用按价格表估算费用，分别计入审查的调用记录和服务级台账"""
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message.content = "要点"
+    response.usage = {"prompt_tokens": 1000, "completion_tokens": 200, "prompt_tokens_details": {"cached_tokens": 500}}
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(return_value=response)
+    mock_openai.return_value = mock_client
+    ledger = UsageLedger(PriceTable({"test-model": {"input": 2, "cached_input": 1, "output": 8}}, currency="CNY"))
+    model = AIModel("https://api.example.com", "test-model", "test-key", "expert", usage_ledger=ledger)
+    unpriced = AIModel("https://api.example.com", "other-model", "test-key", "organizer", usage_ledger=ledger)
+    telemetry = ResponseTelemetry(capacity=10, currency="CNY")
+
+    async def run():
+        with bind_telemetry(telemetry):
+            telemetry.stage = "analysis"
+            await model.chat_completion([{"role": "user", "content": "测试"}])
+            telemetry.stage = "summary"
+            await unpriced.chat_completion([{"role": "user", "content": "测试"}])
+        # 未绑定调用记录的调用只计入台账
+        await model.chat_completion([{"role": "user", "content": "测试"}])
+
+    asyncio.run(run())
+
+    cost = (500 * 2 + 500 * 1 + 200 * 8) / 1_000_000
+    assert telemetry.events_since(0)[0]["data"]["cost"] == cost
+    review = telemetry.get_usage()
+    assert review["currency"] == "CNY"
+    assert review["total"]["calls"] == 2
+    assert review["total"]["unpriced_calls"] == 1
+    assert review["by_stage"]["analysis"]["cost"] == round(cost, 6)
+    assert review["by_role"]["organizer"]["prompt_tokens"] == 1000
+    service = ledger.summary()
+    assert service["total"]["calls"] == 3
+    assert service["by_model"]["test-model"]["cost"] == round(cost * 2, 6)
+    assert service["by_stage"]["other"]["calls"] == 1
+
+
+def test_response_cache_hits_are_not_unpriced():
+    """测试命中响应缓存的调用计入cached_calls且费用为0，不计入unpriced_calls"""
+    ledger = UsageLedger(PriceTable({"test-model": {"input": 2}}))
+    telemetry = ResponseTelemetry(capacity=10)
+    telemetry.record_call("test-model", "expert", 0.01, "要点", cached=True,
+                          cost=ledger.record("test-model", "expert", 0.01, None, cached=True))
+
+    for summary in (ledger.summary(), telemetry.get_usage()):
+        assert summary["total"]["cached_calls"] == 1
+        assert summary["total"]["unpriced_calls"] == 0
+        assert summary["total"]["cost"] == 0
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import os
+from .workspace import WorkspaceManager, plan_collection
+from .file_parser import FileParser
+from .test_docx_reader import make_docx
+
+
+def test_plan_collection_by_ttl_then_quota():
+    """测试先回收过期条目，再按最近访问时间淘汰到总大小上限以内，受保护条目不回收"""
+    entries = [("a", 0, 5), ("b", 50, 5), ("c", 80, 5), ("d", 90, 5)]
+
+    assert plan_collection(entries, set(), ttl_seconds=60, max_bytes=0, now=100) == ["a"]
+    assert plan_collection(entries, {"a"}, ttl_seconds=0, max_bytes=10, now=100) == ["b", "c"]
+
+
+def test_collect_garbage_skips_active_reviews(tmp_path):
+    """测试过期的工作目录被回收，仍有会话的审查保留"""
+    manager = WorkspaceManager(str(tmp_path), ttl_seconds=60, max_bytes=0)
+    for review_id in ("active", "stale", "fresh"):
+        manager.create(review_id)
+        with open(manager.report_path(review_id), "w") as f:
+            f.write("<html></html>")
+    for review_id in ("active", "stale"):
+        marker = os.path.join(manager.path_for(review_id), WorkspaceManager.MARKER)
+        os.utime(marker, (0, 0))
+
+    result = manager.collect_garbage({"active"})
+
+    assert result["removed"] == 1
+    assert sorted(os.listdir(str(tmp_path))) == ["active", "fresh"]
+    assert manager.get_stats()["workspaces"] == 2
+
+
+def test_parse_into_workspace_without_temp_text(tmp_path):
+    """测试解析临时文件写入指定的工作目录，关闭keep_temp_text时不写临时文件"""
+    path = str(tmp_path / "doc.docx")
+    make_docx(path)
+    workspace = str(tmp_path / "workspace" / "temp")
+
+    kept = FileParser(str(tmp_path / "temp")).parse_uncached(path, temp_dir=workspace)
+    skipped = FileParser(str(tmp_path / "skip"), keep_temp_text=False).parse_uncached(path)
+
+    assert kept["temp_file"] == os.path.join(workspace, "doc.txt") and os.path.exists(kept["temp_file"])
+    assert skipped["temp_file"] is None
+    assert not os.path.exists(str(tmp_path / "skip"))
+    assert skipped["content"] == kept["content"]
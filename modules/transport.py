@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+import httpx
+
+class TransportRegistry:
+    """按api_base共享的HTTP连接池
+
+    指向同一端点的角色共用一个httpx.AsyncClient，保持长连接，避免每个角色
+    各自建立连接和TLS握手。prewarm在服务启动时预先建立连接，
+    使每个阶段的首批专家调用不必等待握手。
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, connect_timeout: float = 10.0,
+                 read_timeout: float = 600.0, prewarm_connections: int = 2):
+        """初始化连接池注册表
+
+        Args:
+            max_connections: 每个端点的最大连接数
+            max_keepalive_connections: 每个端点保持的空闲长连接数
+            keepalive_expiry: 空闲长连接的保留时间（秒）
+            connect_timeout: 建立连接的超时时间（秒）
+            read_timeout: 读取响应的超时时间（秒），流式调用为相邻两次读取的间隔
+            prewarm_connections: 启动时为每个端点预先建立的连接数，为0时不预热
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.prewarm_connections = prewarm_connections
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # 各端点的API密钥，预热时用于鉴权，避免在服务商处留下未鉴权的请求
+        self._api_keys: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(api_base: str) -> str:
+        """统一端点写法，末尾是否带斜杠视为同一端点"""
+        return api_base.rstrip("/")
+
+    def client_for(self, api_base: str, api_key: Optional[str] = None) -> httpx.AsyncClient:
+        """获取端点共享的HTTP客户端，首次获取时创建
+
+        Args:
+            api_base: API基础URL
+            api_key: 该端点的API密钥，用于预热请求的鉴权，同一端点以首次提供的为准
+
+        Returns:
+            HTTP客户端
+        """
+        key = self._key(api_base)
+        if api_key:
+            self._api_keys.setdefault(key, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self._clients[key] = client
+        return client
+
+    async def _warm(self, api_base: str, client: httpx.AsyncClient) -> int:
+        """并发发出几次轻量请求，在连接池中留下建立好的长连接
+
+        Returns:
+            成功建立的连接数
+        """
+        api_key = self._api_keys.get(api_base)
+
+        async def touch() -> bool:
+            try:
+                if api_key:
+                    # 带密钥请求轻量的模型列表接口，不产生未鉴权的请求
+                    await client.get(f"{api_base}/models", headers={"Authorization": f"Bearer {api_key}"},
+                                     timeout=self.timeout.connect)
+                else:
+                    # 没有密钥时只对基础URL发HEAD请求建立连接，不访问需要鉴权的接口
+                    await client.head(api_base, timeout=self.timeout.connect)
+                return True
+            except httpx.HTTPError as e:
+                logging.warning(f"预热连接失败 {api_base}: {str(e)}")
+                return False
+
+        results = await asyncio.gather(*[touch() for _ in range(self.prewarm_connections)])
+        return sum(results)
+
+    async def prewarm(self) -> Dict[str, int]:
+        """为所有已注册的端点预先建立连接
+
+        Returns:
+            各端点成功建立的连接数
+        """
+        targets = {key: client for key, client in self._clients.items() if key.startswith(("http://", "https://"))}
+        if not self.prewarm_connections or not targets:
+            return {}
+        counts = await asyncio.gather(*[self._warm(key, client) for key, client in targets.items()])
+        warmed = dict(zip(targets, counts))
+        logging.info(f"连接预热完成: {', '.join(f'{key}({count})' for key, count in warmed.items())}")
+        return warmed
+
+    async def aclose(self) -> None:
+        """关闭所有连接池"""
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*[client.aclose() for client in clients], return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各端点连接池的状态
+
+        Returns:
+            统计信息字典，connections为当前连接数，idle为其中的空闲长连接数
+        """
+        endpoints = {}
+        for key, client in self._clients.items():
+            # httpx未公开连接池状态，读取底层httpcore连接池
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            endpoints[key] = {
+                "connections": len(connections),
+                "idle": sum(1 for connection in connections if connection.is_idle())
+            }
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "connect_timeout": self.timeout.connect,
+            "read_timeout": self.timeout.read,
+            "endpoints": endpoints
+        }
+
+    @classmethod
+    def from_config(cls, http_config: Dict[str, Any]) -> "TransportRegistry":
+        """根据HTTP连接配置创建连接池注册表
+
+        Args:
+            http_config: HTTP连接配置字典
+
+        Returns:
+            连接池注册表实例
+        """
+        return cls(
+            max_connections=http_config["max_connections"],
+            max_keepalive_connections=http_config["max_keepalive_connections"],
+            keepalive_expiry=http_config["keepalive_expiry"],
+            connect_timeout=http_config["connect_timeout"],
+            read_timeout=http_config["read_timeout"],
+            prewarm_connections=http_config["prewarm_connections"]
+        )
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Set, Tuple
+import aiofiles
+import aiofiles.os
+from .workspace import plan_collection
+from .compat import to_thread
+
+class UploadTooLargeError(ValueError):
+    """上传文件超过大小限制"""
+
+
+class StoredUpload:
+    """已保存的上传文件"""
+
+    def __init__(self, path: str, file_hash: str, size: int, existed: bool):
+        """初始化上传文件信息
+
+        Args:
+            path: 存储路径
+            file_hash: 文件内容的SHA-256摘要
+            size: 文件字节数
+            existed: 相同内容的文件此前是否已存储
+        """
+        self.path = path
+        self.file_hash = file_hash
+        self.size = size
+        self.existed = existed
+
+
+class UploadStore:
+    """按内容寻址的上传文件存储
+
+    文件先以异步I/O流式写入临时文件，同时计算SHA-256，写完后移动到
+    <directory>/<摘要前两位>/<摘要><扩展名>。同名的不同文件互不覆盖，
+    内容相同的文件只保存一份。没有审查会话引用的文件由collect_garbage
+    按存活时间和总大小上限回收；save返回的文件处于固定状态，调用方登记
+    审查会话后调用unpin解除，期间不会被回收。
+    """
+
+    # 未写完的临时文件超过该时间（秒）视为中断遗留，回收时删除
+    PARTIAL_TTL = 3600
+
+    def __init__(self, directory: str = "uploads", max_bytes: int = 10 * 1024 * 1024,
+                 chunk_size: int = 1024 * 1024, ttl_seconds: float = 86400, max_total_bytes: int = 0):
+        """初始化上传存储
+
+        Args:
+            directory: 存储目录
+            max_bytes: 单个文件的最大字节数
+            chunk_size: 每次读取的字节数
+            ttl_seconds: 未被引用的文件的存活时间（秒），为0时不按时间回收
+            max_total_bytes: 所有上传文件的总大小上限，为0时不限制
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.collected = 0
+        self.last_collection: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        # 已保存但尚未登记审查会话的文件路径及其固定次数
+        self._pins: Dict[str, int] = {}
+        self._pin_lock = threading.Lock()
+        self._partial_dir = os.path.join(directory, "partial")
+        os.makedirs(self._partial_dir, exist_ok=True)
+
+    def path_for(self, file_hash: str, suffix: str) -> str:
+        """获取内容摘要对应的存储路径
+
+        Args:
+            file_hash: 文件内容的SHA-256摘要
+            suffix: 文件扩展名（含点）
+
+        Returns:
+            存储路径
+        """
+        return os.path.join(self.directory, file_hash[:2], f"{file_hash}{suffix.lower()}")
+
+    def pin(self, path: str) -> None:
+        """固定文件，固定期间回收时跳过该文件
+
+        Args:
+            path: 存储路径
+        """
+        key = os.path.abspath(path)
+        with self._pin_lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, path: str) -> None:
+        """解除一次固定
+
+        Args:
+            path: 存储路径
+        """
+        key = os.path.abspath(path)
+        with self._pin_lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    async def save(self, upload: Any, suffix: str) -> StoredUpload:
+        """流式保存上传文件
+
+        返回的文件已被固定，调用方登记审查会话后必须调用unpin解除固定。
+
+        Args:
+            upload: 提供异步read(size)方法的上传文件对象
+            suffix: 文件扩展名（含点）
+
+        Returns:
+            已保存的上传文件
+
+        Raises:
+            UploadTooLargeError: 文件超过大小限制
+        """
+        digest = hashlib.sha256()
+        size = 0
+        partial_path = os.path.join(self._partial_dir, f"{uuid.uuid4().hex}.part")
+        path = None
+        try:
+            async with aiofiles.open(partial_path, "wb") as f:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLargeError(f"文件大小超过限制（{self.max_bytes // (1024 * 1024)}MB）")
+                    digest.update(chunk)
+                    await f.write(chunk)
+
+            file_hash = digest.hexdigest()
+            path = self.path_for(file_hash, suffix)
+            # 先固定再检查是否已存在，避免已有文件在检查之后被并发的回收删除
+            self.pin(path)
+            existed = await aiofiles.os.path.exists(path)
+            if existed:
+                await aiofiles.os.remove(partial_path)
+                # 刷新访问时间，重复上传的文件按最近一次上传计算存活时间
+                await to_thread(os.utime, path)
+            else:
+                await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+                # 同一文件系统内的原子替换，并发上传相同内容时结果一致
+                await aiofiles.os.replace(partial_path, path)
+            return StoredUpload(path, file_hash, size, existed)
+        except BaseException:
+            if path is not None:
+                self.unpin(path)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        """列出已存储的文件(路径, 最近访问时间, 字节数)"""
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            if os.path.abspath(root) == os.path.abspath(self._partial_dir):
+                continue
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def collect_garbage(self, referenced: Set[str]) -> Dict[str, Any]:
+        """回收没有审查会话引用的过期文件，总大小超过上限时按最近访问时间淘汰
+
+        Args:
+            referenced: 仍被审查会话引用的文件路径，已固定的文件同样不会回收
+
+        Returns:
+            回收结果，包含removed（回收的文件数）、freed_bytes和total_bytes（回收后的总大小）
+        """
+        now = time.time()
+        with self._lock:
+            # 中断的上传留下的临时文件
+            for entry in os.scandir(self._partial_dir):
+                try:
+                    if now - entry.stat().st_mtime > self.PARTIAL_TTL:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+            entries = self._entries()
+            with self._pin_lock:
+                pinned = set(self._pins)
+            protected = {os.path.abspath(path) for path in referenced} | pinned
+            keyed = [(os.path.abspath(path), mtime, size) for path, mtime, size in entries]
+            victims = set(plan_collection(keyed, protected, self.ttl_seconds, self.max_total_bytes, now))
+            removed = 0
+            freed = 0
+            for path, _, size in keyed:
+                if path not in victims:
+                    continue
+                # 删除前再次检查，规划期间刚保存的文件可能已被固定
+                with self._pin_lock:
+                    if path in self._pins:
+                        continue
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                removed += 1
+                freed += size
+            self.collected += removed
+            self.last_collection = {
+                "time": now,
+                "removed": removed,
+                "freed_bytes": freed,
+                "total_bytes": sum(size for _, _, size in keyed) - freed
+            }
+        if removed:
+            logging.info(f"回收上传文件{removed}个，释放{freed / 1024 / 1024:.1f}MB")
+        return self.last_collection
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取上传存储统计信息
+
+        Returns:
+            统计信息字典
+        """
+        entries = self._entries()
+        return {
+            "files": len(entries),
+            "total_bytes": sum(size for _, _, size in entries),
+            "max_total_bytes": self.max_total_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "collected": self.collected,
+            "last_collection": self.last_collection
+        }
+
+    @staticmethod
+    def review_id_for(file_hash: str, file_name: str, nonce: Optional[str] = None) -> str:
+        """根据文件内容、文件名和本次上传的随机数生成审查ID
+
+        不同用户上传同一文件时各自得到独立的审查ID；nonce为None时只由文件内容和文件名决定，
+        相同输入在任何进程中得到相同结果，用于显式复用已有的审查会话。
+
+        Args:
+            file_hash: 文件内容的SHA-256摘要
+            file_name: 原始文件名
+            nonce: 本次上传的随机数，为None时生成可复用的确定性ID
+
+        Returns:
+            16位十六进制审查ID
+        """
+        key = f"{file_hash}:{file_name}" if nonce is None else f"{file_hash}:{file_name}:{nonce}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def from_config(cls, upload_config: Dict[str, Any]) -> "UploadStore":
+        """根据上传配置创建上传存储
+
+        Args:
+            upload_config: 上传配置字典
+
+        Returns:
+            上传存储实例
+        """
+        return cls(
+            directory=upload_config["directory"],
+            max_bytes=int(upload_config["max_size_mb"] * 1024 * 1024),
+            ttl_seconds=upload_config["ttl_seconds"],
+            max_total_bytes=int(upload_config["max_total_mb"] * 1024 * 1024)
+        )
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import threading
+from typing import Dict, Any, Optional
+
+class PriceTable:
+    """按模型配置的token单价，单位为每百万token的价格"""
+
+    def __init__(self, prices: Optional[Dict[str, Dict[str, float]]] = None, currency: str = "USD"):
+        """初始化价格表
+
+        Args:
+            prices: 模型名称到单价的映射，单价包含input、output和cached_input（命中前缀缓存的输入，
+                未配置时按input计价）；"default"项用于未单独配置的模型
+            currency: 货币单位
+        """
+        self.prices = prices or {}
+        self.currency = currency
+
+    def cost(self, model_name: str, usage: Optional[Dict[str, int]]) -> Optional[float]:
+        """估算一次调用的费用
+
+        Args:
+            model_name: 模型名称
+            usage: token用量，包含prompt_tokens、completion_tokens和cached_tokens
+
+        Returns:
+            费用，模型没有价格或没有用量信息时返回None
+        """
+        price = self.prices.get(model_name, self.prices.get("default"))
+        if price is None or usage is None:
+            return None
+        cached = usage.get("cached_tokens", 0)
+        uncached = usage.get("prompt_tokens", 0) - cached
+        total = (uncached * price.get("input", 0)
+                 + cached * price.get("cached_input", price.get("input", 0))
+                 + usage.get("completion_tokens", 0) * price.get("output", 0))
+        return total / 1_000_000
+
+    @classmethod
+    def from_config(cls, usage_config: Dict[str, Any]) -> "PriceTable":
+        """根据用量统计配置创建价格表
+
+        Args:
+            usage_config: 用量统计配置字典
+
+        Returns:
+            价格表实例
+        """
+        return cls(prices=usage_config["prices"], currency=usage_config["currency"])
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "latency_seconds": 0.0,
+        "cost": 0.0,
+        "cached_calls": 0,
+        "unpriced_calls": 0
+    }
+
+
+class UsageAggregator:
+    """按模型、角色和阶段累计调用次数、token用量、耗时和费用"""
+
+    GROUPS = ("model", "role", "stage")
+
+    def __init__(self, currency: str = "USD"):
+        """初始化用量累计
+
+        Args:
+            currency: 费用的货币单位
+        """
+        self.currency = currency
+        self.total = _empty_totals()
+        self.groups: Dict[str, Dict[str, Dict[str, Any]]] = {group: {} for group in self.GROUPS}
+        self._lock = threading.Lock()
+
+    def add(self, model: str, role: str, latency: float, usage: Optional[Dict[str, int]],
+            cost: Optional[float], stage: Optional[str] = None, cached: bool = False) -> None:
+        """累计一次调用
+
+        Args:
+            model: 模型名称
+            role: 角色名称
+            latency: 调用耗时（秒）
+            usage: token用量，服务商未返回时为None
+            cost: 估算费用，无法计价时为None
+            stage: 调用所属的审查阶段
+            cached: 是否命中响应缓存，命中时计入cached_calls，不计入unpriced_calls
+        """
+        keys = {"model": model, "role": role, "stage": stage or "other"}
+        with self._lock:
+            targets = [self.total] + [
+                self.groups[group].setdefault(keys[group], _empty_totals()) for group in self.GROUPS
+            ]
+            for totals in targets:
+                totals["calls"] += 1
+                totals["latency_seconds"] += latency
+                if usage is not None:
+                    for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+                        totals[key] += usage.get(key, 0)
+                if cached:
+                    totals["cached_calls"] += 1
+                elif cost is None:
+                    totals["unpriced_calls"] += 1
+                else:
+                    totals["cost"] += cost
+
+    @staticmethod
+    def _format(totals: Dict[str, Any]) -> Dict[str, Any]:
+        prompt_tokens = totals["prompt_tokens"]
+        return {
+            **totals,
+            "latency_seconds": round(totals["latency_seconds"], 3),
+            "cost": round(totals["cost"], 6),
+            "cache_hit_ratio": round(totals["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """获取累计结果
+
+        Returns:
+            汇总字典，total为总计，by_model、by_role和by_stage为分组小计；
+            cache_hit_ratio为输入token中命中服务商前缀缓存的比例，cached_calls为命中响应缓存、
+            不产生费用的调用次数，unpriced_calls为无法计价的调用次数
+        """
+        with self._lock:
+            return {
+                "currency": self.currency,
+                "total": self._format(self.total),
+                **{
+                    f"by_{group}": {key: self._format(totals) for key, totals in self.groups[group].items()}
+                    for group in self.GROUPS
+                }
+            }
+
+
+class UsageLedger(UsageAggregator):
+    """服务进程内所有模型调用的用量台账，按价格表估算每次调用的费用"""
+
+    def __init__(self, price_table: Optional[PriceTable] = None):
+        """初始化用量台账
+
+        Args:
+            price_table: 价格表，为None时不计价
+        """
+        self.price_table = price_table or PriceTable()
+        super().__init__(currency=self.price_table.currency)
+
+    def record(self, model: str, role: str, latency: float, usage: Optional[Dict[str, int]],
+               stage: Optional[str] = None, cached: bool = False) -> Optional[float]:
+        """记录一次调用并返回估算费用
+
+        Args:
+            model: 模型名称
+            role: 角色名称
+            latency: 调用耗时（秒）
+            usage: token用量
+            stage: 调用所属的审查阶段
+            cached: 是否命中响应缓存，命中时没有调用服务商，费用为0
+
+        Returns:
+            估算费用，无法计价时返回None
+        """
+        cost = 0.0 if cached else self.price_table.cost(model, usage)
+        self.add(model, role, latency, usage, cost, stage, cached)
+        return cost
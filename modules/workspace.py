@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+def plan_collection(entries: List[Tuple[str, float, int]], protected: Set[str], ttl_seconds: float,
+                    max_bytes: int, now: Optional[float] = None) -> List[str]:
+    """选出需要回收的条目
+
+    先回收超过ttl_seconds未访问的条目；剩余总大小仍超过max_bytes时，
+    按最近访问时间从旧到新继续回收。受保护的条目不会被回收，也计入总大小。
+
+    Args:
+        entries: (键, 最近访问时间, 字节数)列表
+        protected: 受保护的键
+        ttl_seconds: 存活时间（秒），为0时不按时间回收
+        max_bytes: 总大小上限，为0时不限制
+        now: 当前时间，默认为time.time()
+
+    Returns:
+        需要回收的键列表
+    """
+    now = time.time() if now is None else now
+    candidates = sorted((entry for entry in entries if entry[0] not in protected), key=lambda entry: entry[1])
+    victims = [key for key, last_access, _ in candidates if ttl_seconds and now - last_access > ttl_seconds]
+    if max_bytes:
+        removed = set(victims)
+        total = sum(size for key, _, size in entries if key not in removed)
+        for key, _, size in candidates:
+            if total <= max_bytes:
+                break
+            if key not in removed:
+                victims.append(key)
+                total -= size
+    return victims
+
+
+def directory_size(path: str) -> int:
+    """统计目录下所有文件的字节数
+
+    Args:
+        path: 目录路径
+
+    Returns:
+        字节数，目录不存在时为0
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceManager:
+    """按审查划分的工作目录
+
+    每个审查在<root>/<review_id>/下保存解析临时文件和审查报告，最近访问时间
+    记录在目录内的.last_access文件上。collect_garbage回收过期的工作目录，
+    并在总大小超过上限时按最近访问时间淘汰；仍有会话的审查不会被回收。
+    """
+
+    MARKER = ".last_access"
+
+    def __init__(self, root: str = "workspaces", ttl_seconds: float = 86400, max_bytes: int = 2 * 1024 ** 3):
+        """初始化工作目录管理器
+
+        Args:
+            root: 工作目录的根目录
+            ttl_seconds: 工作目录的存活时间（秒），为0时不按时间回收
+            max_bytes: 所有工作目录的总大小上限，为0时不限制
+        """
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.collected = 0
+        self.last_collection: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, review_id: str) -> str:
+        """获取审查的工作目录路径
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            工作目录路径
+        """
+        if not review_id or os.sep in review_id or review_id.startswith("."):
+            raise ValueError(f"无效的审查ID: {review_id}")
+        return os.path.join(self.root, review_id)
+
+    def create(self, review_id: str) -> str:
+        """创建审查的工作目录，已存在时只刷新访问时间
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            工作目录路径
+        """
+        path = self.path_for(review_id)
+        os.makedirs(os.path.join(path, "temp"), exist_ok=True)
+        self.touch(review_id)
+        return path
+
+    def temp_dir(self, review_id: str) -> str:
+        """获取审查的解析临时文件目录
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            临时文件目录路径
+        """
+        return os.path.join(self.path_for(review_id), "temp")
+
+    def report_path(self, review_id: str) -> str:
+        """获取审查报告的保存路径
+
+        Args:
+            review_id: 审查ID
+
+        Returns:
+            报告文件路径
+        """
+        return os.path.join(self.path_for(review_id), "report.html")
+
+    def touch(self, review_id: str) -> None:
+        """刷新工作目录的最近访问时间
+
+        Args:
+            review_id: 审查ID
+        """
+        marker = os.path.join(self.path_for(review_id), self.MARKER)
+        try:
+            with open(marker, "a"):
+                pass
+            os.utime(marker)
+        except FileNotFoundError:
+            # 工作目录已被回收，访问时重新创建
+            self.create(review_id)
+
+    def remove(self, review_id: str) -> None:
+        """删除审查的工作目录
+
+        Args:
+            review_id: 审查ID
+        """
+        shutil.rmtree(self.path_for(review_id), ignore_errors=True)
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        """列出所有工作目录的(审查ID, 最近访问时间, 字节数)"""
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            marker = os.path.join(entry.path, self.MARKER)
+            try:
+                last_access = os.path.getmtime(marker)
+            except OSError:
+                last_access = entry.stat().st_mtime
+            entries.append((entry.name, last_access, directory_size(entry.path)))
+        return entries
+
+    def collect_garbage(self, active: Set[str]) -> Dict[str, Any]:
+        """回收过期或超出总大小上限的工作目录
+
+        Args:
+            active: 仍有审查会话的审查ID，这些工作目录不会被回收
+
+        Returns:
+            回收结果，包含removed（回收的目录数）、freed_bytes和total_bytes（回收后的总大小）
+        """
+        with self._lock:
+            entries = self._entries()
+            victims = set(plan_collection(entries, active, self.ttl_seconds, self.max_bytes))
+            freed = 0
+            for review_id, _, size in entries:
+                if review_id in victims:
+                    self.remove(review_id)
+                    freed += size
+            self.collected += len(victims)
+            self.last_collection = {
+                "time": time.time(),
+                "removed": len(victims),
+                "freed_bytes": freed,
+                "total_bytes": sum(size for _, _, size in entries) - freed
+            }
+        if victims:
+            logging.info(f"回收工作目录{len(victims)}个，释放{freed / 1024 / 1024:.1f}MB")
+        return self.last_collection
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工作目录统计信息
+
+        Returns:
+            统计信息字典
+        """
+        entries = self._entries()
+        return {
+            "workspaces": len(entries),
+            "total_bytes": sum(size for _, _, size in entries),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "collected": self.collected,
+            "last_collection": self.last_collection
+        }
+
+    @classmethod
+    def from_config(cls, workspace_config: Dict[str, Any]) -> "WorkspaceManager":
+        """根据工作目录配置创建管理器
+
+        Args:
+            workspace_config: 工作目录配置字典
+
+        Returns:
+            工作目录管理器实例
+        """
+        return cls(
+            root=workspace_config["directory"],
+            ttl_seconds=workspace_config["ttl_seconds"],
+            max_bytes=int(workspace_config["max_total_mb"] * 1024 * 1024)
+        )